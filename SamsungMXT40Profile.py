@@ -1,5 +1,8 @@
-from samsungmxt40 import SamsungMXT40
-from typing import List
+from samsungmxt40 import SamsungMXT40, ConnectionManager, ProfileStore, SourceInfo
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
 
 from blueman.Functions import create_menuitem
 from blueman.bluez.Device import Device
@@ -8,9 +11,9 @@ from blueman.gui.manager.ManagerDeviceMenu import ManagerDeviceMenu, MenuItemsPr
 
 import gi
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
+gi.require_version("Gdk", "3.0")
+from gi.repository import Gdk, GLib, Gtk
 
-from datetime import datetime
 import time
 
 
@@ -24,205 +27,283 @@ def create_txt_menuitem(text: str) -> Gtk.MenuItem:
     return item
 
 class SamsungMXT40Profile(ManagerPlugin, MenuItemsProvider):
+    """
+    Blueman menu of the Samsung MX-T40 Sound Tower
+
+    The menus are built at once from the state cached by the sessions, all
+    the bluetooth input/output runs on a worker thread and its results come
+    back to the GTK main loop through GLib idle callbacks.
+    """
+
     name = "[AV] MX-T40"
 
     def on_load(self) -> None:
-        self.devices: Dict[str, "Info"] = {}
-
-    def generate_source_menu(self, device: Device, item: Gtk.MenuItem) -> None:
+        self.profiles = ProfileStore()
+        self.manager = ConnectionManager(factory=lambda device: SamsungMXT40(device, profiles=self.profiles), reader=True)
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mxt40")
+        self.window: Optional[Gtk.Window] = None
+        self.in_flight = 0
+        self.source_menus: Dict[str, Gtk.Menu] = {}
+        self.subscribed: Dict[str, Callable[[SourceInfo], None]] = {}
+        self.volume_delta: Dict[str, int] = {}
+        self.volume_lock = threading.Lock()
+        self.updating = False
+
+    def on_unload(self) -> None:
+        # drop the queued jobs and wait for the running one, it may be inside a request on a session about to be closed
+        self.worker.shutdown(wait=True, cancel_futures=True)
+        self.manager.close_all()
+
+    def run(self, address: str, function: Callable[[SamsungMXT40], object], done: Optional[Callable[[SamsungMXT40, object], None]] = None) -> Future:
+        """
+        Run a function with the session of a device on the worker thread
+
+        :param address: The device MAC Address.
+        :param function: function called with the session on the worker thread
+        :param done: function called with the session and the result on the GTK main loop
+        :return: future of the result of the function
+        """
+        self.set_busy(1)
+
+        def job() -> object:
+            with self.manager.session(address) as samsung:
+                self.subscribe(address, samsung)
+                return samsung, function(samsung)
+
+        future = self.worker.submit(job)
+        future.add_done_callback(lambda f: GLib.idle_add(self.on_done, address, f, done))
+        return future
+
+    def on_done(self, address: str, future: Future, done: Optional[Callable[[SamsungMXT40, object], None]]) -> bool:
+        self.set_busy(-1)
         try:
-            samsung = self.devices[device['Address']]
-        except KeyError:
-            self.devices[device['Address']] = SamsungMXT40(device['Address'])
-            samsung = self.devices[device['Address']]
-        group: Sequence[Gtk.RadioMenuItem] = []
+            samsung, result = future.result()
+        except Exception as e:
+            logging.warning("MX-T40 %s: %s", address, e)
+            return False
+        if done is not None:
+            done(samsung, result)
+        return False
+
+    def set_busy(self, delta: int) -> None:
+        """
+        Show the progress cursor on the manager window while actions are in flight
+        """
+        self.in_flight += delta
+        if self.window is None or self.window.get_window() is None:
+            return
+        cursor = Gdk.Cursor.new_from_name(self.window.get_display(), "progress") if self.in_flight > 0 else None
+        self.window.get_window().set_cursor(cursor)
+
+    def subscribe(self, address: str, samsung: SamsungMXT40) -> None:
+        """
+        Follow the source changes of a device, called on the worker thread
+        """
+        if address in self.subscribed:
+            return
+        callback = lambda response: GLib.idle_add(self.update_source_menu, address)
+        self.subscribed[address] = callback
+        samsung.subscribe(callback, SourceInfo)
 
+    def generate_source_menu(self, device: Device, item: Gtk.MenuItem) -> None:
+        address = device['Address']
         sub = Gtk.Menu()
+        self.source_menus[address] = sub
+        item.set_submenu(sub)
+        item.show()
 
-        if (samsung.source_updated_at is None) or (datetime.now() - samsung.source_updated_at).seconds > 10:
-            samsung.connect()
-            samsung.load_source_info()
-            samsung.close()
-
-        for source in samsung.source_info:
-            i = Gtk.RadioMenuItem.new_with_label(group, source)
-            group = i.get_group()
-
-            if source == samsung.source_label:
-                i.set_active(True)
+        self.update_source_menu(address)
+        self.run(address, lambda samsung: samsung.get_source(), lambda samsung, result: self.update_source_menu(address))
+
+    def update_source_menu(self, address: str) -> bool:
+        """
+        Fill the source menu of a device from the state of its session
+        """
+        sub = self.source_menus.get(address)
+        if sub is None:
+            return False
+        samsung = self.manager.peek(address)
+        for child in sub.get_children():
+            sub.remove(child)
+
+        if samsung is None or not samsung.source_info:
+            loading = create_txt_menuitem("<i>Loading…</i>")
+            loading.set_sensitive(False)
+            sub.append(loading)
+            return False
+
+        group: List[Gtk.RadioMenuItem] = []
+        self.updating = True
+        try:
+            for source in samsung.source_info:
+                i = Gtk.RadioMenuItem.new_with_label(group, source)
+                group = i.get_group()
 
-            i.connect("toggled", self.on_source_selection_changed,
-                      device, source)
+                if source == samsung.source_label:
+                    i.set_active(True)
 
-            sub.append(i)
-            i.show()
+                i.connect("toggled", self.on_source_selection_changed, address, source)
 
-        item.set_submenu(sub)
-        item.show()
+                sub.append(i)
+                i.show()
+        finally:
+            self.updating = False
+        return False
 
-    def generate_sound_menu(self, samsung: SamsungMXT40, item: Gtk.MenuItem) -> None:
+    def generate_sound_menu(self, address: str, item: Gtk.MenuItem) -> None:
         sub = Gtk.Menu()
         item_sound_more_5 = create_menuitem("Sound More 5", "audio-volume-high")
         item_sound_more_5.props.tooltip_text = "Increase Sound 5 times"
-        item_sound_more_5.connect('activate', lambda x: SamsungMXT40Profile.sound_more(samsung, 5))
+        item_sound_more_5.connect('activate', lambda x: self.change_volume(address, 5))
         sub.append(item_sound_more_5)
 
         item_sound_more = create_menuitem("Sound More", "audio-volume-high")
         item_sound_more.props.tooltip_text = "Increase Sound 1 time"
-        item_sound_more.connect('activate', lambda x: SamsungMXT40Profile.sound_more(samsung, 1))
+        item_sound_more.connect('activate', lambda x: self.change_volume(address, 1))
         sub.append(item_sound_more)
 
         item_sound_less = create_menuitem("Sound Less", "audio-volume-low")
         item_sound_less.props.tooltip_text = "Decrease Sound 1 time"
-        item_sound_less.connect('activate', lambda x: SamsungMXT40Profile.sound_less(samsung, 1))
+        item_sound_less.connect('activate', lambda x: self.change_volume(address, -1))
         sub.append(item_sound_less)
 
         item_sound_less_5 = create_menuitem("Sound Less 5", "audio-volume-low")
         item_sound_less_5.props.tooltip_text = "Decrease Sound 5 times"
-        item_sound_less_5.connect('activate', lambda x: SamsungMXT40Profile.sound_less(samsung, 5))
+        item_sound_less_5.connect('activate', lambda x: self.change_volume(address, -5))
         sub.append(item_sound_less_5)
 
         item.set_submenu(sub)
         item.show()
 
-    def generate_light_menu(self, samsung: SamsungMXT40, item: Gtk.MenuItem) -> None:
+    def generate_light_menu(self, address: str, item: Gtk.MenuItem) -> None:
         sub = Gtk.Menu()
 
-        for label in samsung.status_map:
+        for label in SamsungMXT40.status_map:
             i = create_txt_menuitem(label)
             i.props.tooltip_text = label
-            i.connect('activate', SamsungMXT40Profile.on_change_status, samsung, label)
+            i.connect('activate', self.on_change_status, address, label)
             sub.append(i)
 
         item.set_submenu(sub)
         item.show()
 
-    def generate_dj_effect_menu(self, samsung: SamsungMXT40, item: Gtk.MenuItem) -> None:
+    def generate_dj_effect_menu(self, address: str, item: Gtk.MenuItem) -> None:
         sub = Gtk.Menu()
 
-        for label in samsung.effect_map:
+        for label in SamsungMXT40.effect_map:
             i = create_txt_menuitem(label)
             i.props.tooltip_text = label
             if (label == "OFF"):
-                i.connect('activate', SamsungMXT40Profile.on_change_dj_effect, samsung, label, 1)
+                i.connect('activate', self.on_change_dj_effect, address, label, 1)
             else:
-                self.generate_dj_effect_value_menu(samsung, i, label)
+                self.generate_dj_effect_value_menu(address, i, label)
             sub.append(i)
 
         i = create_txt_menuitem("Tempo")
         i.props.tooltip_text = "Tempo"
-        self.generate_tempo_menu(samsung, i)
+        self.generate_tempo_menu(address, i)
         sub.append(i)
 
         item.set_submenu(sub)
         item.show()
 
-    def generate_dj_effect_value_menu(self, samsung: SamsungMXT40, item: Gtk.MenuItem, label: str) -> None:
+    def generate_dj_effect_value_menu(self, address: str, item: Gtk.MenuItem, label: str) -> None:
         sub = Gtk.Menu()
 
         for value in range(1, 31):
             i = create_txt_menuitem(value)
             i.props.tooltip_text = label + " " + str(value)
-            i.connect('activate', SamsungMXT40Profile.on_change_dj_effect, samsung, label, value)
+            i.connect('activate', self.on_change_dj_effect, address, label, value)
             sub.append(i)
 
         item.set_submenu(sub)
         item.show()
 
-    def generate_tempo_menu(self, samsung: SamsungMXT40, item: Gtk.MenuItem) -> None:
+    def generate_tempo_menu(self, address: str, item: Gtk.MenuItem) -> None:
         sub = Gtk.Menu()
 
         for value in range(16):
             i = create_txt_menuitem(value)
             i.props.tooltip_text = str(value)
-            i.connect('activate', SamsungMXT40Profile.on_change_tempo, samsung, value)
+            i.connect('activate', self.on_change_tempo, address, value)
             sub.append(i)
 
         item.set_submenu(sub)
         item.show()
 
-    def generate_bass_booster_menu(self, samsung: SamsungMXT40, item: Gtk.MenuItem) -> None:
+    def generate_bass_booster_menu(self, address: str, item: Gtk.MenuItem) -> None:
         sub = Gtk.Menu()
 
         for label in ["ON", "OFF"]:
             i = create_txt_menuitem(label)
             i.props.tooltip_text = label
-            i.connect('activate', SamsungMXT40Profile.on_change_bass_booster, samsung, label)
+            i.connect('activate', self.on_change_bass_booster, address, label)
             sub.append(i)
 
         item.set_submenu(sub)
         item.show()
 
-    def on_source_selection_changed(self, item: Gtk.CheckMenuItem, device: Device, source: str) -> None:
-        if item.get_active():
-            samsung = self.devices[device['Address']]
-            samsung.connect()
-            samsung.load_source_info()
+    def on_source_selection_changed(self, item: Gtk.CheckMenuItem, address: str, source: str) -> None:
+        if self.updating or not item.get_active():
+            return
+
+        def switch(samsung: SamsungMXT40) -> None:
             if source == "OFF":
                 samsung.remote_control_mode()
-                commands = samsung.request(samsung.toggle_on_off())
+                samsung.request(samsung.toggle_on_off())
             else:
-                samsung.request(samsung.source_switch(source))
-                if (source.startswith("AUX")):
-                    samsung.request(samsung.sound_setting_info_req(7))
-                    samsung.request(samsung.sound_setting_info_req(1))
-                    samsung.request(samsung.aux_state_req())
-                elif (source.startswith("USB")):
-                    samsung.request(samsung.usb_playtime_enable(1))
-                    samsung.usb_status_info_req()
-                else:
-                    samsung.request(samsung.usb_playtime_enable(0))
-                samsung.request(samsung.connect_restart_req())
-            samsung.close()
-
-    def on_change_status(item: Gtk.MenuItem, samsung: SamsungMXT40, label: str) -> None:
-        samsung.connect()
-        samsung.load_source_info()
-        samsung.effect_fragment_mode()
-        samsung.request(samsung.status_setting(label))
-        samsung.close()
-
-    def on_change_dj_effect(item: Gtk.MenuItem, samsung: SamsungMXT40, label: str, value: int) -> None:
-        samsung.connect()
-        samsung.load_source_info()
-        samsung.effect_fragment_mode()
-        samsung.request(samsung.change_dj_effect(label, value))
-        samsung.close()
-
-    def on_change_tempo(item: Gtk.MenuItem, samsung: SamsungMXT40, value: int) -> None:
-        samsung.connect()
-        samsung.load_source_info()
-        samsung.effect_fragment_mode()
-        samsung.request(samsung.tempo(value))
-        samsung.close()
-
-    def on_change_bass_booster(item: Gtk.MenuItem, samsung: SamsungMXT40, label: str) -> None:
-        samsung.connect()
-        samsung.load_source_info()
-        samsung.effect_fragment_mode()
-        if (label == "ON"):
-            samsung.request(samsung.bass_booster_on())
-        elif (label == "OFF"):
-            samsung.request(samsung.bass_booster_off())
-        samsung.close()
-
-    def sound_more(samsung: SamsungMXT40, times: int) -> None:
-        samsung.connect()
-        samsung.effect_fragment_mode()
-        for i in range(times):
-            samsung.request(samsung.sound_more())
-        samsung.request(samsung.connect_restart_req())
-        samsung.close()
-
-    def sound_less(samsung: SamsungMXT40, times: int) -> None:
-        samsung.connect()
-        samsung.effect_fragment_mode()
-        for i in range(times):
-            samsung.request(samsung.sound_less())
-        samsung.request(samsung.connect_restart_req())
-        samsung.close()
-
-    def color_picker(samsung: SamsungMXT40, parent: Gtk.Window) -> None:
+                samsung.pipeline(samsung.sourceSwitchCommands(source) + [samsung.connect_restart_req()])
+
+        self.run(address, switch, lambda samsung, result: self.update_source_menu(address))
+
+    def on_change_status(self, item: Gtk.MenuItem, address: str, label: str) -> None:
+        def change(samsung: SamsungMXT40) -> None:
+            samsung.effect_fragment_mode()
+            samsung.request(samsung.status_setting(label))
+
+        self.run(address, change)
+
+    def on_change_dj_effect(self, item: Gtk.MenuItem, address: str, label: str, value: int) -> None:
+        def change(samsung: SamsungMXT40) -> None:
+            samsung.effect_fragment_mode()
+            samsung.request(samsung.change_dj_effect(label, value))
+
+        self.run(address, change)
+
+    def on_change_tempo(self, item: Gtk.MenuItem, address: str, value: int) -> None:
+        def change(samsung: SamsungMXT40) -> None:
+            samsung.effect_fragment_mode()
+            samsung.request(samsung.tempo(value))
+
+        self.run(address, change)
+
+    def on_change_bass_booster(self, item: Gtk.MenuItem, address: str, label: str) -> None:
+        def change(samsung: SamsungMXT40) -> None:
+            samsung.effect_fragment_mode()
+            samsung.request(samsung.bass_booster(label))
+
+        self.run(address, change)
+
+    def change_volume(self, address: str, delta: int) -> None:
+        """
+        Queue volume steps, the clicks made before the worker picks them up are sent as one burst
+        """
+        with self.volume_lock:
+            queued = address in self.volume_delta
+            self.volume_delta[address] = self.volume_delta.get(address, 0) + delta
+        if queued:
+            return
+
+        def change(samsung: SamsungMXT40) -> None:
+            with self.volume_lock:
+                steps = self.volume_delta.pop(address, 0)
+            samsung.effect_fragment_mode()
+            samsung.change_volume(steps)
+            samsung.request(samsung.connect_restart_req())
+
+        self.run(address, change)
+
+    def color_picker(self, address: str, parent: Gtk.Window) -> None:
         dialog = Gtk.ColorSelectionDialog(title='Select color')
         dialog.set_transient_for(parent)
         colorsel = dialog.get_color_selection()
@@ -231,54 +312,58 @@ class SamsungMXT40Profile(ManagerPlugin, MenuItemsProvider):
         if response == Gtk.ResponseType.OK:
             color = colorsel.get_current_rgba()
             dialog.destroy()
-            samsung.connect()
-            samsung.effect_fragment_mode()
-            samsung.request(samsung.illumination_setting(int(color.red * 10), int(color.green * 10), int(color.blue * 10)))
-            samsung.close()
+
+            def change(samsung: SamsungMXT40) -> None:
+                samsung.effect_fragment_mode()
+                samsung.request(samsung.illumination_setting(int(color.red * 10), int(color.green * 10), int(color.blue * 10)))
+
+            self.run(address, change)
         else:
             dialog.destroy()
 
-    def toggle_mute(samsung: SamsungMXT40) -> None:
-        samsung.connect()
-        samsung.effect_fragment_mode()
-        commands = samsung.request(samsung.toggle_mute())
-        samsung.request(samsung.connect_restart_req())
-        samsung.close()
+    def toggle_mute(self, address: str) -> None:
+        def change(samsung: SamsungMXT40) -> None:
+            samsung.effect_fragment_mode()
+            samsung.request(samsung.toggle_mute())
+            samsung.request(samsung.connect_restart_req())
+
+        self.run(address, change)
 
     def on_request_menu_items(self, manager_menu: ManagerDeviceMenu, device: Device, _powered: bool) -> List[DeviceMenuItem]:
         if self.name == device['Name']:
             _window = manager_menu.get_toplevel()
             assert isinstance(_window, Gtk.Window)
             window = _window  # https://github.com/python/mypy/issues/2608
+            self.window = window
 
             item_source = create_menuitem("Source", "audio-card")
             item_source.props.tooltip_text = "Select audio source"
             self.generate_source_menu(device, item_source)
-            samsung = self.devices[device['Address']]
+            address = device['Address']
 
             item_sound = create_menuitem("Change Sound Volume", "audio-speakers")
             item_sound.props.tooltip_text = "Change Sound Volume"
-            self.generate_sound_menu(samsung, item_sound)
+            self.generate_sound_menu(address, item_sound)
 
             item_light = create_txt_menuitem("Change Light")
             item_light.props.tooltip_text = "Change Light status"
-            self.generate_light_menu(samsung, item_light)
+            self.generate_light_menu(address, item_light)
 
             item_color = create_txt_menuitem("Change Color")
             item_color.props.tooltip_text = "Change color"
-            item_color.connect('activate', lambda x: SamsungMXT40Profile.color_picker(samsung, window))
+            item_color.connect('activate', lambda x: self.color_picker(address, window))
 
             item_dj_effect = create_txt_menuitem("Change DJ Effect")
             item_light.props.tooltip_text = "Change DJ Effect"
-            self.generate_dj_effect_menu(samsung, item_dj_effect)
+            self.generate_dj_effect_menu(address, item_dj_effect)
 
             item_bass_booster = create_txt_menuitem("Change Bass Booster")
             item_bass_booster.props.tooltip_text = "Change Bass Booster"
-            self.generate_bass_booster_menu(samsung, item_bass_booster)
+            self.generate_bass_booster_menu(address, item_bass_booster)
 
             item_toggle_mute = create_menuitem("Toggle Mute", "audio-volume-muted")
             item_toggle_mute.props.tooltip_text = "Toggle Mute Device"
-            item_toggle_mute.connect('activate', lambda x: SamsungMXT40Profile.toggle_mute(samsung))
+            item_toggle_mute.connect('activate', lambda x: self.toggle_mute(address))
 
             return [DeviceMenuItem(item_source, DeviceMenuItem.Group.ACTIONS, 500), DeviceMenuItem(item_sound, DeviceMenuItem.Group.ACTIONS, 500),
                     DeviceMenuItem(item_light, DeviceMenuItem.Group.ACTIONS, 500), DeviceMenuItem(item_color, DeviceMenuItem.Group.ACTIONS, 500),
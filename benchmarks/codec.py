@@ -0,0 +1,61 @@
+import time
+import tracemalloc
+
+from samsungmxt40 import SamsungMXT40, FrameEncoder, ResponseDecoder
+
+SOURCE_INFO = list(FrameEncoder().encode(1, 2, [49, 4]))
+SOUND_SETTING = list(FrameEncoder().encode(1, 3, [65, 6, 0, 8, 0]))
+CONNECT_INFO_PAYLOAD = [2, 1, 2, 40, 1, 4, 1, 2, 4, 5, 0, 9]
+CONNECT_INFO = FrameEncoder().encode(1, 1, CONNECT_INFO_PAYLOAD[:-1])
+
+def measure(function, duration):
+    """
+    Call a function repeatedly and measure its throughput and allocations
+
+    :param function: function encoding or decoding one frame
+    :type function: callable
+    :param duration: seconds to spend calling it
+    :type duration: float
+    :return: frames per second and bytes allocated per frame
+    :rtype: dict
+    """
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        for i in range(100):
+            function()
+        calls += 100
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    allocated = 0
+    for i in range(100):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        function()
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return {"frames_per_sec": calls / elapsed, "alloc_bytes_per_frame": allocated / 100}
+
+def benchmarks(duration):
+    """
+    Run the codec microbenchmarks
+
+    :param duration: seconds to spend on each benchmark
+    :type duration: float
+    :return: mapping of benchmark name to its measures
+    :rtype: mapping: dict(str, dict)
+    """
+    samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+    batch = SOURCE_INFO + SOUND_SETTING + SOURCE_INFO
+    responses = ResponseDecoder()
+    return {
+        "codec.getDataCommand": measure(lambda: samsung.illumination_setting(10, 5, 2), duration),
+        "codec.getDataCommand_constant": measure(lambda: samsung.source_info_req(), duration),
+        "codec.getCheckSum": measure(lambda: SamsungMXT40.getCheckSum(1, 7, 0, 5, [96, 2, 10, 5, 2]), duration),
+        "codec.splitCommand": measure(lambda: SamsungMXT40.splitCommand(batch), duration),
+        "codec.getPayloadData": measure(lambda: SamsungMXT40.getPayloadData(SOUND_SETTING), duration),
+        "codec.parse_connect_info": measure(lambda: samsung.parse_connect_info(CONNECT_INFO_PAYLOAD), duration),
+        "codec.decode_connect_info": measure(lambda: responses.decode(CONNECT_INFO), duration),
+        "codec.receive_source_info": measure(lambda: samsung.receive(bytes(SOURCE_INFO)), duration),
+    }
@@ -0,0 +1,68 @@
+#! /usr/bin/python
+
+import sys
+import json
+import argparse
+import platform
+
+from benchmarks import codec, scenarios
+
+# measures where a higher value is better, the others are better lower
+HIGHER_IS_BETTER = {"frames_per_sec"}
+
+def compare(baseline, results, threshold):
+    """
+    Find the measures which got worse than the baseline by more than threshold
+
+    :param baseline: results of a previous run
+    :type baseline: dict
+    :param results: results of this run
+    :type results: dict
+    :param threshold: relative change tolerated, 0.1 is 10%
+    :type threshold: float
+    :return: list of (benchmark, measure, baseline value, new value)
+    :rtype: list of tuple
+    """
+    regressions = []
+    for name, measures in results["results"].items():
+        for measure, value in measures.items():
+            old = baseline["results"].get(name, {}).get(measure)
+            if not old:
+                continue
+            change = (value - old) / old
+            if measure in HIGHER_IS_BETTER:
+                change = -change
+            if change > threshold:
+                regressions.append((name, measure, old, value))
+    return regressions
+
+ap = argparse.ArgumentParser(description="Benchmark the codec and end to end command latency")
+ap.add_argument("-o", "--output", required=False, help="Write the results to this JSON file")
+ap.add_argument("-c", "--compare", required=False, help="Baseline JSON file to compare the results with")
+ap.add_argument("-t", "--threshold", default=0.1, type=float, required=False, help="Relative change flagged as a regression")
+ap.add_argument("-d", "--duration", default=0.5, type=float, required=False, help="Seconds spent on each codec benchmark")
+ap.add_argument("-i", "--iterations", default=20, type=int, required=False, help="Runs of each end to end scenario")
+ap.add_argument("-l", "--latency", default=0.002, type=float, required=False, help="Seconds the simulator waits before each response")
+ap.add_argument("-j", "--jitter", default=0.0, type=float, required=False, help="Jitter of the simulator latency")
+ap.add_argument("-s", "--skip_e2e", required=False, action="store_true", help="Only run the codec benchmarks")
+args = vars(ap.parse_args())
+
+results = {"python": platform.python_version(), "results": codec.benchmarks(args["duration"])}
+if not args["skip_e2e"]:
+    results["results"].update(scenarios.benchmarks(args["iterations"], args["latency"], args["jitter"]))
+
+for name, measures in sorted(results["results"].items()):
+    print("%-35s %s" % (name, "  ".join("%s=%.3f" % measure for measure in sorted(measures.items()))))
+
+if args["output"] is not None:
+    with open(args["output"], "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+if args["compare"] is not None:
+    with open(args["compare"]) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, args["threshold"])
+    for name, measure, old, value in regressions:
+        print("REGRESSION %s %s %.3f -> %.3f" % (name, measure, old, value))
+    if regressions:
+        sys.exit(1)
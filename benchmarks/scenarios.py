@@ -0,0 +1,73 @@
+import time
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, ConnectionManager, CommandPlan
+
+def measure(function, iterations):
+    """
+    Time a scenario
+
+    :param function: function running the scenario once
+    :type function: callable
+    :param iterations: number of runs
+    :type iterations: int
+    :return: median and 95th percentile latency in milliseconds
+    :rtype: dict
+    """
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "median_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+def benchmarks(iterations, latency, jitter):
+    """
+    Run the end to end scenarios against the simulator
+
+    :param iterations: number of runs of each scenario
+    :type iterations: int
+    :param latency: seconds the simulator waits before each response
+    :type latency: float
+    :param jitter: maximum seconds added to or removed from latency
+    :type jitter: float
+    :return: mapping of scenario name to its measures
+    :rtype: mapping: dict(str, dict)
+    """
+    simulator = SamsungMXT40Simulator(latency=latency, jitter=jitter, seed=0)
+    samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False, transport=simulator.transport)
+    manager = ConnectionManager(idle_timeout=None, factory=lambda device: SamsungMXT40(device, transport=simulator.transport))
+
+    def handshake():
+        samsung.connect()
+        samsung.close()
+
+    def main_plan():
+        with manager.session(samsung.device) as session:
+            CommandPlan().lighting_status("PARTY").color(10, 0, 5).tempo(8).restart().run(session)
+
+    def blueman_status():
+        with manager.session(samsung.device) as session:
+            session.effect_fragment_mode()
+            session.request(session.status_setting("SOLID"))
+
+    def source_switch(source):
+        def run():
+            with manager.session(samsung.device) as session:
+                CommandPlan().source(source).run(session)
+        return run
+
+    results = {"e2e.handshake": measure(handshake, iterations)}
+    samsung.connect()
+    results["e2e.effect_fragment_mode"] = measure(lambda: samsung.effect_fragment_mode(force=True), iterations)
+    samsung.close()
+    results["e2e.main_plan"] = measure(main_plan, iterations)
+    results["e2e.blueman_status"] = measure(blueman_status, iterations)
+    results["e2e.source_switch_aux"] = measure(source_switch("AUX1"), iterations)
+    results["e2e.source_switch_usb"] = measure(source_switch("USB1"), iterations)
+    manager.close_all()
+    simulator.close()
+    return results
@@ -0,0 +1,22 @@
+#! /usr/bin/python
+
+import argparse
+import logging
+from samsungmxt40 import SamsungMXT40, ConnectionManager, ControllerDaemon, ProfileStore
+
+ap = argparse.ArgumentParser()
+ap.add_argument("-s", "--socket", required=False, help="Path of the control socket")
+ap.add_argument("-r", "--reader", required=False, action="store_true", help="Read the notifications of the towers in the background")
+ap.add_argument("-i", "--idle_timeout", required=False, type=float, help="Seconds after which an unused link gets closed, never by default")
+args = vars(ap.parse_args())
+
+logging.getLogger().setLevel(logging.INFO)
+profiles = ProfileStore()
+manager = ConnectionManager(idle_timeout=args["idle_timeout"], factory=lambda device: SamsungMXT40(device, profiles=profiles), reader=args["reader"])
+daemon = ControllerDaemon(args["socket"], manager)
+try:
+    daemon.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    daemon.shutdown()
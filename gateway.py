@@ -0,0 +1,19 @@
+#! /usr/bin/python
+
+import asyncio
+import argparse
+import logging
+from samsungmxt40 import AsyncSamsungMXT40, HttpGateway, ProfileStore
+
+ap = argparse.ArgumentParser()
+ap.add_argument("-H", "--host", default="127.0.0.1", required=False, help="Address to listen on")
+ap.add_argument("-p", "--port", default=8080, required=False, type=int, help="TCP port to listen on")
+args = vars(ap.parse_args())
+
+logging.getLogger().setLevel(logging.INFO)
+profiles = ProfileStore()
+gateway = HttpGateway(args["host"], args["port"], factory=lambda device: AsyncSamsungMXT40(device, profiles=profiles))
+try:
+    asyncio.run(gateway.serve_forever())
+except KeyboardInterrupt:
+    pass
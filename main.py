@@ -2,132 +2,83 @@
 
 import argparse
 import logging
-from samsungmxt40 import SamsungMXT40
+from samsungmxt40 import SamsungMXT40, ConnectionManager, CommandPlan, Fleet, ProfileStore, Scene, Metrics, TraceRecorder, ControllerClient
 
 ap = argparse.ArgumentParser()
-ap.add_argument("-ls", "--lighting_status", required=False, help="OFF,AMBIENT,PARTY,DANCE,THUNDER,STAR,LOVER,SOLID")
-ap.add_argument("-c", "--color", required=False, help="RGB separated by comma")
-ap.add_argument("-t", "--tempo", required=False, type=int, help="Tempo Data")
-ap.add_argument("-dj", "--dj_effect", required=False, help="DJ Effect and value separated by comma OFF,DELAY,FILTER,FLANGER,CHORUS,WAHWAH min/med/max is 1/15/30")
-ap.add_argument("-b", "--bass_booster", required=False, help="ON,OFF")
-ap.add_argument("-sd", "--sound", required=False, help="MORE,LESS")
+for spec in SamsungMXT40.options:
+    spec.add_argument(ap)
+ap.add_argument("-v", "--volume", required=False, type=int, help="Volume level to reach")
 ap.add_argument("-m", "--mute", required=False, action="store_true", help="Toggle mute")
-ap.add_argument("-so", "--source", required=False, help="BT,USB,AUX1,AUX2")
+ap.add_argument("-sc", "--scene", required=False, help="Name of a scene of the scenes file")
+ap.add_argument("-sf", "--scenes_file", default="scenes.json", required=False, help="JSON or TOML file of scenes")
 ap.add_argument("-o", "--on_off", required=False, action="store_true", help="Turn on/off device")
 ap.add_argument("-d", "--device", default="2C:FD:B3:E6:D1:08", required=False, help="serverMacAddress")
+ap.add_argument("-ds", "--devices", required=False, help="serverMacAddress of several devices separated by comma")
+ap.add_argument("-df", "--devices_file", required=False, help="File with one serverMacAddress per line")
+ap.add_argument("-mf", "--metrics_file", required=False, help="File to write the link metrics to, in the Prometheus text format")
+ap.add_argument("-tf", "--trace_file", required=False, help="File to record the frames sent and received to")
+ap.add_argument("-s", "--socket", required=False, help="Control socket of the daemon")
+ap.add_argument("-l", "--local", required=False, action="store_true", help="Connect to the towers even if the daemon is running")
+ap.add_argument("-w", "--workers", default=4, required=False, type=int, help="Number of devices driven at the same time")
 args = vars(ap.parse_args())
 
-lighting_status = args["lighting_status"]
-
-try:
-    color = list(map(int, args["color"].split(",")))
-except:
-    color = None
-
-tempo = args["tempo"]
-
-try:
-    dj_effect = args["dj_effect"].split(",")
-except:
-    dj_effect = None
-
-bass_booster = args["bass_booster"]
-
-sound = args["sound"]
-
-source = args["source"]
-
-device  = args["device"]
+devices = []
+if args["devices"] is not None:
+    devices += [device.strip() for device in args["devices"].split(",") if device.strip()]
+if args["devices_file"] is not None:
+    devices += Fleet.load_devices(args["devices_file"])
+if not devices:
+    devices = [args["device"]]
+
+steps = {spec.action: args[spec.action] for spec in SamsungMXT40.options if args[spec.action] is not None}
+if args["volume"] is not None:
+    steps["volume"] = [args["volume"]]
+if args["mute"]:
+    steps["mute"] = []
+if args["scene"] is not None:
+    scenes = Scene.load(args["scenes_file"])
+    if args["scene"] not in scenes:
+        ap.error("unknown scene %r, %s has %s" % (args["scene"], args["scenes_file"], ", ".join(sorted(scenes)) or "none"))
+    scene = scenes[args["scene"]]
+    steps["scene"] = [scene.name, scene.settings]
+if args["on_off"]:
+    steps["on_off"] = []
 
 #logging.getLogger().setLevel(logging.DEBUG)
-samsung = SamsungMXT40(device)
-samsung.load_source_info()
-
-if lighting_status is not None:
-    samsung.effect_fragment_mode()
-    print("send lighting status")
-    for command in samsung.request(samsung.status_setting(lighting_status)):
-        payload = SamsungMXT40.getPayloadData(command)
-
-if color is not None:
-    samsung.effect_fragment_mode()
-    print("send color")
-    for command in samsung.request(samsung.illumination_setting(color[0], color[1], color[2])):
-        payload = SamsungMXT40.getPayloadData(command)
-
-if tempo is not None:
-    samsung.effect_fragment_mode()
-    print("send tempo data")
-    for command in samsung.request(samsung.tempo(tempo)):
-        payload = SamsungMXT40.getPayloadData(command)
+plan = CommandPlan()
 
-if dj_effect is not None:
-    samsung.effect_fragment_mode()
-    print("send dj effect")
-    for command in samsung.request(samsung.change_dj_effect(dj_effect[0], int(dj_effect[1]))):
-        payload = SamsungMXT40.getPayloadData(command)
+for action in CommandPlan.actions:
+    if action in steps:
+        print("send %s" % action.replace("_", " "))
+        plan.add(action, *steps[action])
 
-if bass_booster is not None:
-    samsung.effect_fragment_mode()
-    print("send bass booster")
-    if (bass_booster == "ON"):
-        commands = samsung.request(samsung.bass_booster_on())
-    elif (bass_booster == "OFF"):
-        commands = samsung.request(samsung.bass_booster_off())
-    for command in commands:
-        payload = SamsungMXT40.getPayloadData(command)
+client = ControllerClient(args["socket"])
+if not args["local"] and args["metrics_file"] is None and args["trace_file"] is None and client.is_running():
+    results = client.run(devices, plan, workers=args["workers"])
+    for result in results:
+        print(result)
+    raise SystemExit(0 if all(result.ok for result in results) else 1)
 
-if sound is not None:
-    samsung.effect_fragment_mode()
-    print("send sound")
-    if (sound == "MORE"):
-        commands = samsung.request(samsung.sound_more())
-    elif (sound == "LESS"):
-        commands = samsung.request(samsung.sound_less())
-    for command in commands:
-        payload = SamsungMXT40.getPayloadData(command)
+if not args["on_off"]:
+    print("connect_link_restart")
+    plan.restart()
 
-if args["mute"]:
-    samsung.effect_fragment_mode()
-    print("toggle mute")
-    for command in samsung.request(samsung.toggle_mute()):
-        payload = SamsungMXT40.getPayloadData(command)
+profiles = ProfileStore()
+metrics = Metrics() if args["metrics_file"] is not None else None
+trace = TraceRecorder(args["trace_file"]) if args["trace_file"] is not None else None
+manager = ConnectionManager(factory=lambda device: SamsungMXT40(device, profiles=profiles, metrics=metrics, trace=trace))
+fleet = Fleet(devices, workers=args["workers"], manager=manager)
+results = fleet.run(plan)
+for result in results:
+    print(result)
 
-if source is not None:
-    print("source_switch")
-    for command in samsung.request(samsung.source_switch(source)):
-        payload = SamsungMXT40.getPayloadData(command)
-    if (source.startswith("AUX")):
-        print("sound_setting_info")
-        for command in samsung.request(samsung.sound_setting_info_req(7)):
-            payload = SamsungMXT40.getPayloadData(command)
-        print("sound_setting_info")
-        for command in samsung.request(samsung.sound_setting_info_req(1)):
-            payload = SamsungMXT40.getPayloadData(command)
-        print("aux_state_req")
-        for command in samsung.request(samsung.aux_state_req()):
-            payload = SamsungMXT40.getPayloadData(command)
-    print("usb_playtime_enable")
-    if (source == "USB"):
-        commands = samsung.request(samsung.usb_playtime_enable(1))
-    else:
-        commands = samsung.request(samsung.usb_playtime_enable(0))
-    for command in commands:
-        payload = SamsungMXT40.getPayloadData(command)
-    if (source == "USB"):
-        print("usb_status_info_req")
-        for command in samsung.request(samsung.usb_status_info_req()):
-            payload = SamsungMXT40.getPayloadData(command)
+fleet.close()
 
-if args["on_off"]:
-    samsung.remote_control_mode()
-    print("toggle on_off")
-    commands = samsung.request(samsung.toggle_on_off())
-else:
-    print("connect_link_restart")
-    commands = samsung.request(samsung.connect_restart_req())
+if metrics is not None:
+    metrics.write(args["metrics_file"])
 
-for command in commands:
-    payload = SamsungMXT40.getPayloadData(command)
+if trace is not None:
+    trace.close()
 
-samsung.close()
+if not all(result.ok for result in results):
+    raise SystemExit(1)
@@ -0,0 +1,631 @@
+import time
+import socket
+import asyncio
+import logging
+
+import bluetooth
+
+from samsungmxt40.SamsungMXT40 import SamsungMXT40
+from samsungmxt40.ResponseDecoder import SourceInfo, SoundSetting, SystemSetting, UsbStatus, AuxState
+from samsungmxt40.SessionReader import SessionReader
+from samsungmxt40.TraceRecorder import TraceRecorder
+
+class AsyncSamsungMXT40(SamsungMXT40):
+    """
+    Asyncio bluetooth communication with Samsung MX-T40 Sound Tower
+
+    The command builders are the ones of :class:`SamsungMXT40`, the methods
+    doing input/output are coroutines working on a non-blocking socket so
+    one event loop can drive many towers.
+
+    Usage::
+
+        async with AsyncSamsungMXT40("2C:FD:B3:E6:D1:08") as samsung:
+            await samsung.effect_fragment_mode()
+            await samsung.request(samsung.status_setting("PARTY"))
+
+    :param device: The device MAC Address.
+    :type device: str
+    :param transport: callable opening the socket to the device for a MAC Address and a RFCOMM channel, RFCOMM by default
+    :type transport: callable
+    :param profiles: store of the channel and connect info of the devices already seen, none by default
+    :type profiles: ProfileStore
+    :param metrics: link statistics to record into, none by default
+    :type metrics: Metrics
+    :param trace: recorder of the frames sent and received, none by default
+    :type trace: TraceRecorder
+    :var lock: lock serializing the requests sent on the socket
+    :vartype lock: asyncio.Lock
+    """
+
+    class Reader(SessionReader):
+        """
+        Read the socket of an asynchronous session in a task of the event loop
+
+        The task reads while no request holds the lock of the session and
+        publishes the records received to the subscribers. The commands a
+        pipeline reads without matching any of its own are published too.
+
+        :param samsung: the connected session to read
+        :type samsung: AsyncSamsungMXT40
+        :param poll_interval: seconds a read holds the lock of the session
+        :type poll_interval: float
+        """
+
+        def __init__(self, samsung, poll_interval=0.1):
+            super().__init__(samsung, poll_interval)
+            self.task = None
+
+        def start(self):
+            """
+            Start the reader task in the running event loop, stopping the previous one
+            """
+            self.stop()
+            self.task = asyncio.get_running_loop().create_task(self._read())
+
+        def stop(self):
+            """
+            Cancel the reader task
+            """
+            if self.task is not None:
+                self.task.cancel()
+                self.task = None
+
+        def is_alive(self):
+            """
+            Tell if the reader task is still reading the socket
+
+            :rtype: bool
+            """
+            return self.task is not None and not self.task.done()
+
+        async def _read(self):
+            """
+            Read and publish the commands until cancelled or the socket closes
+            """
+            samsung = self.samsung
+            while samsung.is_connected():
+                async with samsung.lock:
+                    try:
+                        chunk = await samsung.readBluetooth(self.poll_interval)
+                    except OSError as e:
+                        logging.warning("Reader of %s stopped: %s", samsung.device, e)
+                        samsung.link_error = e
+                        return
+                if chunk is None:
+                    continue
+                if not chunk:
+                    logging.info("Reader of %s stopped, connection closed", samsung.device)
+                    samsung.link_error = ConnectionResetError("Connection closed by %s" % samsung.device)
+                    return
+                for command in samsung.decoder.decode(chunk):
+                    response = samsung.receive(bytes(command))
+                    if response is not None:
+                        self.publish(response)
+
+    def __init__(self, device, transport=None, profiles=None, metrics=None, trace=None):
+        """
+        Init the session, the connection is opened by :meth:`connect`
+
+        :param device: The device MAC Address.
+        :type device: str
+        :param transport: callable opening the socket to the device for a MAC Address and a RFCOMM channel, RFCOMM by default
+        :type transport: callable
+        :param profiles: store of the channel and connect info of the devices already seen, none by default
+        :type profiles: ProfileStore
+        :param metrics: link statistics to record into, none by default
+        :type metrics: Metrics
+        :param trace: recorder of the frames sent and received, none by default
+        :type trace: TraceRecorder
+        """
+        super().__init__(device, connect=False, transport=transport, profiles=profiles, metrics=metrics, trace=trace)
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        if self.is_connected():
+            self.close()
+
+    def __aiter__(self):
+        return self.frames()
+
+    def start_reader(self, poll_interval=0.1):
+        """
+        Read the socket continuously in a task of the running event loop
+
+        The reader publishes the notifications the device sends on its own
+        to the subscribers. It survives :meth:`close` and restarts on
+        :meth:`connect`.
+
+        :param poll_interval: seconds a read holds the lock of the session
+        :type poll_interval: float
+        :return: the reader
+        :rtype: AsyncSamsungMXT40.Reader
+        """
+        if self.reader is None:
+            self.reader = AsyncSamsungMXT40.Reader(self, poll_interval)
+        if self.is_connected():
+            self.reader.start()
+        return self.reader
+
+    async def open_socket(self, channel):
+        """
+        Open a non-blocking RFCOMM socket on a channel
+
+        :param channel: RFCOMM channel
+        :type channel: int
+        :return: the connected socket
+        :rtype: socket
+        """
+        loop = asyncio.get_running_loop()
+        if self.transport is not None:
+            sock = await loop.run_in_executor(None, self.transport, self.device, channel)
+            sock.setblocking(False)
+        elif hasattr(socket, "AF_BLUETOOTH"):
+            sock = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (self.device, channel)), self.connect_timeout)
+            except (OSError, asyncio.TimeoutError):
+                sock.close()
+                raise
+        else:
+            # python built without bluetooth support, connect with pybluez in a thread
+            sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+            try:
+                sock.settimeout(self.connect_timeout)
+                await loop.run_in_executor(None, sock.connect, (self.device, channel))
+            except (OSError, bluetooth.btcommon.BluetoothError):
+                sock.close()
+                raise
+            sock.setblocking(False)
+        return sock
+
+    async def connect(self):
+        """
+        Open bluetooth connection, see :meth:`SamsungMXT40.connect`
+        """
+        started = time.monotonic()
+        profile = self.profiles.get(self.device) if self.profiles is not None else None
+        channel = await self.open_channel(profile)
+        self.decoder.reset()
+        self.mode = None
+        self.link_error = None
+        if profile is not None and profile["channel"] == channel:
+            self.apply_profile(profile)
+            logging.debug("connect_req, connect_link_complete")
+            responses = (await self.pipeline([self.connect_req(), self.connect_link_complete()], decoded=True))[0]
+        else:
+            logging.debug("connect_req")
+            responses = await self.request(self.connect_req(), decoded=True)
+            logging.debug("connect_link_complete")
+            await self.request(self.connect_link_complete())
+        self.save_profile(channel, responses)
+        if self.reader is not None:
+            self.reader.start()
+        if self.metrics is not None:
+            self.metrics.connected(self.device, time.monotonic() - started)
+
+    async def open_channel(self, profile):
+        """
+        Open the socket on the first channel answering
+
+        :param profile: profile of the device, None if unknown
+        :type profile: dict
+        :return: the channel opened
+        :rtype: int
+        """
+        channels = SamsungMXT40.channelOrder(profile)
+        for channel in channels[:-1]:
+            try:
+                self.socket = await self.open_socket(channel)
+                return channel
+            except (OSError, asyncio.TimeoutError, bluetooth.btcommon.BluetoothError) as e:
+                logging.info("Channel %d of %s failed: %s", channel, self.device, e)
+        self.socket = await self.open_socket(channels[-1])
+        return channels[-1]
+
+    async def ping(self):
+        """
+        Check the link is still answering by doing a source info request
+
+        :return: True if the device answered
+        :rtype: bool
+        """
+        if not self.is_connected():
+            return False
+        try:
+            return len(await self.request(self.source_info_req())) > 0
+        except (OSError, bluetooth.btcommon.BluetoothError):
+            return False
+
+    async def request(self, array, expected=1, timeout=None, decoded=False):
+        """
+        Send a command to the device and return all the responses separated
+
+        See :meth:`SamsungMXT40.request`.
+
+        :param array: bytes to send to the device
+        :type array: array of bytes
+        :param expected: number of commands the device answers
+        :type expected: int
+        :param timeout: seconds to wait for the answer, request_timeout by default
+        :type timeout: float
+        :param decoded: return the records decoded instead of the commands
+        :type decoded: bool
+        :return: the commands received, checksum verified, or their records
+        :rtype: list of bytes or list of Response
+        """
+        if timeout is None:
+            timeout = self.request_timeout
+        async with self.lock:
+            await self.writeBluetooth(array)
+            start = time.monotonic()
+            deadline = start + timeout
+            commands = []
+            responses = []
+            while True:
+                if len(commands) >= expected:
+                    chunk = await self.readBluetooth(0)
+                else:
+                    chunk = await self.readBluetooth(deadline - time.monotonic())
+                if not chunk:
+                    break
+                for command in self.decoder.decode(chunk):
+                    command = bytes(command)
+                    response = self.receive(command)
+                    if command[3] == array[3] or len(commands) < expected:
+                        commands.append(command)
+                        responses.append(response)
+                    else:
+                        self.unexpected(command, response)
+        self.last_activity = time.monotonic()
+        self.last_request_wait = self.last_activity - start
+        if len(commands) < expected:
+            logging.warning("Request timed out after %.3fs with %d/%d commands", self.last_request_wait, len(commands), expected)
+            if self.metrics is not None:
+                self.metrics.timeout(self.device)
+        if decoded:
+            return [response for response in responses if response is not None]
+        return commands
+
+    async def pipeline(self, commands, window=None, timeout=None, decoded=False):
+        """
+        Send several commands back to back and return the responses of each
+
+        See :meth:`SamsungMXT40.pipeline`.
+
+        :param commands: bytes of each command to send to the device
+        :type commands: list of bytes
+        :param window: maximum number of commands waiting for a response, pipeline_window by default, at most 255
+        :type window: int
+        :param timeout: seconds to wait for the next response, request_timeout by default
+        :type timeout: float
+        :param decoded: return the records decoded instead of the commands
+        :type decoded: bool
+        :return: the commands received for each command sent, or their records
+        :rtype: list of list of bytes or list of list of Response
+        """
+        if window is None:
+            window = self.pipeline_window
+        if timeout is None:
+            timeout = self.request_timeout
+        window = max(1, min(window, 255))
+        replies = [[] for command in commands]
+        responses = [[] for command in commands]
+        sequences = {}
+        in_flight = {}
+        sent = 0
+        async with self.lock:
+            start = time.monotonic()
+            deadline = start + timeout
+            while in_flight or sent < len(commands):
+                burst = []
+                while sent < len(commands) and len(in_flight) < window and commands[sent][3] not in in_flight:
+                    command = commands[sent]
+                    sequences[command[3]] = sent
+                    in_flight[command[3]] = sent
+                    burst.append(command)
+                    sent += 1
+                if len(burst) > 1 and not self.max_frame_rate:
+                    await self.writeFrames(burst)
+                else:
+                    for command in burst:
+                        await self.writeBluetooth(command)
+                chunk = await self.readBluetooth(deadline - time.monotonic())
+                if not chunk:
+                    logging.warning("Pipeline timed out with %d commands unanswered", len(in_flight) + len(commands) - sent)
+                    if self.metrics is not None:
+                        self.metrics.timeout(self.device)
+                    break
+                for command in self.decoder.decode(chunk):
+                    index = SamsungMXT40.matchCommand(command, sequences, in_flight)
+                    command = bytes(command)
+                    response = self.receive(command)
+                    if index is not None:
+                        replies[index].append(command)
+                        responses[index].append(response)
+                    else:
+                        self.unexpected(command, response)
+                deadline = time.monotonic() + timeout
+        self.last_activity = time.monotonic()
+        self.last_request_wait = self.last_activity - start
+        if decoded:
+            return [[response for response in answer if response is not None] for answer in responses]
+        return replies
+
+    async def frames(self):
+        """
+        Iterate over the commands received from the device
+
+        :return: asynchronous generator of commands
+        :rtype: async generator of bytes
+        """
+        while self.is_connected():
+            chunk = await self.readBluetooth()
+            if not chunk:
+                return
+            for command in self.decoder.decode(chunk):
+                command = bytes(command)
+                self.receive(command)
+                yield command
+
+    async def readCommands(self, timeout):
+        """
+        Wait for the next commands received
+
+        :param timeout: seconds to wait, return right away if 0 or less
+        :type timeout: float
+        :return: the commands received and their records, empty if nothing arrived in time
+        :rtype: list of tuple(bytes, Response)
+        """
+        deadline = time.monotonic() + timeout
+        received = []
+        async with self.lock:
+            while not received:
+                chunk = await self.readBluetooth(deadline - time.monotonic())
+                if not chunk:
+                    break
+                for command in self.decoder.decode(chunk):
+                    command = bytes(command)
+                    received.append((command, self.receive(command)))
+        return received
+
+    async def readBluetooth(self, timeout=None):
+        """
+        Read socket bluetooth and send it back
+
+        :param timeout: seconds to wait for data, wait forever if None
+        :type timeout: float
+        :return: bytes to receive from the device, None if nothing arrived in time
+        :rtype: bytes
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if timeout is None:
+                response = await loop.sock_recv(self.socket, 1024)
+            elif timeout <= 0:
+                response = self.socket.recv(1024)
+            else:
+                response = await asyncio.wait_for(loop.sock_recv(self.socket, 1024), timeout)
+        except (asyncio.TimeoutError, BlockingIOError, bluetooth.btcommon.BluetoothError):
+            return None
+        if response and self.metrics is not None:
+            self.metrics.read(self.device, len(response))
+        logging.debug("Read %s", response)
+        return response
+
+    async def writeBluetooth(self, request):
+        """
+        Write request on the socket bluetooth
+
+        :param request: bytes to send to the device
+        :type request: array of bytes
+        """
+        if self.max_frame_rate:
+            wait = self.last_write + 1.0 / self.max_frame_rate - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        self.state.sent(request)
+        if self.trace is not None:
+            self.trace.record(TraceRecorder.OUT, request)
+        await asyncio.get_running_loop().sock_sendall(self.socket, request)
+        self.last_write = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.sent(self.device, request)
+
+    async def writeFrames(self, requests):
+        """
+        Write several requests on the socket bluetooth in one send
+
+        Returns once the socket took the whole burst, which drains it
+        before the pipeline reads the answers and writes the next one.
+
+        :param requests: bytes of each command to send to the device
+        :type requests: list of bytes
+        """
+        for request in requests:
+            self.state.sent(request)
+            if self.trace is not None:
+                self.trace.record(TraceRecorder.OUT, request)
+        await asyncio.get_running_loop().sock_sendall(self.socket, b"".join(requests))
+        self.last_write = time.monotonic()
+        if self.metrics is not None:
+            for request in requests:
+                self.metrics.sent(self.device, request)
+
+    async def fetch(self, record, setting, builder, max_age=None):
+        """
+        Return a record from the state cache, requesting it from the device if it is not fresh
+
+        :param record: record class
+        :type record: class
+        :param setting: setting number of the sound and system settings
+        :type setting: int
+        :param builder: command builder asking the device for the record, called with the setting number if any
+        :type builder: callable
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the record, None if the device did not send it
+        :rtype: Response
+        """
+        response = self.state.get(record, setting, max_age)
+        if response is not None:
+            return response
+        command = builder() if setting is None else builder(setting)
+        for response in await self.request(command, decoded=True):
+            if isinstance(response, record) and getattr(response, "setting", None) == setting:
+                return response
+        return None
+
+    async def get_source(self, max_age=None):
+        """
+        Current source, from the cache when fresh
+
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the source info, None if the device did not answer
+        :rtype: SourceInfo
+        """
+        return await self.fetch(SourceInfo, None, self.source_info_req, max_age)
+
+    async def get_sound_setting(self, setting, max_age=None):
+        """
+        Values of a sound setting, from the cache when fresh
+
+        :param setting: sound setting number, 4 bass booster, 5 dj effect, 6 tempo...
+        :type setting: int
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the sound setting, None if the device did not answer
+        :rtype: SoundSetting
+        """
+        return await self.fetch(SoundSetting, setting, self.sound_setting_info_req, max_age)
+
+    async def get_system_setting(self, setting, max_age=None):
+        """
+        Values of a system setting, from the cache when fresh
+
+        :param setting: system setting number, 3 light status
+        :type setting: int
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the system setting, None if the device did not answer
+        :rtype: SystemSetting
+        """
+        return await self.fetch(SystemSetting, setting, self.system_setting_info_req, max_age)
+
+    async def get_usb_status(self, max_age=None):
+        """
+        USB player status, from the cache when fresh
+
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the usb status, None if the device did not answer
+        :rtype: UsbStatus
+        """
+        return await self.fetch(UsbStatus, None, self.usb_status_info_req, max_age)
+
+    async def get_aux_state(self, max_age=None):
+        """
+        AUX input state, from the cache when fresh
+
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the aux state, None if the device did not answer
+        :rtype: AuxState
+        """
+        return await self.fetch(AuxState, None, self.aux_state_req, max_age)
+
+    async def get_volume(self, max_age=None):
+        """
+        Current volume, from the cache when fresh
+
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the volume, None if the device did not answer
+        :rtype: int
+        """
+        return SamsungMXT40.volumeOf(await self.get_sound_setting(SamsungMXT40.VOLUME_SETTING, max_age))
+
+    async def set_volume(self, target):
+        """
+        Move the volume to a level in one pipelined burst of steps
+
+        :param target: volume wanted, clamped to 0..MAX_VOLUME
+        :type target: int
+        :return: the volume reported by the device afterwards, None if unknown
+        :rtype: int
+        """
+        current = await self.get_volume()
+        if current is None:
+            logging.warning("Volume unknown, not changing it")
+            return None
+        commands = self.volumeCommands(current, target)
+        if not commands:
+            return current
+        await self.pipeline(commands, window=len(commands))
+        return SamsungMXT40.volumeOf(self.state.get(SoundSetting, SamsungMXT40.VOLUME_SETTING, float("inf")))
+
+    async def change_volume(self, delta):
+        """
+        Move the volume by a number of steps in one pipelined burst
+
+        The deltas requested by other tasks while a burst is being sent are
+        merged and sent as one more burst once it is over.
+
+        :param delta: number of steps, negative to lower the volume
+        :type delta: int
+        :return: the volume reported by the device afterwards, None if unknown or merged into the burst of another task
+        :rtype: int
+        """
+        self.volume_delta += delta
+        if self.volume_busy:
+            return None
+        self.volume_busy = True
+        volume = None
+        try:
+            while self.volume_delta:
+                delta = self.volume_delta
+                self.volume_delta = 0
+                current = await self.get_volume()
+                if current is None:
+                    logging.warning("Volume unknown, dropping %d steps", delta)
+                    return None
+                volume = await self.set_volume(current + delta)
+            return volume
+        finally:
+            self.volume_busy = False
+
+    async def load_source_info(self):
+        """
+        Reload source info
+        """
+        await self.pipeline([self.source_info_req(), self.usb_playtime_enable(0)])
+
+    async def effect_fragment_mode(self, force=False):
+        """
+        Switch to effect fragment mode, unless the link is already in it
+
+        :param force: send the mode switch even if the link is already in the mode
+        :type force: bool
+        """
+        if self.mode == SamsungMXT40.EFFECT_FRAGMENT_MODE and not force:
+            return
+        replies = await self.pipeline(self.effectFragmentCommands())
+        self.mode = SamsungMXT40.EFFECT_FRAGMENT_MODE if all(replies) else None
+
+    async def remote_control_mode(self, force=False):
+        """
+        Switch to remote control mode, unless the link is already in it
+
+        :param force: send the mode switch even if the link is already in the mode
+        :type force: bool
+        """
+        if self.mode == SamsungMXT40.REMOTE_CONTROL_MODE and not force:
+            return
+        replies = await self.pipeline(self.remoteControlCommands())
+        self.mode = SamsungMXT40.REMOTE_CONTROL_MODE if all(replies) else None
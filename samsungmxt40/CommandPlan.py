@@ -0,0 +1,386 @@
+import logging
+import threading
+
+from samsungmxt40.Scene import Scene
+
+class CommandPlan:
+    """
+    Ordered list of actions to apply on a device
+
+    Each step is an action name and its arguments so a plan can be built
+    once, serialized and run against any number of devices.
+
+    Usage::
+
+        plan = CommandPlan().lighting_status("PARTY").color(10, 0, 5).restart()
+        plan.run(samsung)
+
+    :param steps: list of (action name, arguments)
+    :type steps: list of tuple(str, list)
+    :var actions: mapping of action name to the method running it on a session, in the order main.py adds them
+    :vartype actions: mapping: dict(str, str)
+    """
+
+    actions = {
+        "lighting_status": "run_lighting_status",
+        "color": "run_color",
+        "tempo": "run_tempo",
+        "dj_effect": "run_dj_effect",
+        "bass_booster": "run_bass_booster",
+        "sound": "run_sound",
+        "volume": "run_volume",
+        "mute": "run_mute",
+        "source": "run_source",
+        "scene": "run_scene",
+        "on_off": "run_on_off",
+        "restart": "run_restart",
+    }
+
+    def __init__(self, steps=None):
+        """
+        Init the plan
+
+        :param steps: list of (action name, arguments)
+        :type steps: list of tuple(str, list)
+        """
+        self.steps = []
+        self.scenes = {}
+        self.scenes_lock = threading.Lock()
+        for name, args in steps or []:
+            self.add(name, *args)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def add(self, name, *args):
+        """
+        Append a step to the plan
+
+        :param name: action name
+        :type name: str
+        :param args: arguments of the action
+        :type args: list
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        if name not in CommandPlan.actions:
+            raise ValueError("Unknown action %s" % name)
+        self.steps.append((name, list(args)))
+        return self
+
+    def lighting_status(self, status):
+        """
+        Append a light status change
+
+        :param status: light status name
+        :type status: str
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("lighting_status", status)
+
+    def color(self, r, g, b):
+        """
+        Append a color change
+
+        :param r: red color
+        :type r: int
+        :param g: green color
+        :type g: int
+        :param b: blue color
+        :type b: int
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("color", r, g, b)
+
+    def tempo(self, value):
+        """
+        Append a tempo change
+
+        :param value: tempo value
+        :type value: int
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("tempo", value)
+
+    def dj_effect(self, effect, value):
+        """
+        Append a dj effect change
+
+        :param effect: effect name
+        :type effect: str
+        :param value: value of the effect to apply
+        :type value: int
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("dj_effect", effect, value)
+
+    def bass_booster(self, state):
+        """
+        Append a bass booster change
+
+        :param state: ON or OFF
+        :type state: str
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("bass_booster", state)
+
+    def sound(self, direction):
+        """
+        Append a sound step
+
+        :param direction: MORE or LESS
+        :type direction: str
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("sound", direction)
+
+    def volume(self, target):
+        """
+        Append a volume change to an absolute level
+
+        :param target: volume wanted
+        :type target: int
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("volume", target)
+
+    def mute(self):
+        """
+        Append a mute toggle
+
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("mute")
+
+    def source(self, source):
+        """
+        Append a source switch
+
+        :param source: source name
+        :type source: str
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("source", source)
+
+    def on_off(self):
+        """
+        Append a power toggle
+
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("on_off")
+
+    def restart(self):
+        """
+        Append a connection restart request
+
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("restart")
+
+    def scene(self, scene):
+        """
+        Append a scene, sent in one write
+
+        :param scene: the scene
+        :type scene: Scene
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return self.add("scene", scene.name, scene.settings)
+
+    def to_list(self):
+        """
+        Serialize the plan
+
+        :return: list of [action name, arguments]
+        :rtype: list
+        """
+        return [[name, list(args)] for name, args in self.steps]
+
+    def from_list(steps):
+        """
+        Deserialize a plan
+
+        :param steps: list of [action name, arguments]
+        :type steps: list
+        :return: the plan
+        :rtype: CommandPlan
+        """
+        return CommandPlan([(name, args) for name, args in steps])
+
+    def run(self, samsung):
+        """
+        Apply every step of the plan on a connected session
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received for each step
+        :rtype: list of list of bytes
+        """
+        replies = []
+        for name, args in self.steps:
+            logging.info("%s %s", name, args)
+            replies.append(getattr(self, CommandPlan.actions[name])(samsung, *args))
+        return replies
+
+    def run_lighting_status(self, samsung, status):
+        """
+        Change the light status
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.status_setting(status))
+
+    def run_color(self, samsung, r, g, b):
+        """
+        Change the color
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.illumination_setting(r, g, b))
+
+    def run_tempo(self, samsung, value):
+        """
+        Change the tempo
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.tempo(value))
+
+    def run_dj_effect(self, samsung, effect, value):
+        """
+        Change the dj effect
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.change_dj_effect(effect, value))
+
+    def run_bass_booster(self, samsung, state):
+        """
+        Turn the bass booster on or off
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.bass_booster(state))
+
+    def run_sound(self, samsung, direction):
+        """
+        Turn the sound up or down one step
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.sound(direction))
+
+    def run_volume(self, samsung, target):
+        """
+        Move the volume to a level in one burst
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the volume reported by the device
+        :rtype: list of int
+        """
+        samsung.effect_fragment_mode()
+        volume = samsung.set_volume(target)
+        return [] if volume is None else [volume]
+
+    def run_mute(self, samsung):
+        """
+        Toggle mute
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.effect_fragment_mode()
+        return samsung.request(samsung.toggle_mute())
+
+    def run_source(self, samsung, source):
+        """
+        Switch the source and send the requests following it
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        return [command for replies in samsung.pipeline(samsung.sourceSwitchCommands(source)) for command in replies]
+
+    def run_on_off(self, samsung):
+        """
+        Toggle on or off the device
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        samsung.remote_control_mode()
+        return samsung.request(samsung.toggle_on_off())
+
+    def run_restart(self, samsung):
+        """
+        Send a connection restart request
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        return samsung.request(samsung.connect_restart_req())
+
+    def run_scene(self, samsung, name, settings):
+        """
+        Apply a scene, compiled on its first run, the Fleet workers share the compiled scenes
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received
+        :rtype: list of bytes
+        """
+        with self.scenes_lock:
+            scene = self.scenes.get(name)
+            if scene is None or scene.settings != settings:
+                scene = self.scenes[name] = Scene(name, settings)
+            scene.compile()
+        return [command for replies in scene.apply(samsung) for command in replies]
@@ -0,0 +1,191 @@
+import queue
+import logging
+import itertools
+import threading
+from concurrent.futures import Future
+
+class CommandScheduler:
+    """
+    Single writer in front of a session, running the commands of many threads one at a time
+
+    A writer thread drains a priority queue so the frames of two callers
+    never interleave on the socket and each caller gets back a future
+    holding its own replies. The callers queue the name of a builder and
+    its arguments, the frame is built and stamped with its sequence number
+    by the writer thread. User facing commands, power or mute, jump ahead
+    of bulk lighting updates::
+
+        scheduler = CommandScheduler(samsung, max_frame_rate=20)
+        future = scheduler.submit("toggle_mute")
+        replies = future.result()
+
+    :param samsung: the connected session
+    :type samsung: SamsungMXT40
+    :param max_frame_rate: maximum number of commands written per second, unlimited if None
+    :type max_frame_rate: float
+    :var PRIORITY_HIGH: priority of the commands a user waits for
+    :vartype PRIORITY_HIGH: int
+    :var PRIORITY_NORMAL: default priority
+    :vartype PRIORITY_NORMAL: int
+    :var PRIORITY_BULK: priority of the lighting updates
+    :vartype PRIORITY_BULK: int
+    :var priorities: mapping of the opcode of a command to its default priority
+    :vartype priorities: mapping: dict(int, int)
+    """
+
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_BULK = 10
+
+    priorities = {112: PRIORITY_HIGH, 48: PRIORITY_HIGH, 80: PRIORITY_BULK, 96: PRIORITY_BULK}
+
+    def __init__(self, samsung, max_frame_rate=None):
+        """
+        Init the scheduler and start its writer thread
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :param max_frame_rate: maximum number of commands written per second, unlimited if None
+        :type max_frame_rate: float
+        """
+        self.samsung = samsung
+        if max_frame_rate is not None:
+            samsung.max_frame_rate = max_frame_rate
+        self.jobs = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="SamsungMXT40 writer %s" % samsung.device, daemon=True)
+        self.thread.start()
+
+    def priorityOf(spec):
+        """
+        Default priority of a command, from its opcode
+
+        :param spec: row of the protocol table of the command
+        :type spec: CommandSpec
+        :return: the priority, lower runs first
+        :rtype: int
+        """
+        return CommandScheduler.priorities.get(spec.opcode, CommandScheduler.PRIORITY_NORMAL)
+
+    def spec(self, name):
+        """
+        Row of the protocol table of a builder
+
+        :param name: name of the builder
+        :type name: str
+        :return: the row
+        :rtype: CommandSpec
+        :raises ValueError: the session has no such builder
+        """
+        spec = self.samsung.commands.get(name)
+        if spec is None:
+            raise ValueError("Unknown command %s" % name)
+        return spec
+
+    def submit(self, name, *args, priority=None, expected=1, timeout=None):
+        """
+        Queue a request, built in the writer thread
+
+        :param name: name of the builder of the command, toggle_mute for instance
+        :type name: str
+        :param args: arguments of the builder
+        :type args: list
+        :param priority: lower runs first, from the opcode by default
+        :type priority: int
+        :param expected: number of commands the device answers
+        :type expected: int
+        :param timeout: seconds to wait for the answer, request_timeout by default
+        :type timeout: float
+        :return: future of the commands received
+        :rtype: concurrent.futures.Future
+        """
+        spec = self.spec(name)
+        if priority is None:
+            priority = CommandScheduler.priorityOf(spec)
+        return self.submit_call(lambda samsung: samsung.request(getattr(samsung, name)(*args), expected, timeout), priority)
+
+    def submit_pipeline(self, calls, priority=None):
+        """
+        Queue a pipeline, built in the writer thread
+
+        :param calls: name of the builder and arguments of each command
+        :type calls: list of tuple(str, list)
+        :param priority: lower runs first, the most urgent of the commands by default
+        :type priority: int
+        :return: future of the commands received for each command sent
+        :rtype: concurrent.futures.Future
+        """
+        calls = [(name, list(args)) for name, args in calls]
+        specs = [self.spec(name) for name, args in calls]
+        if priority is None:
+            priority = min((CommandScheduler.priorityOf(spec) for spec in specs), default=CommandScheduler.PRIORITY_NORMAL)
+        return self.submit_call(lambda samsung: samsung.pipeline([getattr(samsung, name)(*args) for name, args in calls]), priority)
+
+    def submit_call(self, function, priority=PRIORITY_NORMAL):
+        """
+        Queue a function called with the session in the writer thread
+
+        Use it for a sequence which must not be interleaved with other
+        commands, a mode switch followed by its command for instance. The
+        function builds its frames with the session it is given.
+
+        :param function: function called with the session
+        :type function: callable
+        :param priority: lower runs first
+        :type priority: int
+        :return: future of the result of the function
+        :rtype: concurrent.futures.Future
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("CommandScheduler is closed")
+            self.jobs.put((priority, next(self.counter), function, future))
+        return future
+
+    def pending(self):
+        """
+        Number of jobs waiting for the writer
+
+        :rtype: int
+        """
+        return self.jobs.qsize()
+
+    def close(self, wait=True):
+        """
+        Stop the writer thread and wait for the job it is running
+
+        :param wait: run the jobs queued before stopping, cancel them if False
+        :type wait: bool
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            while not wait:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                job[3].cancel()
+            self.jobs.put((float("inf"), next(self.counter), None, None))
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def _run(self):
+        """
+        Run the jobs queued by priority, then by order of submission
+        """
+        while True:
+            priority, index, function, future = self.jobs.get()
+            if function is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(self.samsung))
+            except Exception as e:
+                logging.debug("Scheduled job %d failed: %s", index, e)
+                future.set_exception(e)
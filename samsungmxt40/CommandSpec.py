@@ -0,0 +1,328 @@
+import argparse
+
+class CommandSpec:
+    """
+    Row of the protocol table describing a command sent to the device
+
+    The payload is a template: a number is a fixed byte, a name is the
+    byte of the argument of that name. :meth:`install` turns each row of
+    SamsungMXT40.protocol into a builder method once at import time, the
+    builder checks its arguments against the row and encodes the payload
+    without looking the row up again::
+
+        CommandSpec("illumination_setting", [96, 2, "r", "g", "b"],
+                    [CommandSpec.Arg("r", "red color"), CommandSpec.Arg("g", "green color"), CommandSpec.Arg("b", "blue color")],
+                    reply=IlluminationSetting, doc="Generate bytes to change the color", option="-c", action="color")
+
+    :param name: name of the builder method
+    :type name: str
+    :param payload: payload template, opcode and sub-opcode first
+    :type payload: list of int or str
+    :param args: arguments of the builder, in order
+    :type args: list of CommandSpec.Arg
+    :param reply: record class of the answer of the device, None if it has none
+    :type reply: class
+    :param constant: the payload takes few values, encode it from a cached template
+    :type constant: bool
+    :param hook: name of the session method called with the arguments before encoding
+    :type hook: str
+    :param fix: function adjusting the payload before encoding
+    :type fix: callable
+    :param doc: summary line of the builder docstring
+    :type doc: str
+    :param option: short command line option of the command, none if None
+    :type option: str
+    :param action: CommandPlan action running the command, also the long command line option
+    :type action: str
+    :param idempotent: sending the command twice leaves the device as sending it once
+    :type idempotent: bool
+    :param query: the command only asks the device, its reply changes no record
+    :type query: bool
+    :param changes: record classes the command changes besides its reply
+    :type changes: list of class
+    :param setting: setting number of the records changed, the second byte of the payload if None, EVERY for all of them
+    :type setting: int or str
+    :var EVERY: setting of a command changing every setting of its records
+    :vartype EVERY: str
+    """
+
+    EVERY = "EVERY"
+
+    class Arg:
+        """
+        Argument of a command
+
+        :param name: name of the builder parameter
+        :type name: str
+        :param doc: description of the argument
+        :type doc: str
+        :param low: lowest value accepted
+        :type low: int
+        :param high: highest value accepted
+        :type high: int
+        :param choices: mapping of the names accepted to the byte sent, the argument is a number if None
+        :type choices: mapping: dict(str, int)
+        """
+
+        def __init__(self, name, doc, low=0, high=255, choices=None):
+            self.name = name
+            self.doc = doc
+            self.low = low
+            self.high = high
+            self.choices = choices
+
+        def invalid(self, command, value):
+            """
+            Raise the error of a value out of the range of the argument
+
+            :param command: name of the builder
+            :type command: str
+            :param value: the value refused
+            :type value: object
+            :raises ValueError: always
+            """
+            if self.choices is not None:
+                raise ValueError("Unknown %s %r for %s, expected one of %s" % (self.name, value, command, ", ".join(self.choices)))
+            raise ValueError("Invalid %s %r for %s, expected %d to %d" % (self.name, value, command, self.low, self.high))
+
+        def check(self, command, value):
+            """
+            Check a value and give the byte sent for it
+
+            :param command: name of the builder
+            :type command: str
+            :param value: the value
+            :type value: str or int
+            :return: the byte
+            :rtype: int
+            :raises ValueError: the value is out of range
+            """
+            if self.choices is not None:
+                if isinstance(value, str) and value in self.choices:
+                    return self.choices[value]
+            elif isinstance(value, int) and self.low <= value <= self.high:
+                return int(value)
+            self.invalid(command, value)
+
+        def parse(self, command, text):
+            """
+            Parse a value written on the command line
+
+            :param command: name of the builder
+            :type command: str
+            :param text: the value written
+            :type text: str
+            :return: the value
+            :rtype: str or int
+            :raises ValueError: the value is not accepted
+            """
+            text = text.strip()
+            if self.choices is None:
+                try:
+                    text = int(text)
+                except ValueError:
+                    self.invalid(command, text)
+            self.check(command, text)
+            return text
+
+        def usage(self):
+            """
+            Values accepted, for the help of a command line option
+
+            :rtype: str
+            """
+            if self.choices is not None:
+                return "|".join(self.choices)
+            return "%s %d-%d" % (self.name, self.low, self.high)
+
+    def __init__(self, name, payload, args=(), reply=None, constant=False, hook=None, fix=None, doc="", option=None, action=None, idempotent=False,
+                 query=False, changes=(), setting=None):
+        self.name = name
+        self.payload = list(payload)
+        self.args = list(args)
+        self.reply = reply
+        self.constant = constant
+        self.hook = hook
+        self.fix = fix
+        self.doc = doc
+        self.option = option
+        self.action = action
+        self.idempotent = idempotent
+        self.query = query
+        self.setting = setting
+        self.changes = ([] if query or reply is None else [reply]) + list(changes)
+        self.fixed = [(i, item) for i, item in enumerate(self.payload) if not isinstance(item, str)]
+        choices = {arg.name: arg.choices for arg in self.args if arg.choices is not None}
+        self.named = [(i, set(choices[item].values())) for i, item in enumerate(self.payload) if item in choices]
+        names = [arg.name for arg in self.args]
+        for item in self.payload:
+            if isinstance(item, str) and item not in names:
+                raise ValueError("%s has no argument %s" % (name, item))
+
+    def __repr__(self):
+        return "CommandSpec(%s, %s)" % (self.name, self.payload)
+
+    @property
+    def opcode(self):
+        """
+        First byte of the payload
+        """
+        return self.payload[0]
+
+    def matches(self, payload):
+        """
+        Tell if a payload can be built from the template of the row
+
+        :param payload: payload of a command, opcode first
+        :type payload: bytes
+        :rtype: bool
+        """
+        return (len(payload) == len(self.payload) and all(payload[i] == item for i, item in self.fixed)
+                and all(payload[i] in values for i, values in self.named))
+
+    def fields(self, command):
+        """
+        Records a command built from the row changes on the device
+
+        :param command: complete command, header and checksum included
+        :type command: bytes
+        :return: the record class and the setting number of each record, None for the records without setting
+        :rtype: list of tuple(class, int)
+        """
+        setting = command[7] if self.setting is None and len(command) > 8 else self.setting
+        return [(record, setting if "setting" in record.__slots__ else None) for record in self.changes]
+
+    def source(self):
+        """
+        Source of the builder method
+
+        :rtype: str
+        """
+        lines = ["def %s(self%s):" % (self.name, "".join(", " + arg.name for arg in self.args))]
+        values = {}
+        for i, arg in enumerate(self.args):
+            if arg.choices is not None:
+                values[arg.name] = "byte_%d" % i
+                lines.append("    byte_%d = choices_%d.get(%s) if %s.__class__ is str else None" % (i, i, arg.name, arg.name))
+                lines.append("    if byte_%d is None:" % i)
+                lines.append("        arg_%d.invalid(%r, %s)" % (i, self.name, arg.name))
+            else:
+                values[arg.name] = arg.name
+                lines.append("    if %s.__class__ is not int or not %d <= %s <= %d:" % (arg.name, arg.low, arg.name, arg.high))
+                lines.append("        %s = arg_%d.check(%r, %s)" % (arg.name, i, self.name, arg.name))
+        if self.hook is not None:
+            lines.append("    self.%s(%s)" % (self.hook, ", ".join(arg.name for arg in self.args)))
+        payload = "[%s]" % ", ".join(values[item] if isinstance(item, str) else str(item) for item in self.payload)
+        if self.fix is not None:
+            payload = "fix(%s)" % payload
+        lines.append("    return self.getDataCommand(%s%s)" % (payload, ", constant=True" if self.constant else ""))
+        return "\n".join(lines) + "\n"
+
+    def docstring(self):
+        """
+        Docstring of the builder method
+
+        :rtype: str
+        """
+        lines = [self.doc, ""]
+        for arg in self.args:
+            if arg.choices is not None:
+                lines.append(":param %s: %s, one of %s" % (arg.name, arg.doc, ", ".join(arg.choices)))
+                lines.append(":type %s: str" % arg.name)
+            else:
+                lines.append(":param %s: %s, from %d to %d" % (arg.name, arg.doc, arg.low, arg.high))
+                lines.append(":type %s: int" % arg.name)
+        lines.append(":return: bytes to send to the device")
+        lines.append(":rtype: bytes")
+        lines.append(":raises ValueError: an argument is out of range")
+        return "\n".join(lines)
+
+    def builder(self):
+        """
+        Compile the builder method of the command
+
+        :return: the method
+        :rtype: function
+        """
+        namespace = {"fix": self.fix}
+        for i, arg in enumerate(self.args):
+            namespace["arg_%d" % i] = arg
+            namespace["choices_%d" % i] = arg.choices
+        exec(compile(self.source(), "<CommandSpec %s>" % self.name, "exec"), namespace)
+        method = namespace[self.name]
+        method.__doc__ = self.docstring()
+        method.spec = self
+        return method
+
+    def parse(self, text):
+        """
+        Parse the value of the command line option, arguments separated by comma
+
+        :param text: the value written
+        :type text: str
+        :return: the arguments
+        :rtype: list
+        :raises argparse.ArgumentTypeError: the value is not accepted
+        """
+        items = text.split(",")
+        if len(items) != len(self.args):
+            raise argparse.ArgumentTypeError("expected %d values separated by comma, got %r" % (len(self.args), text))
+        try:
+            return [arg.parse(self.name, item) for arg, item in zip(self.args, items)]
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+
+    def add_argument(self, parser):
+        """
+        Add the command line option of the command to a parser
+
+        :param parser: the parser
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument(self.option, "--" + self.action, required=False, type=self.parse, metavar=self.action.upper(),
+                            help="%s: %s" % (self.doc.replace("Generate bytes to ", "").capitalize(), ",".join(arg.usage() for arg in self.args)))
+
+    def install(cls):
+        """
+        Generate the builder methods of the protocol table of a session class
+
+        Sets cls.commands, the mapping of builder name to its row,
+        cls.options, the rows having a command line option, and cls.rows,
+        the mapping of opcode to its rows, the most fixed bytes first then
+        the most arguments taking names.
+
+        :param cls: class with a protocol list of CommandSpec
+        :type cls: class
+        """
+        cls.commands = {}
+        for spec in cls.protocol:
+            setattr(cls, spec.name, spec.builder())
+            cls.commands[spec.name] = spec
+        cls.options = [spec for spec in cls.protocol if spec.option is not None]
+        cls.rows = {}
+        for spec in sorted(cls.protocol, key=lambda spec: (-len(spec.fixed), -len(spec.named))):
+            cls.rows.setdefault(spec.opcode, []).append(spec)
+
+    def lookup(cls, command):
+        """
+        Find the row a command sent was built from
+
+        Rows sharing an opcode are told apart by their fixed bytes and the
+        bytes of their arguments taking names, the row fixing the most of
+        them wins: a remote_control(20) is the toggle_mute row and a
+        remote_control(15) the sound_more row.
+
+        :param cls: class installed with a protocol list of CommandSpec
+        :type cls: class
+        :param command: complete command, header and checksum included
+        :type command: bytes
+        :return: the row, None if no row builds the command
+        :rtype: CommandSpec
+        """
+        if len(command) < 8:
+            return None
+        payload = memoryview(command)[6:-1]
+        for spec in cls.rows.get(payload[0], ()):
+            if spec.matches(payload):
+                return spec
+        return None
@@ -0,0 +1,244 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import bluetooth
+
+from samsungmxt40.SamsungMXT40 import SamsungMXT40
+
+class ConnectionManager:
+    """
+    Keep one bluetooth link per device open and lend it to the callers
+
+    Opening a link costs the connect_req/connect_link_complete handshake and
+    a source info request, so the manager keeps the link alive between
+    commands, closes it once it has been idle for too long and reconnects
+    it transparently when it stops answering.
+
+    :param idle_timeout: seconds after which an unused link gets closed
+    :type idle_timeout: float
+    :param health_check_interval: seconds of inactivity after which the link is pinged before being lent
+    :type health_check_interval: float
+    :param factory: callable building a connected session for a MAC Address
+    :type factory: callable
+    :param reader: start the background reader of each session, keeping their state current without pinging
+    :type reader: bool
+    :var links: mapping of device MAC Address to its link entry
+    :vartype links: mapping: dict(str, ConnectionManager.Link)
+    """
+
+    class Link:
+        """
+        A session and the bookkeeping needed to share it
+
+        :param device: The device MAC Address.
+        :type device: str
+        """
+
+        def __init__(self, device):
+            self.device = device
+            self.samsung = None
+            self.lock = threading.RLock()
+            self.borrowed = 0
+            self.last_used = time.monotonic()
+
+    def __init__(self, idle_timeout=30.0, health_check_interval=5.0, factory=SamsungMXT40, reader=False):
+        """
+        Init the connection manager
+
+        :param idle_timeout: seconds after which an unused link gets closed
+        :type idle_timeout: float
+        :param health_check_interval: seconds of inactivity after which the link is pinged before being lent
+        :type health_check_interval: float
+        :param factory: callable building a connected session for a MAC Address
+        :type factory: callable
+        :param reader: start the background reader of each session, keeping their state current without pinging
+        :type reader: bool
+        """
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.factory = factory
+        self.reader = reader
+        self.links = {}
+        self.lock = threading.Lock()
+        self.reaper = None
+
+    def get(self, device):
+        """
+        Return the live session of a device, connecting it if needed
+
+        The returned session is not locked, prefer :meth:`session` when
+        several threads share the manager.
+
+        :param device: The device MAC Address.
+        :type device: str
+        :return: a connected session
+        :rtype: SamsungMXT40
+        """
+        link = self._link(device)
+        with link.lock:
+            self._ensure_alive(link)
+            link.last_used = time.monotonic()
+            return link.samsung
+
+    def peek(self, device):
+        """
+        Return the session of a device without connecting nor checking it
+
+        :param device: The device MAC Address.
+        :type device: str
+        :return: the session, None if the device was never connected
+        :rtype: SamsungMXT40
+        """
+        with self.lock:
+            link = self.links.get(device)
+        return None if link is None else link.samsung
+
+    @contextmanager
+    def session(self, device):
+        """
+        Borrow the live session of a device for the duration of a with block
+
+        If the block fails with a bluetooth error the link is closed so the
+        next borrower gets a fresh connection.
+
+        :param device: The device MAC Address.
+        :type device: str
+        :return: a connected session
+        :rtype: SamsungMXT40
+        """
+        link = self._link(device)
+        with link.lock:
+            self._ensure_alive(link)
+            link.borrowed += 1
+            try:
+                yield link.samsung
+            except (OSError, bluetooth.btcommon.BluetoothError):
+                logging.warning("Link to %s failed, dropping it", device)
+                self._close_link(link)
+                raise
+            finally:
+                link.borrowed -= 1
+                link.last_used = time.monotonic()
+
+    def close(self, device):
+        """
+        Close the link of a device
+
+        :param device: The device MAC Address.
+        :type device: str
+        """
+        with self.lock:
+            link = self.links.pop(device, None)
+        if link is not None:
+            with link.lock:
+                self._close_link(link)
+
+    def close_all(self):
+        """
+        Close every link and stop the idle reaper
+        """
+        with self.lock:
+            devices = list(self.links)
+            reaper = self.reaper
+            self.reaper = None
+        if reaper is not None:
+            reaper.cancel()
+        for device in devices:
+            self.close(device)
+
+    def reap(self):
+        """
+        Close the links which have not been used for idle_timeout seconds
+        """
+        now = time.monotonic()
+        with self.lock:
+            links = list(self.links.items())
+        for device, link in links:
+            if not link.lock.acquire(blocking=False):
+                continue
+            try:
+                idle = now - link.last_used > self.idle_timeout
+                if link.borrowed == 0 and idle and link.samsung is not None and link.samsung.is_connected():
+                    logging.debug("Closing idle link to %s", device)
+                    self._close_link(link)
+            finally:
+                link.lock.release()
+
+    def _link(self, device):
+        """
+        Return the link entry of a device, creating it on first use
+
+        :param device: The device MAC Address.
+        :type device: str
+        :return: the link entry
+        :rtype: ConnectionManager.Link
+        """
+        with self.lock:
+            link = self.links.get(device)
+            if link is None:
+                link = ConnectionManager.Link(device)
+                self.links[device] = link
+            self._schedule_reaper()
+        return link
+
+    def _ensure_alive(self, link):
+        """
+        Reconnect the link if it has been closed or stopped answering
+
+        :param link: the link entry to check, its lock must be held
+        :type link: ConnectionManager.Link
+        """
+        samsung = link.samsung
+        if samsung is None:
+            link.samsung = self.factory(link.device)
+            if self.reader:
+                link.samsung.start_reader()
+            link.samsung.load_source_info()
+            return
+        if samsung.is_connected():
+            if samsung.reader is not None and samsung.reader.is_alive():
+                return
+            last_activity = samsung.last_activity or link.last_used
+            if time.monotonic() - last_activity < self.health_check_interval or samsung.ping():
+                return
+            logging.info("Link to %s stopped answering, reconnecting", samsung.device)
+            self._close_link(link)
+        samsung.connect()
+        samsung.load_source_info()
+
+    def _close_link(self, link):
+        """
+        Close the socket of a link, ignoring errors of an already dead link
+
+        :param link: the link entry to close, its lock must be held
+        :type link: ConnectionManager.Link
+        """
+        if link.samsung is None or not link.samsung.is_connected():
+            return
+        try:
+            link.samsung.close()
+        except (OSError, bluetooth.btcommon.BluetoothError):
+            link.samsung.socket = None
+            link.samsung.SEQUENCE_NUMBER = 0
+
+    def _schedule_reaper(self):
+        """
+        Start the idle reaper timer if it is not running, self.lock must be held
+        """
+        if self.reaper is not None or self.idle_timeout is None:
+            return
+        self.reaper = threading.Timer(max(self.idle_timeout / 2, 1.0), self._run_reaper)
+        self.reaper.daemon = True
+        self.reaper.start()
+
+    def _run_reaper(self):
+        """
+        Reap idle links and reschedule while links remain open
+        """
+        self.reap()
+        with self.lock:
+            self.reaper = None
+            if any(link.samsung is not None and link.samsung.is_connected() for link in self.links.values()):
+                self._schedule_reaper()
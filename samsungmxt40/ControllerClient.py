@@ -0,0 +1,89 @@
+import json
+import socket
+
+from samsungmxt40.ControllerDaemon import ControllerDaemon
+from samsungmxt40.Fleet import Fleet
+
+class ControllerClient:
+    """
+    Send plans to a running :class:`ControllerDaemon`
+
+    Usage::
+
+        client = ControllerClient()
+        if client.is_running():
+            for result in client.run(["2C:FD:B3:E6:D1:08"], CommandPlan().color(10, 0, 5)):
+                print(result)
+
+    :param path: path of the Unix socket of the daemon, ControllerDaemon.default_path() by default
+    :type path: str
+    :param timeout: seconds to wait for the daemon to answer
+    :type timeout: float
+    """
+
+    def __init__(self, path=None, timeout=30.0):
+        """
+        Init the client, a connection is opened for each call
+
+        :param path: path of the Unix socket of the daemon, ControllerDaemon.default_path() by default
+        :type path: str
+        :param timeout: seconds to wait for the daemon to answer
+        :type timeout: float
+        """
+        self.path = path if path is not None else ControllerDaemon.default_path()
+        self.timeout = timeout
+
+    def call(self, request):
+        """
+        Send a request and wait for its response
+
+        :param request: the request
+        :type request: dict
+        :return: the response
+        :rtype: dict
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            raise ConnectionResetError("The daemon closed the connection")
+        return json.loads(line)
+
+    def is_running(self):
+        """
+        Tell if a daemon answers on the socket
+
+        :rtype: bool
+        """
+        try:
+            return self.call({"op": "ping"}).get("ok", False)
+        except (OSError, ValueError):
+            return False
+
+    def run(self, devices, plan, workers=4):
+        """
+        Run a plan on devices through the daemon
+
+        :param devices: The devices MAC Address.
+        :type devices: list of str
+        :param plan: the plan to run
+        :type plan: CommandPlan
+        :param workers: maximum number of devices driven at the same time
+        :type workers: int
+        :return: the result of each device, in the order of the devices
+        :rtype: list of Fleet.Result
+        """
+        response = self.call({"op": "run", "devices": list(devices), "plan": plan.to_list(), "workers": workers})
+        if "error" in response:
+            raise ValueError(response["error"])
+        results = []
+        for result in response["results"]:
+            replies = result["replies"]
+            if replies is not None:
+                replies = [[bytes.fromhex(reply) if isinstance(reply, str) else reply for reply in step] for step in replies]
+            error = result["error"]
+            results.append(Fleet.Result(result["device"], result["latency"], replies, None if error is None else RuntimeError(error)))
+        return results
@@ -0,0 +1,181 @@
+import os
+import json
+import socket
+import logging
+import threading
+import socketserver
+
+from samsungmxt40.CommandPlan import CommandPlan
+from samsungmxt40.ConnectionManager import ConnectionManager
+from samsungmxt40.Fleet import Fleet
+
+class ControllerDaemon:
+    """
+    Keep the links to the towers open and run the plans sent on a Unix socket
+
+    A client writes one JSON request per line and reads one JSON response
+    per line, several requests can follow each other on a connection::
+
+        {"op": "run", "devices": ["2C:FD:B3:E6:D1:08"], "plan": [["color", [10, 0, 5]]], "workers": 4}
+        {"results": [{"device": "2C:FD:B3:E6:D1:08", "latency": 0.021, "replies": [["00bb0101000661020a0005.."]], "error": null}]}
+
+        {"op": "ping"}
+        {"ok": true}
+
+    A request which cannot be run gets {"error": message}. The plans are
+    the serialized form of :class:`CommandPlan`, the replies are the
+    commands received in hexadecimal, or the values returned by the step.
+    Use :class:`ControllerClient` to talk to the daemon.
+
+    :param path: path of the Unix socket, default_path() by default
+    :type path: str
+    :param manager: connection manager owning the links, a new one by default
+    :type manager: ConnectionManager
+    """
+
+    def __init__(self, path=None, manager=None):
+        """
+        Init the daemon, the socket is opened by :meth:`start` or :meth:`serve_forever`
+
+        :param path: path of the Unix socket, default_path() by default
+        :type path: str
+        :param manager: connection manager owning the links, a new one by default
+        :type manager: ConnectionManager
+        """
+        self.path = path if path is not None else ControllerDaemon.default_path()
+        self.manager = manager if manager is not None else ConnectionManager(idle_timeout=None)
+        self.server = None
+        self.thread = None
+
+    def default_path():
+        """
+        Default path of the socket, in the XDG runtime directory
+
+        :return: the path
+        :rtype: str
+        """
+        runtime = os.environ.get("XDG_RUNTIME_DIR")
+        if runtime:
+            return os.path.join(runtime, "samsungmxt40.sock")
+        return os.path.join("/tmp", "samsungmxt40-%d.sock" % os.getuid())
+
+    def encodeReplies(replies):
+        """
+        Make the replies of a plan serializable
+
+        :param replies: the commands received for each step
+        :type replies: list of list of bytes
+        :return: the replies, commands in hexadecimal
+        :rtype: list of list
+        """
+        return [[reply.hex() if isinstance(reply, bytes) else reply for reply in step] for step in replies]
+
+    def handle(self, request):
+        """
+        Answer a request
+
+        :param request: the request decoded
+        :type request: dict
+        :return: the response
+        :rtype: dict
+        """
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op != "run":
+            return {"error": "Unknown op %s" % op}
+        try:
+            plan = CommandPlan.from_list(request["plan"])
+            devices = request["devices"]
+        except (KeyError, TypeError, ValueError) as e:
+            return {"error": "Invalid plan: %s" % e}
+        if not isinstance(devices, list) or not all(isinstance(device, str) for device in devices):
+            return {"error": "Invalid devices: expected a list of MAC Addresses"}
+        workers = request.get("workers", 4)
+        if not isinstance(workers, int) or isinstance(workers, bool) or workers < 1:
+            return {"error": "Invalid workers: expected a positive integer, got %r" % (workers,)}
+        fleet = Fleet(devices, workers=workers, manager=self.manager)
+        results = []
+        for result in fleet.run(plan):
+            results.append({
+                "device": result.device,
+                "latency": result.latency,
+                "replies": None if result.replies is None else ControllerDaemon.encodeReplies(result.replies),
+                "error": None if result.ok else str(result.error),
+            })
+        return {"results": results}
+
+    def bind(self):
+        """
+        Open the socket, replacing a stale one
+
+        :return: the server
+        :rtype: socketserver.ThreadingUnixStreamServer
+        """
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                        response = daemon.handle(request) if isinstance(request, dict) else {"error": "Request is not an object"}
+                    except ValueError as e:
+                        response = {"error": "Invalid request: %s" % e}
+                    except Exception as e:
+                        logging.exception("Request %r failed", line)
+                        response = {"error": "Request failed: %s" % e}
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+                    self.wfile.flush()
+
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError("A daemon already listens on %s" % self.path)
+            except OSError:
+                logging.info("Removing stale socket %s", self.path)
+                os.unlink(self.path)
+            finally:
+                probe.close()
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        server = Server(self.path, Handler)
+        os.chmod(self.path, 0o600)
+        return server
+
+    def serve_forever(self):
+        """
+        Serve the requests in the calling thread until :meth:`shutdown`
+        """
+        self.server = self.bind()
+        logging.info("Listening on %s", self.path)
+        self.server.serve_forever()
+
+    def start(self):
+        """
+        Serve the requests in a background thread
+        """
+        self.server = self.bind()
+        self.thread = threading.Thread(target=self.server.serve_forever, name="SamsungMXT40 daemon", daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        """
+        Stop serving, remove the socket and close the links
+        """
+        if self.server is not None:
+            if self.thread is not None:
+                self.server.shutdown()
+                self.thread.join()
+                self.thread = None
+            self.server.server_close()
+            self.server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self.manager.close_all()
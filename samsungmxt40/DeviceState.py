@@ -0,0 +1,159 @@
+import time
+import threading
+
+from samsungmxt40.CommandSpec import CommandSpec
+from samsungmxt40.ResponseDecoder import ConnectInfo, SourceInfo, SoundSetting, SystemSetting, IlluminationSetting, UsbStatus, AuxState
+
+class DeviceState:
+    """
+    Last records received from a device and when they were received
+
+    A field is a record class and, for the sound and system settings, the
+    setting number. A field is fresh for the TTL of its record class, it is
+    invalidated as soon as a command changing it is sent so the next read
+    asks the device again. The row of the protocol table a command was
+    built from tells the fields it changes.
+
+    :param ttls: TTL overriding the default one of some record classes, None never expires
+    :type ttls: mapping: dict(class, float)
+    :param protocol: class installed with the protocol table of the commands sent, None to never invalidate
+    :type protocol: class
+    :var default_ttls: seconds a record stays fresh for each record class
+    :vartype default_ttls: mapping: dict(class, float)
+    :var hits: number of reads answered from the cache
+    :vartype hits: int
+    :var misses: number of reads without a fresh record
+    :vartype misses: int
+    """
+
+    default_ttls = {
+        ConnectInfo: None,
+        SourceInfo: 10.0,
+        SoundSetting: 10.0,
+        SystemSetting: 30.0,
+        IlluminationSetting: 30.0,
+        UsbStatus: 2.0,
+        AuxState: 5.0,
+    }
+
+    def __init__(self, ttls=None, protocol=None):
+        """
+        Init an empty cache
+
+        :param ttls: TTL overriding the default one of some record classes, None never expires
+        :type ttls: mapping: dict(class, float)
+        :param protocol: class installed with the protocol table of the commands sent, None to never invalidate
+        :type protocol: class
+        """
+        self.ttls = dict(DeviceState.default_ttls)
+        self.ttls.update(ttls or {})
+        self.protocol = protocol
+        self.fields = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(response):
+        """
+        Field of a record
+
+        :param response: the record
+        :type response: Response
+        :return: the record class and the setting number, None for the records without setting
+        :rtype: tuple(class, int)
+        """
+        return (type(response), getattr(response, "setting", None))
+
+    def update(self, response):
+        """
+        Store a record received from the device
+
+        :param response: the record
+        :type response: Response
+        """
+        with self.lock:
+            self.fields[DeviceState.key(response)] = (response, time.monotonic())
+
+    def get(self, record, setting=None, max_age=None):
+        """
+        Return a record if it is still fresh
+
+        :param record: record class
+        :type record: class
+        :param setting: setting number of the sound and system settings
+        :type setting: int
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the record, None if missing or stale
+        :rtype: Response
+        """
+        ttl = self.ttls.get(record) if max_age is None else max_age
+        with self.lock:
+            field = self.fields.get((record, setting))
+            if field is not None and (ttl is None or time.monotonic() - field[1] < ttl):
+                self.hits += 1
+                return field[0]
+            self.misses += 1
+            return None
+
+    def age(self, record, setting=None):
+        """
+        Seconds since a record was received
+
+        :param record: record class
+        :type record: class
+        :param setting: setting number of the sound and system settings
+        :type setting: int
+        :return: the age, None if the record was never received or got invalidated
+        :rtype: float
+        """
+        with self.lock:
+            field = self.fields.get((record, setting))
+        return None if field is None else time.monotonic() - field[1]
+
+    def records(self):
+        """
+        Every record stored, fresh or not, and its age
+
+        :return: list of (record, seconds since it was received)
+        :rtype: list of tuple(Response, float)
+        """
+        now = time.monotonic()
+        with self.lock:
+            return [(response, now - received) for response, received in self.fields.values()]
+
+    def invalidate(self, record, setting=None):
+        """
+        Forget a record
+
+        :param record: record class
+        :type record: class
+        :param setting: setting number of the sound and system settings
+        :type setting: int
+        """
+        with self.lock:
+            self.fields.pop((record, setting), None)
+
+    def clear(self):
+        """
+        Forget every record
+        """
+        with self.lock:
+            self.fields.clear()
+
+    def sent(self, command):
+        """
+        Invalidate the records a command sent to the device changes
+
+        :param command: complete command sent to the device
+        :type command: bytes
+        """
+        spec = None if self.protocol is None else CommandSpec.lookup(self.protocol, command)
+        if spec is None or not spec.changes:
+            return
+        with self.lock:
+            for record, setting in spec.fields(command):
+                if setting == CommandSpec.EVERY:
+                    self.fields = {key: field for key, field in self.fields.items() if key[0] is not record}
+                else:
+                    self.fields.pop((record, setting), None)
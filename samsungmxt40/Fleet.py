@@ -0,0 +1,125 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from samsungmxt40.ConnectionManager import ConnectionManager
+
+class Fleet:
+    """
+    Run the same command plan on many devices in parallel
+
+    Each device gets its own link from the connection manager, at most
+    workers devices are driven at the same time and a failing device does
+    not stop the others.
+
+    :param devices: The devices MAC Address.
+    :type devices: list of str
+    :param workers: maximum number of devices driven at the same time
+    :type workers: int
+    :param manager: connection manager lending the links, a new one by default
+    :type manager: ConnectionManager
+    """
+
+    class Result:
+        """
+        Outcome of a plan on one device
+
+        :param device: The device MAC Address.
+        :type device: str
+        :param latency: seconds spent on the device, connection included
+        :type latency: float
+        :param replies: the commands received for each step
+        :type replies: list of list of bytes
+        :param error: the exception raised, None if the plan succeeded
+        :type error: Exception
+        """
+
+        def __init__(self, device, latency, replies=None, error=None):
+            self.device = device
+            self.latency = latency
+            self.replies = replies
+            self.error = error
+
+        @property
+        def ok(self):
+            """
+            Tell if the plan succeeded on the device
+
+            :rtype: bool
+            """
+            return self.error is None
+
+        def __repr__(self):
+            if self.ok:
+                return "%s ok %.1f ms" % (self.device, self.latency * 1000)
+            return "%s failed %.1f ms: %s" % (self.device, self.latency * 1000, self.error)
+
+    def __init__(self, devices, workers=4, manager=None):
+        """
+        Init the fleet
+
+        :param devices: The devices MAC Address.
+        :type devices: list of str
+        :param workers: maximum number of devices driven at the same time
+        :type workers: int
+        :param manager: connection manager lending the links, a new one by default
+        :type manager: ConnectionManager
+        """
+        self.devices = list(devices)
+        self.workers = workers
+        self.manager = manager if manager is not None else ConnectionManager()
+
+    def load_devices(path):
+        """
+        Read the devices MAC Address from a file, one per line, # starts a comment
+
+        :param path: path of the file
+        :type path: str
+        :return: The devices MAC Address.
+        :rtype: list of str
+        """
+        devices = []
+        with open(path) as f:
+            for line in f:
+                device = line.split("#", 1)[0].strip()
+                if device:
+                    devices.append(device)
+        return devices
+
+    def run(self, plan):
+        """
+        Run a plan on every device
+
+        :param plan: the plan to run
+        :type plan: CommandPlan
+        :return: the result of each device, in the order of the devices
+        :rtype: list of Fleet.Result
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(self.devices) or 1))) as executor:
+            return list(executor.map(lambda device: self.run_device(device, plan), self.devices))
+
+    def run_device(self, device, plan):
+        """
+        Run a plan on one device, catching its failure
+
+        :param device: The device MAC Address.
+        :type device: str
+        :param plan: the plan to run
+        :type plan: CommandPlan
+        :return: the result of the device
+        :rtype: Fleet.Result
+        """
+        start = time.monotonic()
+        try:
+            with self.manager.session(device) as samsung:
+                replies = plan.run(samsung)
+        except Exception as e:
+            logging.warning("Plan failed on %s: %s", device, e)
+            return Fleet.Result(device, time.monotonic() - start, error=e)
+        return Fleet.Result(device, time.monotonic() - start, replies)
+
+    def close(self):
+        """
+        Close the links of the fleet
+        """
+        self.manager.close_all()
@@ -0,0 +1,165 @@
+import logging
+
+class FrameDecoder:
+    """
+    Incremental decoder splitting the bytes received from the device into commands
+
+    The chunks read from the socket are appended to a preallocated buffer
+    and the complete commands are handed back as memoryview slices of that
+    buffer, without copying them. A view is only valid until the next call
+    to :meth:`feed`, copy it with bytes() to keep it longer.
+
+    Each command is a 6 bytes header (0x00 0xBB, type, sequence number and
+    the payload length on 2 bytes), the payload and a checksum byte. When
+    the buffer does not start with the 0x00 0xBB preamble, or a command
+    has an impossible length or a wrong checksum, the decoder drops bytes
+    until the next preamble.
+
+    :param size: initial size of the buffer
+    :type size: int
+    :param max_payload: biggest payload length accepted before resyncing
+    :type max_payload: int
+    :param verify_checksum: drop the commands whose checksum is wrong
+    :type verify_checksum: bool
+    :var checksum_errors: number of commands dropped because of their checksum
+    :vartype checksum_errors: int
+    :var length_errors: number of headers dropped because of their length
+    :vartype length_errors: int
+    :var discarded: number of bytes dropped while resyncing
+    :vartype discarded: int
+    """
+
+    PREAMBLE = b"\x00\xbb"
+    HEADER_LENGTH = 6
+
+    def __init__(self, size=4096, max_payload=1024, verify_checksum=True):
+        """
+        Init the decoder buffer
+
+        :param size: initial size of the buffer
+        :type size: int
+        :param max_payload: biggest payload length accepted before resyncing
+        :type max_payload: int
+        :param verify_checksum: drop the commands whose checksum is wrong
+        :type verify_checksum: bool
+        """
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.max_payload = max_payload
+        self.verify_checksum = verify_checksum
+        self.checksum_errors = 0
+        self.length_errors = 0
+        self.discarded = 0
+
+    def checksum(frame):
+        """
+        Calculate the checksum of a command the way getCheckSum does
+
+        :param frame: complete command, checksum byte included
+        :type frame: bytes
+        :return: the checksum byte expected at the end of the command
+        :rtype: int
+        """
+        return sum(frame[2:-1]) & 255
+
+    def pending(self):
+        """
+        Number of bytes received and not decoded yet
+
+        :return: the number of bytes waiting in the buffer
+        :rtype: int
+        """
+        return self.end - self.start
+
+    def reset(self):
+        """
+        Drop the bytes waiting in the buffer
+        """
+        self.start = 0
+        self.end = 0
+
+    def feed(self, chunk):
+        """
+        Append bytes received from the device to the buffer
+
+        :param chunk: bytes received from the device
+        :type chunk: bytes
+        """
+        length = len(chunk)
+        pending = self.end - self.start
+        if pending == 0:
+            self.start = self.end = 0
+        if self.end + length > len(self.buffer):
+            if pending + length > len(self.buffer):
+                buffer = bytearray(max(len(self.buffer) * 2, pending + length))
+                buffer[:pending] = self.view[self.start:self.end]
+                self.buffer = buffer
+                self.view = memoryview(buffer)
+            else:
+                self.view[:pending] = self.view[self.start:self.end]
+            self.start = 0
+            self.end = pending
+        self.view[self.end:self.end + length] = chunk
+        self.end += length
+
+    def frames(self):
+        """
+        Yield the complete commands waiting in the buffer
+
+        :return: generator of commands
+        :rtype: generator of memoryview
+        """
+        buffer = self.buffer
+        while self.end - self.start >= 2:
+            start = self.start
+            if buffer[start] != 0 or buffer[start + 1] != 0xBB:
+                found = buffer.find(FrameDecoder.PREAMBLE, start, self.end)
+                if found < 0:
+                    # keep a trailing 0x00 which could start the next preamble
+                    found = self.end - 1 if buffer[self.end - 1] == 0 else self.end
+                self._skip(found - start)
+                continue
+            if self.end - start < FrameDecoder.HEADER_LENGTH:
+                return
+            length = (buffer[start + 4] << 8) | buffer[start + 5]
+            if length > self.max_payload:
+                self.length_errors += 1
+                self._skip(1)
+                continue
+            stop = start + length + FrameDecoder.HEADER_LENGTH + 1
+            if stop > self.end:
+                return
+            frame = self.view[start:stop]
+            if self.verify_checksum and FrameDecoder.checksum(frame) != frame[-1]:
+                self.checksum_errors += 1
+                logging.debug("Checksum error on %s", bytes(frame))
+                self._skip(1)
+                continue
+            self.start = stop
+            yield frame
+
+    def decode(self, chunk):
+        """
+        Append bytes received from the device and yield the complete commands
+
+        :param chunk: bytes received from the device
+        :type chunk: bytes
+        :return: generator of commands
+        :rtype: generator of memoryview
+        """
+        self.feed(chunk)
+        return self.frames()
+
+    def _skip(self, count):
+        """
+        Drop bytes at the beginning of the buffer while resyncing
+
+        :param count: number of bytes to drop
+        :type count: int
+        """
+        self.discarded += count
+        self.start += count
+        if self.start == self.end:
+            self.reset()
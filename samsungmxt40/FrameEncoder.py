@@ -0,0 +1,109 @@
+import struct
+import threading
+
+class FrameEncoder:
+    """
+    Encoder of the commands sent to the device
+
+    Each thread writes its commands in buffers of its own, one per command
+    size, kept between calls, so sessions building commands from several
+    threads may share an encoder and only the bytes returned get allocated.
+
+    A command is the 0x00 0xBB preamble, the type, the sequence number, the
+    payload length on 2 bytes, the payload and a checksum byte which is the
+    sum of every byte after the preamble. The commands without arguments
+    are encoded once in templates shared by every encoder, only their
+    sequence number and checksum get patched afterwards.
+
+    :var templates: mapping of (type, payload) to its command encoded with sequence number 0
+    :vartype templates: mapping: dict(tuple(int, bytes), bytes)
+    """
+
+    HEADER = struct.Struct(">BBBBH")
+
+    templates = {}
+
+    def __init__(self):
+        """
+        Init the per-thread buffers
+        """
+        self.local = threading.local()
+
+    def _reserve(self, size):
+        """
+        Buffer of the current thread holding a command of a size
+
+        :param size: size of the command
+        :type size: int
+        :return: the buffer
+        :rtype: bytearray
+        """
+        try:
+            return self.local.buffers[size]
+        except AttributeError:
+            self.local.buffers = {}
+        except KeyError:
+            pass
+        buffer = self.local.buffers[size] = bytearray(size)
+        return buffer
+
+    def encode(self, type_data, sequence, payload):
+        """
+        Encode a command
+
+        :param type_data: type of the command
+        :type type_data: int
+        :param sequence: sequence number of the command
+        :type sequence: int
+        :param payload: array of data to send to the device
+        :type payload: array of bytes
+        :return: bytes to send to the device
+        :rtype: bytes
+        """
+        length = len(payload)
+        size = length + 7
+        buffer = self._reserve(size)
+        FrameEncoder.HEADER.pack_into(buffer, 0, 0, 0xBB, type_data, sequence, length)
+        buffer[6:6 + length] = payload
+        buffer[6 + length] = (type_data + sequence + (length >> 8) + (length & 255) + sum(payload)) & 255
+        return bytes(buffer)
+
+    def encode_constant(self, type_data, sequence, payload):
+        """
+        Encode a command from its template, creating the template on first use
+
+        :param type_data: type of the command
+        :type type_data: int
+        :param sequence: sequence number of the command
+        :type sequence: int
+        :param payload: array of data to send to the device
+        :type payload: array of bytes
+        :return: bytes to send to the device
+        :rtype: bytes
+        """
+        key = (type_data, bytes(payload))
+        template = FrameEncoder.templates.get(key)
+        if template is None:
+            template = self.encode(type_data, 0, payload)
+            FrameEncoder.templates[key] = template
+        buffer = self._reserve(len(template))
+        buffer[:] = template
+        buffer[3] = sequence
+        buffer[-1] = (template[-1] + sequence) & 255
+        return bytes(buffer)
+
+    def restamp(command, sequence):
+        """
+        Copy a command with another sequence number
+
+        :param command: complete command
+        :type command: bytes
+        :param sequence: new sequence number
+        :type sequence: int
+        :return: the command with the sequence number and the checksum updated
+        :rtype: bytes
+        """
+        frame = bytearray(command)
+        frame[-1] = (frame[-1] - frame[3] + sequence) & 255
+        frame[3] = sequence
+        return bytes(frame)
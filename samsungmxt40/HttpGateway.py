@@ -0,0 +1,355 @@
+import json
+import time
+import asyncio
+import logging
+from http import HTTPStatus
+
+import bluetooth
+
+from samsungmxt40.SamsungMXT40 import SamsungMXT40
+from samsungmxt40.AsyncSamsungMXT40 import AsyncSamsungMXT40
+from samsungmxt40.ResponseDecoder import SoundSetting
+
+class HttpGateway:
+    """
+    HTTP/JSON front end driving the towers from one asyncio event loop
+
+    Routes::
+
+        GET  /devices                     devices connected through the gateway
+        GET  /devices/<mac>               cached state of a device, the link is not used
+        POST /devices/<mac>/<command>     body: JSON list of the arguments
+        POST /batch                       body: {"devices": [<mac>, ...], "commands": [[<command>, [<arguments>]], ...]}
+
+    The commands are lighting_status, color, dj_effect, tempo, bass_booster,
+    volume, mute, source and on_off, with the arguments of the actions of
+    :class:`CommandPlan`. A batch is built into one list of frames per
+    device, a mode switch being inserted only when a command needs another
+    mode, and sent in one pipelined pass; the devices run concurrently.
+    Each response carries a Server-Timing header with the time spent on the
+    links and in total, and the total in X-Response-Time::
+
+        gateway = HttpGateway(port=8080)
+        asyncio.run(gateway.serve_forever())
+
+    :param host: address to listen on, local only by default
+    :type host: str
+    :param port: TCP port, 0 picks a free one
+    :type port: int
+    :param factory: callable building a session, not connected, for a MAC Address
+    :type factory: callable
+    :var modes: mapping of command name to the protocol mode it is sent in, None for any
+    :vartype modes: mapping: dict(str, str)
+    :var MAX_BODY: largest request body accepted, in bytes
+    :vartype MAX_BODY: int
+    """
+
+    modes = {
+        "lighting_status": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "color": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "dj_effect": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "tempo": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "bass_booster": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "volume": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "mute": SamsungMXT40.EFFECT_FRAGMENT_MODE,
+        "source": None,
+        "on_off": SamsungMXT40.REMOTE_CONTROL_MODE,
+    }
+
+    MAX_BODY = 1 << 20
+
+    def __init__(self, host="127.0.0.1", port=8080, factory=AsyncSamsungMXT40):
+        """
+        Init the gateway, the server is started by :meth:`start`
+
+        :param host: address to listen on, local only by default
+        :type host: str
+        :param port: TCP port, 0 picks a free one
+        :type port: int
+        :param factory: callable building a session, not connected, for a MAC Address
+        :type factory: callable
+        """
+        self.host = host
+        self.port = port
+        self.factory = factory
+        self.sessions = {}
+        self.locks = {}
+        self.server = None
+
+    def build(self, samsung, commands, volume=None):
+        """
+        Build the frames of a list of commands
+
+        :param samsung: session building the frames
+        :type samsung: SamsungMXT40
+        :param commands: list of [command name, arguments]
+        :type commands: list
+        :param volume: current volume, needed by the volume command
+        :type volume: int
+        :return: the frames, the (start, end) of the frames of each command and the mode the link ends in
+        :rtype: tuple(list of bytes, list of tuple(int, int), str)
+        """
+        frames = []
+        spans = []
+        mode = samsung.mode
+        for name, args in commands:
+            if name not in HttpGateway.modes:
+                raise KeyError("Unknown command %s" % name)
+            wanted = HttpGateway.modes[name]
+            if wanted == SamsungMXT40.EFFECT_FRAGMENT_MODE and mode != wanted:
+                frames += samsung.effectFragmentCommands()
+            elif wanted == SamsungMXT40.REMOTE_CONTROL_MODE and mode != wanted:
+                frames += samsung.remoteControlCommands()
+            if wanted is not None:
+                mode = wanted
+            start = len(frames)
+            if name == "lighting_status":
+                frames.append(samsung.status_setting(*args))
+            elif name == "color":
+                r, g, b = args
+                frames.append(samsung.illumination_setting(int(r), int(g), int(b)))
+            elif name == "dj_effect":
+                effect, value = args
+                frames.append(samsung.change_dj_effect(effect, int(value)))
+            elif name == "tempo":
+                value, = args
+                frames.append(samsung.tempo(int(value)))
+            elif name == "bass_booster":
+                state, = args
+                frames.append(samsung.bass_booster(state))
+            elif name == "volume":
+                target, = args
+                if volume is None:
+                    raise ValueError("Volume unknown")
+                frames += samsung.volumeCommands(volume, int(target))
+                volume = max(0, min(int(target), SamsungMXT40.MAX_VOLUME))
+            elif name == "mute":
+                frames.append(samsung.toggle_mute())
+            elif name == "source":
+                source, = args
+                frames += samsung.sourceSwitchCommands(source)
+                mode = None
+            elif name == "on_off":
+                frames.append(samsung.toggle_on_off())
+            spans.append((start, len(frames)))
+        return frames, spans, mode
+
+    def lock(self, device):
+        """
+        Lock serializing the batches of a device
+
+        :param device: The device MAC Address.
+        :type device: str
+        :rtype: asyncio.Lock
+        """
+        lock = self.locks.get(device)
+        if lock is None:
+            lock = self.locks[device] = asyncio.Lock()
+        return lock
+
+    async def session(self, device):
+        """
+        Connected session of a device, connecting it if needed
+
+        :param device: The device MAC Address.
+        :type device: str
+        :rtype: AsyncSamsungMXT40
+        """
+        samsung = self.sessions.get(device)
+        if samsung is None or not samsung.is_connected():
+            samsung = self.factory(device)
+            await samsung.connect()
+            await samsung.load_source_info()
+            self.sessions[device] = samsung
+        return samsung
+
+    def drop(self, device):
+        """
+        Close the session of a device after a link failure
+
+        :param device: The device MAC Address.
+        :type device: str
+        """
+        samsung = self.sessions.pop(device, None)
+        if samsung is not None and samsung.is_connected():
+            try:
+                samsung.close()
+            except (OSError, bluetooth.btcommon.BluetoothError):
+                pass
+
+    async def run(self, device, commands):
+        """
+        Send a list of commands to a device in one pipelined pass
+
+        :param device: The device MAC Address.
+        :type device: str
+        :param commands: list of [command name, arguments]
+        :type commands: list
+        :return: the commands received for each command, in hexadecimal
+        :rtype: list of list of str
+        """
+        async with self.lock(device):
+            try:
+                samsung = await self.session(device)
+                volume = None
+                if any(name == "volume" for name, args in commands):
+                    volume = await samsung.get_volume()
+                frames, spans, mode = self.build(samsung, commands, volume)
+                replies = await samsung.pipeline(frames, window=len(frames)) if frames else []
+            except (OSError, asyncio.TimeoutError, bluetooth.btcommon.BluetoothError):
+                self.drop(device)
+                raise
+            samsung.mode = mode if all(replies) else None
+            return [[reply.hex() for answer in replies[start:end] for reply in answer] for start, end in spans]
+
+    def state(self, device):
+        """
+        Cached state of a device
+
+        :param device: The device MAC Address.
+        :type device: str
+        :return: the state, None if the device never connected through the gateway
+        :rtype: dict
+        """
+        samsung = self.sessions.get(device)
+        if samsung is None:
+            return None
+        records = []
+        for response, age in samsung.state.records():
+            record = {"record": type(response).__name__, "age": age}
+            record.update((name, getattr(response, name)) for name in response.__slots__)
+            records.append(record)
+        volume = SamsungMXT40.volumeOf(samsung.state.get(SoundSetting, SamsungMXT40.VOLUME_SETTING, float("inf")))
+        return {"device": device, "connected": samsung.is_connected(), "source": samsung.source_label, "mode": samsung.mode, "volume": volume, "records": records}
+
+    async def dispatch(self, method, path, body):
+        """
+        Answer a request
+
+        :param method: HTTP method
+        :type method: str
+        :param path: path of the request
+        :type path: str
+        :param body: body of the request
+        :type body: bytes
+        :return: the HTTP status, the JSON response and the seconds spent on the links
+        :rtype: tuple(int, object, float)
+        """
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if method == "GET" and parts == ["devices"]:
+            devices = [{"device": device, "connected": samsung.is_connected(), "source": samsung.source_label} for device, samsung in self.sessions.items()]
+            return HTTPStatus.OK, {"devices": devices}, 0.0
+        if method == "GET" and len(parts) == 2 and parts[0] == "devices":
+            state = self.state(parts[1])
+            if state is None:
+                return HTTPStatus.NOT_FOUND, {"error": "Unknown device %s" % parts[1]}, 0.0
+            return HTTPStatus.OK, state, 0.0
+        if method != "POST" or not (parts == ["batch"] or (len(parts) == 3 and parts[0] == "devices")):
+            return HTTPStatus.NOT_FOUND, {"error": "No route for %s %s" % (method, path)}, 0.0
+        try:
+            request = json.loads(body or b"[]")
+            if parts == ["batch"]:
+                devices = list(request["devices"])
+                commands = [(name, list(args)) for name, args in request["commands"]]
+            else:
+                devices = [parts[1]]
+                commands = [(parts[2], list(request))]
+            # validate every command before using a link
+            self.build(SamsungMXT40("", connect=False), commands, 0)
+        except (KeyError, TypeError, ValueError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": "Invalid request: %s" % e}, 0.0
+        started = time.monotonic()
+        outcomes = await asyncio.gather(*(self.run(device, commands) for device in devices), return_exceptions=True)
+        link = time.monotonic() - started
+        results = []
+        for device, outcome in zip(devices, outcomes):
+            if isinstance(outcome, BaseException):
+                logging.warning("Commands failed on %s: %s", device, outcome)
+                results.append({"device": device, "ok": False, "error": str(outcome)})
+            else:
+                results.append({"device": device, "ok": True, "replies": outcome})
+        if parts != ["batch"]:
+            return (HTTPStatus.OK if results[0]["ok"] else HTTPStatus.BAD_GATEWAY), results[0], link
+        return HTTPStatus.OK, {"results": results}, link
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve the requests of a HTTP/1.1 connection
+
+        :param reader: stream of the connection
+        :type reader: asyncio.StreamReader
+        :param writer: stream of the connection
+        :type writer: asyncio.StreamWriter
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                started = time.monotonic()
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    return
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                if length > HttpGateway.MAX_BODY:
+                    status, response, link = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, 0.0
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, response, link = await self.dispatch(method, path, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                data = json.dumps(response).encode()
+                total = time.monotonic() - started
+                writer.write(("HTTP/1.1 %d %s\r\n"
+                              "Content-Type: application/json\r\n"
+                              "Content-Length: %d\r\n"
+                              "Server-Timing: link;dur=%.3f, total;dur=%.3f\r\n"
+                              "X-Response-Time: %.3fms\r\n"
+                              "Connection: %s\r\n\r\n" % (status, status.phrase, len(data), link * 1000, total * 1000, total * 1000, "keep-alive" if keep_alive else "close")).encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.debug("HTTP connection closed: %s", e)
+        finally:
+            writer.close()
+
+    async def start(self):
+        """
+        Start listening
+
+        :return: the port listened on
+        :rtype: int
+        """
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Listen and serve until cancelled
+        """
+        port = await self.start()
+        logging.info("Listening on http://%s:%d", self.host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stop listening and close the links
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for device in list(self.sessions):
+            self.drop(device)
@@ -0,0 +1,328 @@
+import time
+import logging
+import threading
+
+class LightAnimator:
+    """
+    Stream illumination colors to a device at a target frame rate
+
+    The colors come from a timeline of keyframes, interpolated in the
+    OKLab perceptual space, or from :meth:`set_color` calls of a show
+    control software. At each tick the newest color is written without
+    waiting for the previous answers, at most window commands stay
+    unanswered: when the link falls behind the stale frames are dropped
+    instead of queued::
+
+        animator = LightAnimator(samsung, fps=25)
+        animator.play(LightAnimator.Timeline([(0, (10, 0, 0)), (2, (0, 0, 10))]))
+        animator.run()
+        print(animator.stats())
+
+    The animator is the only user of the session while it runs.
+
+    :param samsung: the connected session
+    :type samsung: SamsungMXT40
+    :param fps: target frames per second
+    :type fps: float
+    :param window: maximum number of frames waiting for an answer
+    :type window: int
+    :param status: light status set before the first frame, unchanged if None
+    :type status: str
+    :var sent: number of frames written
+    :vartype sent: int
+    :var dropped: number of frames dropped because the link or the loop fell behind
+    :vartype dropped: int
+    """
+
+    class Timeline:
+        """
+        Color keyframes, interpolated in the OKLab space
+
+        :param keyframes: list of (seconds, (r, g, b)), in device levels
+        :type keyframes: list of tuple(float, tuple(int, int, int))
+        :param loop: start again once the last keyframe is reached
+        :type loop: bool
+        :param max_level: value of a fully lit color channel for the device
+        :type max_level: int
+        """
+
+        def __init__(self, keyframes, loop=False, max_level=10):
+            if not keyframes:
+                raise ValueError("A timeline needs at least one keyframe")
+            keyframes = sorted(keyframes, key=lambda keyframe: keyframe[0])
+            self.times = [float(t) for t, color in keyframes]
+            self.labs = [LightAnimator.toOklab(color, max_level) for t, color in keyframes]
+            self.loop = loop
+            self.max_level = max_level
+            self.duration = self.times[-1]
+
+        def at(self, t):
+            """
+            Color at a time
+
+            :param t: seconds since the start of the timeline
+            :type t: float
+            :return: the color in device levels, the last keyframe once a timeline without loop is over
+            :rtype: tuple(int, int, int)
+            """
+            if t > self.duration and self.loop and self.duration > 0:
+                t = t % self.duration
+            if t <= self.times[0]:
+                return LightAnimator.fromOklab(self.labs[0], self.max_level)
+            for i in range(1, len(self.times)):
+                if t <= self.times[i]:
+                    span = self.times[i] - self.times[i - 1]
+                    ratio = (t - self.times[i - 1]) / span if span > 0 else 1.0
+                    lab = tuple(a + (b - a) * ratio for a, b in zip(self.labs[i - 1], self.labs[i]))
+                    return LightAnimator.fromOklab(lab, self.max_level)
+            return LightAnimator.fromOklab(self.labs[-1], self.max_level)
+
+    def __init__(self, samsung, fps=20.0, window=4, status=None):
+        """
+        Init the animator
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :param fps: target frames per second
+        :type fps: float
+        :param window: maximum number of frames waiting for an answer
+        :type window: int
+        :param status: light status set before the first frame, unchanged if None
+        :type status: str
+        """
+        self.samsung = samsung
+        self.fps = fps
+        self.window = max(1, window)
+        self.status = status
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.timeline = None
+        self.timeline_start = None
+        self.target = None
+        self.target_pending = False
+        self.last_color = None
+        self.sent = 0
+        self.dropped = 0
+        self.started_at = None
+        self.stopped_at = None
+
+    def toLinear(c):
+        """
+        Convert a sRGB channel to linear light
+
+        :param c: channel between 0 and 1
+        :type c: float
+        :rtype: float
+        """
+        return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+    def fromLinear(c):
+        """
+        Convert a linear light channel to sRGB
+
+        :param c: channel between 0 and 1
+        :type c: float
+        :rtype: float
+        """
+        c = min(max(c, 0.0), 1.0)
+        return c * 12.92 if c <= 0.0031308 else 1.055 * c ** (1 / 2.4) - 0.055
+
+    def toOklab(color, max_level=10):
+        """
+        Convert a device color to OKLab
+
+        :param color: red, green and blue in device levels
+        :type color: tuple(int, int, int)
+        :param max_level: value of a fully lit color channel for the device
+        :type max_level: int
+        :return: L, a and b
+        :rtype: tuple(float, float, float)
+        """
+        r, g, b = (LightAnimator.toLinear(c / max_level) for c in color)
+        l = (0.4122214708 * r + 0.5363325363 * g + 0.0514459929 * b) ** (1 / 3)
+        m = (0.2119034982 * r + 0.6806995451 * g + 0.1073969566 * b) ** (1 / 3)
+        s = (0.0883024619 * r + 0.2817188376 * g + 0.6299787005 * b) ** (1 / 3)
+        return (0.2104542553 * l + 0.7936177850 * m - 0.0040720468 * s,
+                1.9779984951 * l - 2.4285922050 * m + 0.4505937099 * s,
+                0.0259040371 * l + 0.7827717662 * m - 0.8086757660 * s)
+
+    def fromOklab(lab, max_level=10):
+        """
+        Convert an OKLab color to the nearest device color
+
+        :param lab: L, a and b
+        :type lab: tuple(float, float, float)
+        :param max_level: value of a fully lit color channel for the device
+        :type max_level: int
+        :return: red, green and blue in device levels
+        :rtype: tuple(int, int, int)
+        """
+        L, a, b = lab
+        l = (L + 0.3963377774 * a + 0.2158037573 * b) ** 3
+        m = (L - 0.1055613458 * a - 0.0638541728 * b) ** 3
+        s = (L - 0.0894841775 * a - 1.2914855480 * b) ** 3
+        rgb = (4.0767416621 * l - 3.3077115913 * m + 0.2309699292 * s,
+               -1.2684380046 * l + 2.6097574011 * m - 0.3413193965 * s,
+               -0.0041960863 * l - 0.7034186147 * m + 1.7076147010 * s)
+        return tuple(int(round(LightAnimator.fromLinear(c) * max_level)) for c in rgb)
+
+    def play(self, timeline):
+        """
+        Animate a timeline, starting at the next frame
+
+        :param timeline: the keyframes
+        :type timeline: LightAnimator.Timeline
+        """
+        with self.lock:
+            self.timeline = timeline
+            self.timeline_start = None
+            self.target = None
+            self.target_pending = False
+
+    def set_color(self, r, g, b):
+        """
+        Show a color at the next frame, replacing the timeline and any color not sent yet
+
+        :param r: red color
+        :type r: int
+        :param g: green color
+        :type g: int
+        :param b: blue color
+        :type b: int
+        """
+        with self.lock:
+            if self.target_pending:
+                self.dropped += 1
+            self.timeline = None
+            self.target = (r, g, b)
+            self.target_pending = True
+
+    def start(self):
+        """
+        Stream the frames in a background thread until :meth:`stop`
+        """
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, args=(False,), name="SamsungMXT40 animator %s" % self.samsung.device, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop streaming and wait for the background thread
+        """
+        self.stopping.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self, until_done=True):
+        """
+        Stream the frames in the calling thread
+
+        :param until_done: return once the timeline is over, run until :meth:`stop` otherwise
+        :type until_done: bool
+        """
+        samsung = self.samsung
+        samsung.effect_fragment_mode()
+        if self.status is not None:
+            samsung.request(samsung.status_setting(self.status))
+        interval = 1.0 / self.fps
+        in_flight = {}
+        if samsung.reader is not None:
+            samsung.reader.begin(in_flight)
+        self.started_at = time.monotonic()
+        self.stopped_at = None
+        next_tick = self.started_at
+        try:
+            while not self.stopping.is_set():
+                now = time.monotonic()
+                if now < next_tick:
+                    self.stopping.wait(next_tick - now)
+                    now = time.monotonic()
+                late = int((now - next_tick) / interval)
+                if late > 0:
+                    self.dropped += late
+                    next_tick += late * interval
+                next_tick += interval
+                for command, response in samsung.readCommands(0):
+                    in_flight.pop(command[3], None)
+                for sequence, sent_at in list(in_flight.items()):
+                    if now - sent_at > samsung.request_timeout:
+                        del in_flight[sequence]
+                color = self.frame(now)
+                if color is None:
+                    if until_done:
+                        break
+                    continue
+                if color == self.last_color:
+                    self.sent_color(color)
+                    continue
+                if len(in_flight) >= self.window:
+                    with self.lock:
+                        if not (self.target_pending and self.target == color):
+                            self.dropped += 1
+                    continue
+                command = samsung.illumination_setting(*color)
+                in_flight[command[3]] = now
+                samsung.writeBluetooth(command)
+                self.sent += 1
+                self.last_color = color
+                self.sent_color(color)
+            deadline = time.monotonic() + samsung.request_timeout
+            while in_flight and time.monotonic() < deadline:
+                for command, response in samsung.readCommands(deadline - time.monotonic()):
+                    in_flight.pop(command[3], None)
+        finally:
+            if samsung.reader is not None:
+                samsung.reader.end()
+            self.stopped_at = time.monotonic()
+            samsung.last_activity = self.stopped_at
+        logging.debug("Animation %s", self.stats())
+
+    def frame(self, now):
+        """
+        Color of the frame at a time
+
+        :param now: time.monotonic() of the frame
+        :type now: float
+        :return: the color, None if there is nothing left to show
+        :rtype: tuple(int, int, int)
+        """
+        with self.lock:
+            if self.timeline is not None:
+                if self.timeline_start is None:
+                    self.timeline_start = now
+                t = now - self.timeline_start
+                color = self.timeline.at(t)
+                if not self.timeline.loop and t >= self.timeline.duration:
+                    # keep the last keyframe pending until it is sent
+                    self.timeline = None
+                    self.target = color
+                    self.target_pending = True
+                return color
+            if self.target_pending:
+                return self.target
+            return None
+
+    def sent_color(self, color):
+        """
+        Mark the color set by :meth:`set_color` as shown
+
+        :param color: color of the device
+        :type color: tuple(int, int, int)
+        """
+        with self.lock:
+            if self.target_pending and self.target == color:
+                self.target_pending = False
+
+    def stats(self):
+        """
+        Frames sent and dropped, and the frame rate achieved
+
+        :return: fps, sent, dropped and elapsed seconds
+        :rtype: dict
+        """
+        if self.started_at is None:
+            return {"fps": 0.0, "sent": self.sent, "dropped": self.dropped, "elapsed": 0.0}
+        elapsed = (self.stopped_at or time.monotonic()) - self.started_at
+        return {"fps": self.sent / elapsed if elapsed > 0 else 0.0, "sent": self.sent, "dropped": self.dropped, "elapsed": elapsed}
@@ -0,0 +1,360 @@
+import os
+import time
+import bisect
+import logging
+import tempfile
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class Metrics:
+    """
+    Link statistics of one or more sessions, exported in the Prometheus text format
+
+    A session records into the metrics given to it, or attached to it
+    afterwards; a session without metrics only pays an attribute test::
+
+        metrics = Metrics()
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", metrics=metrics)
+        metrics.serve(9474)
+        ...
+        print(metrics.histogram("rtt_seconds", opcode=96).count)
+        metrics.write("/var/lib/node_exporter/samsungmxt40.prom")
+
+    The round trip time of a command is measured from its write to the
+    first command received with its sequence number.
+
+    :param buckets: upper bounds of the histogram buckets in seconds, DEFAULT_BUCKETS by default
+    :type buckets: list of float
+    :var DEFAULT_BUCKETS: upper bounds of the histogram buckets in seconds
+    :vartype DEFAULT_BUCKETS: list of float
+    :var PREFIX: prefix of the exported metric names
+    :vartype PREFIX: str
+    :var counters_help: mapping of counter name to its description
+    :vartype counters_help: mapping: dict(str, str)
+    :var histograms_help: mapping of histogram name to its description
+    :vartype histograms_help: mapping: dict(str, str)
+    """
+
+    DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+    PREFIX = "samsungmxt40_"
+
+    counters_help = {
+        "frames_sent": "Commands written to the device",
+        "bytes_sent": "Bytes written to the device",
+        "frames_received": "Complete commands received from the device",
+        "bytes_received": "Bytes read from the device",
+        "timeouts": "Requests and pipelines the device did not fully answer in time",
+        "connects": "Connections opened",
+        "reconnects": "Connections opened again after the first one",
+    }
+
+    histograms_help = {
+        "rtt_seconds": "Seconds from the write of a command to its first answer",
+        "handshake_seconds": "Seconds to open the connection and complete the handshake",
+    }
+
+    class Histogram:
+        """
+        Count of the values observed in each bucket
+
+        :param buckets: sorted upper bounds of the buckets
+        :type buckets: list of float
+        :var counts: number of values in each bucket, the last one counting the values above every bound
+        :vartype counts: list of int
+        :var sum: sum of the values observed
+        :vartype sum: float
+        :var count: number of values observed
+        :vartype count: int
+        """
+
+        def __init__(self, buckets):
+            self.buckets = buckets
+            self.counts = [0] * (len(buckets) + 1)
+            self.sum = 0.0
+            self.count = 0
+
+        def observe(self, value):
+            """
+            Add a value
+
+            :param value: the value
+            :type value: float
+            """
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+        def merge(self, other):
+            """
+            Add the values of another histogram with the same buckets
+
+            :param other: the histogram
+            :type other: Metrics.Histogram
+            """
+            self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+            self.sum += other.sum
+            self.count += other.count
+
+        def cumulative(self):
+            """
+            Number of values lower or equal to each bound, then the total
+
+            :rtype: list of int
+            """
+            total = 0
+            counts = []
+            for count in self.counts:
+                total += count
+                counts.append(total)
+            return counts
+
+    def __init__(self, buckets=None):
+        """
+        Init empty metrics
+
+        :param buckets: upper bounds of the histogram buckets in seconds, DEFAULT_BUCKETS by default
+        :type buckets: list of float
+        """
+        self.buckets = sorted(buckets if buckets is not None else Metrics.DEFAULT_BUCKETS)
+        self.counters = Counter()
+        self.histograms = {}
+        self.pending = {}
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def attach(self, samsung):
+        """
+        Record the statistics of a session, its decode errors included
+
+        :param samsung: the session
+        :type samsung: SamsungMXT40
+        """
+        samsung.metrics = self
+        with self.lock:
+            self.sessions[samsung.device] = samsung
+
+    def detach(self, samsung):
+        """
+        Stop recording the statistics of a session, what it recorded is kept
+
+        :param samsung: the session
+        :type samsung: SamsungMXT40
+        """
+        samsung.metrics = None
+        with self.lock:
+            if self.sessions.get(samsung.device) is samsung:
+                del self.sessions[samsung.device]
+
+    def _observe(self, name, device, opcode, value):
+        """
+        Add a value to a histogram, self.lock must be held
+        """
+        histogram = self.histograms.get((name, device, opcode))
+        if histogram is None:
+            histogram = self.histograms[(name, device, opcode)] = Metrics.Histogram(self.buckets)
+        histogram.observe(value)
+
+    def sent(self, device, command):
+        """
+        Record a command written
+
+        :param device: MAC Address of the device
+        :type device: str
+        :param command: complete command
+        :type command: bytes
+        """
+        with self.lock:
+            self.counters[("frames_sent", device)] += 1
+            self.counters[("bytes_sent", device)] += len(command)
+            if len(command) > 6:
+                self.pending[(device, command[3])] = (command[6], time.monotonic())
+
+    def read(self, device, size):
+        """
+        Record bytes read from the socket
+
+        :param device: MAC Address of the device
+        :type device: str
+        :param size: number of bytes
+        :type size: int
+        """
+        with self.lock:
+            self.counters[("bytes_received", device)] += size
+
+    def received(self, device, command):
+        """
+        Record a complete command received, the round trip time of the command it answers
+
+        :param device: MAC Address of the device
+        :type device: str
+        :param command: complete command
+        :type command: bytes
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.counters[("frames_received", device)] += 1
+            sent = self.pending.pop((device, command[3]), None)
+            if sent is not None:
+                self._observe("rtt_seconds", device, sent[0], now - sent[1])
+
+    def timeout(self, device):
+        """
+        Record a request or a pipeline not fully answered
+
+        :param device: MAC Address of the device
+        :type device: str
+        """
+        with self.lock:
+            self.counters[("timeouts", device)] += 1
+
+    def connected(self, device, seconds):
+        """
+        Record a connection opened and its handshake
+
+        :param device: MAC Address of the device
+        :type device: str
+        :param seconds: duration of the connection and the handshake
+        :type seconds: float
+        """
+        with self.lock:
+            if self.counters[("connects", device)]:
+                self.counters[("reconnects", device)] += 1
+            self.counters[("connects", device)] += 1
+            self._observe("handshake_seconds", device, None, seconds)
+
+    def counter(self, name, device=None):
+        """
+        Value of a counter
+
+        :param name: counter name, see counters_help
+        :type name: str
+        :param device: MAC Address of the device, every device if None
+        :type device: str
+        :rtype: int
+        """
+        with self.lock:
+            return sum(value for (counter, key), value in self.counters.items() if counter == name and device in (None, key))
+
+    def histogram(self, name, device=None, opcode=None):
+        """
+        Values observed by a histogram
+
+        :param name: histogram name, see histograms_help
+        :type name: str
+        :param device: MAC Address of the device, every device if None
+        :type device: str
+        :param opcode: opcode of the commands, every opcode if None
+        :type opcode: int
+        :return: a copy merging the matching histograms
+        :rtype: Metrics.Histogram
+        """
+        merged = Metrics.Histogram(self.buckets)
+        with self.lock:
+            for (histogram, key, code), values in self.histograms.items():
+                if histogram == name and device in (None, key) and opcode in (None, code):
+                    merged.merge(values)
+        return merged
+
+    def decode_errors(self):
+        """
+        Decode errors of the sessions attached
+
+        :return: mapping of (device, kind) to count, kind is checksum, length or payload
+        :rtype: dict
+        """
+        with self.lock:
+            sessions = list(self.sessions.items())
+        errors = {}
+        for device, samsung in sessions:
+            errors[(device, "checksum")] = samsung.decoder.checksum_errors
+            errors[(device, "length")] = samsung.decoder.length_errors
+            errors[(device, "payload")] = samsung.responses.errors
+        return errors
+
+    def labels(**labels):
+        """
+        Format Prometheus labels
+
+        :return: the labels between braces
+        :rtype: str
+        """
+        return "{" + ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels.items()) + "}"
+
+    def to_prometheus(self):
+        """
+        Export the metrics in the Prometheus text format
+
+        :rtype: str
+        """
+        lines = []
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: Metrics.Histogram(self.buckets) for key in self.histograms}
+            for key, histogram in histograms.items():
+                histogram.merge(self.histograms[key])
+        for name, description in Metrics.counters_help.items():
+            metric = Metrics.PREFIX + name + "_total"
+            lines += ["# HELP %s %s" % (metric, description), "# TYPE %s counter" % metric]
+            for (counter, device), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append("%s%s %d" % (metric, Metrics.labels(device=device), value))
+        metric = Metrics.PREFIX + "decode_errors_total"
+        lines += ["# HELP %s Commands or bytes dropped by the decoders" % metric, "# TYPE %s counter" % metric]
+        for (device, kind), value in sorted(self.decode_errors().items()):
+            lines.append("%s%s %d" % (metric, Metrics.labels(device=device, kind=kind), value))
+        for name, description in Metrics.histograms_help.items():
+            metric = Metrics.PREFIX + name
+            lines += ["# HELP %s %s" % (metric, description), "# TYPE %s histogram" % metric]
+            for (histogram, device, opcode), values in sorted(histograms.items(), key=lambda item: (item[0][0], item[0][1], -1 if item[0][2] is None else item[0][2])):
+                if histogram != name:
+                    continue
+                labels = {"device": device} if opcode is None else {"device": device, "opcode": opcode}
+                for bound, count in zip(self.buckets + ["+Inf"], values.cumulative()):
+                    lines.append("%s_bucket%s %d" % (metric, Metrics.labels(**labels, le=bound), count))
+                lines.append("%s_sum%s %f" % (metric, Metrics.labels(**labels), values.sum))
+                lines.append("%s_count%s %d" % (metric, Metrics.labels(**labels), values.count))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Write the Prometheus export to a file atomically, for the node exporter textfile collector
+
+        :param path: path of the file
+        :type path: str
+        """
+        directory = os.path.dirname(path) or "."
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port=9474, host="127.0.0.1"):
+        """
+        Serve the Prometheus export over HTTP in a background thread
+
+        :param port: TCP port, 0 picks a free one
+        :type port: int
+        :param host: address to listen on, local only by default
+        :type host: str
+        :return: the server, call shutdown() to stop it
+        :rtype: http.server.ThreadingHTTPServer
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug("Metrics %s", format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="SamsungMXT40 metrics", daemon=True).start()
+        return server
@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+
+class ProfileStore:
+    """
+    Persistent profile of each device, keyed by MAC Address
+
+    A profile holds the RFCOMM channel the device answered on and its
+    connect info, so the next connection goes straight to the right channel
+    and pipelines the handshake. The store is a JSON file rewritten
+    atomically on each change::
+
+        {"2C:FD:B3:E6:D1:08": {"channel": 2, "protocol_version": [1, 2], "model_info": 40,
+                               "country_info": 1, "sources": [1, 2, 4, 5], "group_mode": 0}}
+
+    :param path: path of the JSON file, default_path() by default
+    :type path: str
+    """
+
+    def __init__(self, path=None):
+        """
+        Init the store, the file is read on first use
+
+        :param path: path of the JSON file, default_path() by default
+        :type path: str
+        """
+        self.path = path if path is not None else ProfileStore.default_path()
+        self.profiles = None
+        self.lock = threading.Lock()
+
+    def default_path():
+        """
+        Default path of the store, in the XDG cache directory
+
+        :return: the path
+        :rtype: str
+        """
+        cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache, "samsungmxt40", "profiles.json")
+
+    def get(self, device):
+        """
+        Return the profile of a device
+
+        :param device: The device MAC Address.
+        :type device: str
+        :return: the profile, None if the device is unknown
+        :rtype: dict
+        """
+        with self.lock:
+            profile = self._load().get(device.upper())
+            return None if profile is None else dict(profile)
+
+    def put(self, device, profile):
+        """
+        Store the profile of a device, the file is only rewritten if it changed
+
+        :param device: The device MAC Address.
+        :type device: str
+        :param profile: channel, protocol_version, model_info, country_info, sources and group_mode
+        :type profile: dict
+        """
+        with self.lock:
+            profiles = self._load()
+            if profiles.get(device.upper()) == profile:
+                return
+            profiles[device.upper()] = dict(profile)
+            self._save()
+
+    def forget(self, device):
+        """
+        Remove the profile of a device
+
+        :param device: The device MAC Address.
+        :type device: str
+        """
+        with self.lock:
+            if self._load().pop(device.upper(), None) is not None:
+                self._save()
+
+    def _load(self):
+        """
+        Read the file once, self.lock must be held
+
+        :return: mapping of MAC Address to profile
+        :rtype: dict
+        """
+        if self.profiles is None:
+            try:
+                with open(self.path) as f:
+                    self.profiles = json.load(f)
+            except FileNotFoundError:
+                self.profiles = {}
+            except (OSError, ValueError) as e:
+                logging.warning("Ignoring unreadable profile store %s: %s", self.path, e)
+                self.profiles = {}
+        return self.profiles
+
+    def _save(self):
+        """
+        Rewrite the file atomically, self.lock must be held
+        """
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".profiles")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.profiles, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning("Cannot write profile store %s: %s", self.path, e)
@@ -0,0 +1,265 @@
+import logging
+from collections import Counter
+
+class Response:
+    """
+    Immutable record decoded from the payload of a command received
+
+    :var OPCODE: first byte of the payloads decoded into this record
+    :vartype OPCODE: int
+    """
+
+    __slots__ = ()
+
+    OPCODE = None
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((type(self),) + tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % (name, getattr(self, name)) for name in self.__slots__))
+
+class ConnectInfo(Response):
+    """
+    Answer to connect_req
+
+    :var protocol_version: the two bytes of the protocol version
+    :vartype protocol_version: tuple(int, int)
+    :var model_info: model of the device
+    :vartype model_info: int
+    :var country_info: country of the device
+    :vartype country_info: int
+    :var sources: sources of the device, values of SamsungMXT40.source_map
+    :vartype sources: tuple of int
+    :var group_mode: group mode of the device
+    :vartype group_mode: int
+    """
+
+    __slots__ = ("protocol_version", "model_info", "country_info", "sources", "group_mode")
+
+    OPCODE = 2
+
+    def decode(payload):
+        """
+        Decode a connect info payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: ConnectInfo
+        """
+        num_of_source = payload[5]
+        return ConnectInfo((payload[1], payload[2]), payload[3], payload[4], tuple(payload[6:6 + num_of_source]), payload[len(payload) - 1])
+
+class SourceInfo(Response):
+    """
+    Current source, answer to source_info_req and source_switch
+
+    :var source: the source, value of SamsungMXT40.source_map
+    :vartype source: int
+    """
+
+    __slots__ = ("source",)
+
+    OPCODE = 49
+
+    def decode(payload):
+        """
+        Decode a source info payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: SourceInfo
+        """
+        return SourceInfo(payload[1])
+
+class SoundSetting(Response):
+    """
+    Values of a sound setting, answer to sound_setting_info_req and sound_setting
+
+    :var setting: sound setting number, 4 bass booster, 5 dj effect, 6 tempo...
+    :vartype setting: int
+    :var values: values of the setting
+    :vartype values: tuple of int
+    """
+
+    __slots__ = ("setting", "values")
+
+    OPCODE = 65
+
+    def decode(payload):
+        """
+        Decode a sound setting payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: SoundSetting
+        """
+        return SoundSetting(payload[1], tuple(payload[2:]))
+
+class SystemSetting(Response):
+    """
+    Values of a system setting, answer to system_setting_info_req and status_setting
+
+    :var setting: system setting number, 3 light status
+    :vartype setting: int
+    :var values: values of the setting
+    :vartype values: tuple of int
+    """
+
+    __slots__ = ("setting", "values")
+
+    OPCODE = 81
+
+    def decode(payload):
+        """
+        Decode a system setting payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: SystemSetting
+        """
+        return SystemSetting(payload[1], tuple(payload[2:]))
+
+class IlluminationSetting(Response):
+    """
+    Color of the lights, answer to illumination_setting
+
+    :var mode: illumination mode
+    :vartype mode: int
+    :var color: red, green and blue
+    :vartype color: tuple of int
+    """
+
+    __slots__ = ("mode", "color")
+
+    OPCODE = 97
+
+    def decode(payload):
+        """
+        Decode an illumination setting payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: IlluminationSetting
+        """
+        return IlluminationSetting(payload[1], tuple(payload[2:5]))
+
+class UsbStatus(Response):
+    """
+    USB player status, answer to usb_status_info_req
+
+    :var values: values of the status
+    :vartype values: tuple of int
+    """
+
+    __slots__ = ("values",)
+
+    OPCODE = 35
+
+    def decode(payload):
+        """
+        Decode an usb status payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: UsbStatus
+        """
+        return UsbStatus(tuple(payload[1:]))
+
+class AuxState(Response):
+    """
+    AUX input state, answer to aux_state_req
+
+    :var state: the state
+    :vartype state: int
+    """
+
+    __slots__ = ("state",)
+
+    OPCODE = 51
+
+    def decode(payload):
+        """
+        Decode an aux state payload
+
+        :param payload: payload received, checksum excluded
+        :type payload: bytes
+        :return: the record
+        :rtype: AuxState
+        """
+        return AuxState(payload[1])
+
+class ResponseDecoder:
+    """
+    Decode the commands received into records, dispatching on their opcode
+
+    :var registry: mapping of opcode to the function decoding its payload
+    :vartype registry: mapping: dict(int, callable)
+    :var unknown: number of commands received for each opcode without decoder
+    :vartype unknown: collections.Counter
+    :var errors: number of payloads too short for their decoder
+    :vartype errors: int
+    """
+
+    registry = {}
+
+    def __init__(self):
+        """
+        Init the counters
+        """
+        self.unknown = Counter()
+        self.errors = 0
+
+    def register(record):
+        """
+        Register the decoder of a record class
+
+        :param record: record class with an OPCODE and a decode function
+        :type record: class
+        """
+        ResponseDecoder.registry[record.OPCODE] = record.decode
+
+    def decode(self, command):
+        """
+        Decode a command received from the device
+
+        :param command: complete command, header and checksum included
+        :type command: bytes
+        :return: the record, None for an empty, unknown or malformed payload
+        :rtype: Response
+        """
+        if len(command) < 8 or command[2] == 0:
+            return None
+        payload = memoryview(command)[6:-1]
+        decode = ResponseDecoder.registry.get(payload[0])
+        if decode is None:
+            self.unknown[payload[0]] += 1
+            return None
+        try:
+            return decode(payload)
+        except IndexError:
+            self.errors += 1
+            logging.debug("Malformed payload %s", bytes(payload))
+            return None
+
+for record in (ConnectInfo, SourceInfo, SoundSetting, SystemSetting, IlluminationSetting, UsbStatus, AuxState):
+    ResponseDecoder.register(record)
@@ -0,0 +1,226 @@
+import time
+import random
+import logging
+
+import bluetooth
+
+from samsungmxt40.CommandSpec import CommandSpec
+from samsungmxt40.FrameEncoder import FrameEncoder
+from samsungmxt40.SamsungMXT40 import SamsungMXT40
+
+class Retrier:
+    """
+    Resend the commands a device did not answer, reconnecting when the link dropped
+
+    A command is resent only when sending it twice leaves the device in
+    the same state: the info requests and the settings carrying absolute
+    values. A toggle or a relative step which went unanswered may have
+    been applied or not, it is reported UNCERTAIN instead of being resent.
+    The commands are classified by the protocol row they were built from,
+    its idempotent flag tells if they are safe::
+
+        retrier = Retrier(samsung, attempts=4)
+        outcome = retrier.request(samsung.status_setting("PARTY"))
+        if outcome.status != Retrier.DONE:
+            print(outcome)
+
+    Between two attempts the retrier waits an exponential backoff with
+    jitter. A link which dropped is closed and connected again, which redoes
+    the handshake and restarts the sequence numbers, then put back in the
+    mode it was in and the commands are resent with new sequence numbers.
+
+    :param samsung: the session
+    :type samsung: SamsungMXT40
+    :param attempts: maximum number of times a command is sent
+    :type attempts: int
+    :param base_delay: seconds waited before the second attempt, doubled for each next one
+    :type base_delay: float
+    :param max_delay: maximum seconds waited between two attempts
+    :type max_delay: float
+    :param jitter: part of the delay drawn at random, between 0 and 1
+    :type jitter: float
+    :param seed: seed of the jitter, random if None
+    :type seed: int
+    :var DONE: status of a command answered by the device
+    :vartype DONE: str
+    :var FAILED: status of a safe command still unanswered after every attempt
+    :vartype FAILED: str
+    :var UNCERTAIN: status of an unsafe command which may or may not have been applied
+    :vartype UNCERTAIN: str
+    """
+
+    DONE = "DONE"
+    FAILED = "FAILED"
+    UNCERTAIN = "UNCERTAIN"
+
+    class Outcome:
+        """
+        Result of a command sent through the retrier
+
+        :param command: the command
+        :type command: bytes
+        :var status: DONE, FAILED or UNCERTAIN
+        :vartype status: str
+        :var replies: the commands received
+        :vartype replies: list of bytes
+        :var attempts: number of times the command was sent
+        :vartype attempts: int
+        :var error: the last link error met, None if the link never dropped
+        :vartype error: Exception
+        """
+
+        def __init__(self, command):
+            self.command = command
+            self.status = Retrier.FAILED
+            self.replies = []
+            self.attempts = 0
+            self.error = None
+
+        def __repr__(self):
+            opcode = self.command[6] if len(self.command) > 6 else None
+            if self.error is None:
+                return "opcode %s %s after %d attempts" % (opcode, self.status, self.attempts)
+            return "opcode %s %s after %d attempts: %s" % (opcode, self.status, self.attempts, self.error)
+
+    def __init__(self, samsung, attempts=3, base_delay=0.2, max_delay=5.0, jitter=0.5, seed=None):
+        """
+        Init the retrier
+
+        :param samsung: the session
+        :type samsung: SamsungMXT40
+        :param attempts: maximum number of times a command is sent
+        :type attempts: int
+        :param base_delay: seconds waited before the second attempt, doubled for each next one
+        :type base_delay: float
+        :param max_delay: maximum seconds waited between two attempts
+        :type max_delay: float
+        :param jitter: part of the delay drawn at random, between 0 and 1
+        :type jitter: float
+        :param seed: seed of the jitter, random if None
+        :type seed: int
+        """
+        self.samsung = samsung
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def isIdempotent(command):
+        """
+        Tell if a command can be sent again without changing its effect
+
+        :param command: complete command
+        :type command: bytes
+        :return: the row of the protocol building the command is idempotent, False for an unknown command
+        :rtype: bool
+        """
+        spec = CommandSpec.lookup(SamsungMXT40, command)
+        return spec is not None and spec.idempotent
+
+    def delay(self, attempt):
+        """
+        Seconds to wait after an attempt
+
+        :param attempt: number of the attempt which failed, from 1
+        :type attempt: int
+        :rtype: float
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * self.random.random())
+
+    def request(self, command):
+        """
+        Send a command until the device answers it
+
+        :param command: bytes to send to the device
+        :type command: bytes
+        :return: the outcome
+        :rtype: Retrier.Outcome
+        """
+        return self.pipeline([command])[0]
+
+    def pipeline(self, commands):
+        """
+        Pipeline commands, sending again the safe ones left unanswered
+
+        When the pipeline fails with a link error, the replies received
+        before it are lost: the unsafe commands of that attempt are
+        reported UNCERTAIN even if the device answered them.
+
+        :param commands: bytes of each command to send to the device
+        :type commands: list of bytes
+        :return: the outcome of each command
+        :rtype: list of Retrier.Outcome
+        """
+        samsung = self.samsung
+        mode = samsung.mode
+        outcomes = [Retrier.Outcome(command) for command in commands]
+        pending = list(range(len(commands)))
+        broken = not samsung.is_connected()
+        restamp = broken
+        attempt = 0
+        while pending and attempt < self.attempts:
+            attempt += 1
+            if attempt > 1:
+                time.sleep(self.delay(attempt - 1))
+            if broken:
+                try:
+                    self.reconnect(mode)
+                except (OSError, bluetooth.btcommon.BluetoothError) as e:
+                    logging.info("Reconnecting %s failed: %s", samsung.device, e)
+                    for index in pending:
+                        outcomes[index].error = e
+                    continue
+                broken = False
+            if not restamp:
+                frames = [commands[index] for index in pending]
+            else:
+                frames = [FrameEncoder.restamp(commands[index], samsung.nextSequence()) for index in pending]
+            samsung.link_error = None
+            try:
+                replies = samsung.pipeline(frames)
+                error = samsung.link_error
+            except (OSError, bluetooth.btcommon.BluetoothError) as e:
+                replies = [[] for index in pending]
+                error = e
+            unanswered = []
+            for index, reply in zip(pending, replies):
+                outcome = outcomes[index]
+                outcome.attempts += 1
+                if error is not None:
+                    outcome.error = error
+                if reply:
+                    outcome.status = Retrier.DONE
+                    outcome.replies = reply
+                elif Retrier.isIdempotent(outcome.command):
+                    unanswered.append(index)
+                else:
+                    outcome.status = Retrier.UNCERTAIN
+            pending = unanswered
+            restamp = True
+            broken = error is not None or (samsung.reader is not None and not samsung.reader.is_alive())
+            if pending:
+                logging.info("%d commands unanswered by %s, attempt %d/%d", len(pending), samsung.device, attempt, self.attempts)
+        return outcomes
+
+    def reconnect(self, mode):
+        """
+        Connect the session again and put it back in a protocol mode
+
+        :param mode: EFFECT_FRAGMENT_MODE, REMOTE_CONTROL_MODE or None
+        :type mode: str
+        """
+        samsung = self.samsung
+        if samsung.is_connected():
+            try:
+                samsung.close()
+            except (OSError, bluetooth.btcommon.BluetoothError):
+                samsung.socket = None
+                samsung.SEQUENCE_NUMBER = 0
+        logging.info("Reconnecting %s", samsung.device)
+        samsung.connect()
+        if mode == SamsungMXT40.EFFECT_FRAGMENT_MODE:
+            samsung.effect_fragment_mode()
+        elif mode == SamsungMXT40.REMOTE_CONTROL_MODE:
+            samsung.remote_control_mode()
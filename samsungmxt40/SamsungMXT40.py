@@ -1,15 +1,35 @@
 import time
+import select
+import threading
 import bluetooth
 import logging
 from datetime import datetime
 
+from samsungmxt40.FrameDecoder import FrameDecoder
+from samsungmxt40.FrameEncoder import FrameEncoder
+from samsungmxt40.ResponseDecoder import ResponseDecoder, ConnectInfo, SourceInfo, SoundSetting, SystemSetting, IlluminationSetting, UsbStatus, AuxState
+from samsungmxt40.CommandSpec import CommandSpec
+from samsungmxt40.DeviceState import DeviceState
+from samsungmxt40.SessionReader import SessionReader
+from samsungmxt40.TraceRecorder import TraceRecorder
+
 class SamsungMXT40:
     """
     Bluetooth communication with Samsung MX-T40 Sound Tower
 
     :param device: The device MAC Address.
     :type device: str
-    :var SEQUENCE_NUMBER: the sequence number which gets increase after each send
+    :param connect: open the connection right away
+    :type connect: bool
+    :param transport: callable opening the socket to the device for a MAC Address and a RFCOMM channel, RFCOMM by default
+    :type transport: callable
+    :param profiles: store of the channel and connect info of the devices already seen, none by default
+    :type profiles: ProfileStore
+    :param metrics: link statistics to record into, none by default
+    :type metrics: Metrics
+    :param trace: recorder of the frames sent and received, none by default
+    :type trace: TraceRecorder
+    :var SEQUENCE_NUMBER: the sequence number which gets increase after each send, wrapping at 8 bits
     :vartype SEQUENCE_NUMBER: int
     :var TYPE_DATA: const 1
     :vartype TYPE_DATA: int
@@ -21,8 +41,36 @@ class SamsungMXT40:
     :vartype status_map: mapping: dict(str, int)
     :var effect_map: mapping of music effect name to value to send to device
     :vartype effect_map: mapping: dict(str, int)
+    :var bass_booster_map: mapping of bass booster state to value to send to device
+    :vartype bass_booster_map: mapping: dict(str, int)
+    :var sound_map: mapping of sound step direction to remote control command to send to device
+    :vartype sound_map: mapping: dict(str, int)
+    :var protocol: the commands sent to the device, their builder methods are generated from it
+    :vartype protocol: list of CommandSpec
+    :var commands: mapping of builder name to its row of the protocol
+    :vartype commands: mapping: dict(str, CommandSpec)
+    :var options: rows of the protocol having a command line option
+    :vartype options: list of CommandSpec
+    :var rows: mapping of opcode to its rows of the protocol, the most specific first
+    :vartype rows: mapping: dict(int, list of CommandSpec)
     :var socket: bluetooth socket used to communicate with the device
     :vartype socket: socket
+    :var decoder: decoder splitting the bytes received on the socket into commands
+    :vartype decoder: FrameDecoder
+    :var encoder: encoder building the commands sent on the socket
+    :vartype encoder: FrameEncoder
+    :var responses: decoder turning the commands received into records
+    :vartype responses: ResponseDecoder
+    :var reader: background reader of the socket, None when the requests read it themselves
+    :vartype reader: SessionReader
+    :var state: cache of the last records received from the device
+    :vartype state: DeviceState
+    :var metrics: link statistics recorded, None when disabled
+    :vartype metrics: Metrics
+    :var trace: recorder of the frames sent and received, None when disabled
+    :vartype trace: TraceRecorder
+    :var link_error: error which broke the link while reading, None while the link is up
+    :vartype link_error: Exception
     :var protocol_version: protocol'version returned by the device
     :vartype protocol_version: int
     :var model_info: model returned by the device
@@ -35,18 +83,128 @@ class SamsungMXT40:
     :vartype group_mode: int
     :var source_label: Source Label returned by the device
     :vartype source_label: str
+    :var request_timeout: seconds a request waits for the device to answer
+    :vartype request_timeout: float
+    :var last_request_wait: seconds the last request actually waited for its answer
+    :vartype last_request_wait: float
+    :var pipeline_window: number of commands a pipeline keeps in flight, at most 255
+    :vartype pipeline_window: int
+    :var mode: protocol mode the link is in, EFFECT_FRAGMENT_MODE, REMOTE_CONTROL_MODE or None if unknown
+    :vartype mode: str
+    :var CHANNELS: RFCOMM channels tried in order to reach an unknown device
+    :vartype CHANNELS: list of int
+    :var connect_timeout: seconds to wait for a RFCOMM connection
+    :vartype connect_timeout: float
+    :var max_frame_rate: maximum number of commands written per second, unlimited if None
+    :vartype max_frame_rate: float
+    :var VOLUME_SETTING: sound setting number holding the volume
+    :vartype VOLUME_SETTING: int
+    :var MAX_VOLUME: highest volume of the device
+    :vartype MAX_VOLUME: int
+    :var volume_delta: volume steps requested and not sent yet
+    :vartype volume_delta: int
     """
 
     SEQUENCE_NUMBER = 0
     TYPE_DATA = 1
 
+    EFFECT_FRAGMENT_MODE = "EFFECT_FRAGMENT"
+    REMOTE_CONTROL_MODE = "REMOTE_CONTROL"
+
+    VOLUME_SETTING = 1
+    MAX_VOLUME = 50
+
+    CHANNELS = [1, 2]
+
     source_map = {1: "BT", 2: "USB1", 3: "USB2", 4: "AUX1", 5: "AUX2", 6: "OFF"}
     source_switch_rev_map = {"BT": 1, "USB1": 2, "AUX1": 4, "AUX2": 5}
     status_map = {"OFF": 0, "AMBIENT": 1, "PARTY": 2, "DANCE": 3, "THUNDER": 4, "STAR": 5, "LOVER": 6, "SOLID": 7}
     effect_map = {"OFF": 1, "DELAY": 2, "FILTER": 3, "FLANGER": 4, "CHORUS": 5, "WAHWAH": 6}
+    bass_booster_map = {"ON": 0, "OFF": 1}
+    sound_map = {"MORE": 15, "LESS": 16}
+
+    protocol = [
+        CommandSpec("connect_req", [1], reply=ConnectInfo, constant=True,
+                    query=True, doc="Generate bytes to do a connection request"),
+        CommandSpec("connect_restart_req", [3], constant=True, hook="modeLeft",
+                    doc="Generate bytes to do a connection restart request, the device leaves the mode it was in"),
+        CommandSpec("connect_link_complete", [4], constant=True,
+                    doc="Generate bytes to do a connection link complete request"),
+        CommandSpec("source_info_req", [50], reply=SourceInfo, constant=True,
+                    idempotent=True, query=True, doc="Generate bytes to do a source info request"),
+        CommandSpec("source_switch", [48, "source"], [CommandSpec.Arg("source", "source name", choices=source_switch_rev_map)],
+                    reply=SourceInfo, hook="sourceSwitched", option="-so", action="source",
+                    idempotent=True, changes=[UsbStatus, AuxState], doc="Generate bytes to change the source"),
+        CommandSpec("usb_control_event", [33, "b"], [CommandSpec.Arg("b", "byte to select the event")],
+                    changes=[UsbStatus], doc="Generate bytes to do a usb control event"),
+        CommandSpec("usb_playtime_enable", [43, "n"], [CommandSpec.Arg("n", "1 to enable the playtime", high=1)],
+                    idempotent=True, changes=[UsbStatus], doc="Generate bytes to enable usb playtime"),
+        CommandSpec("usb_repeat_mode_setting", [45, 1, "b"], [CommandSpec.Arg("b", "byte to select the mode")],
+                    idempotent=True, changes=[UsbStatus], doc="Generate bytes to enable usb repeat mode"),
+        CommandSpec("usb_status_info_req", [36], reply=UsbStatus, constant=True,
+                    idempotent=True, query=True, doc="Generate bytes to do a usb status info req"),
+        CommandSpec("aux_state_req", [52], reply=AuxState, constant=True,
+                    idempotent=True, query=True, doc="Generate bytes to do a aux status info req"),
+        CommandSpec("sound_setting", [64, "b", "b2", "b3", "n"],
+                    [CommandSpec.Arg("b", "sound setting number"), CommandSpec.Arg("b2", "first value"),
+                     CommandSpec.Arg("b3", "second value"), CommandSpec.Arg("n", "third value, 0 for setting 5")],
+                    reply=SoundSetting, fix=lambda payload: payload[:4] + [0] if payload[1] == 5 else payload,
+                    idempotent=True, doc="Generate bytes to do a sound setting"),
+        CommandSpec("sound_setting_info_req", [66, "b"], [CommandSpec.Arg("b", "sound setting number")],
+                    reply=SoundSetting, constant=True,
+                    idempotent=True, query=True, doc="Generate bytes to do a sound setting info req"),
+        CommandSpec("bass_booster", [64, 4, 0, "state", 0], [CommandSpec.Arg("state", "bass booster state", choices=bass_booster_map)],
+                    reply=SoundSetting, constant=True, option="-b", action="bass_booster",
+                    idempotent=True, doc="Generate bytes to turn the bass booster on or off"),
+        CommandSpec("bass_booster_on", [64, 4, 0, 0, 0], reply=SoundSetting, constant=True,
+                    idempotent=True, doc="Generate bytes to turn on the bass booster"),
+        CommandSpec("bass_booster_off", [64, 4, 0, 1, 0], reply=SoundSetting, constant=True,
+                    idempotent=True, doc="Generate bytes to turn off the bass booster"),
+        CommandSpec("tempo", [64, 6, 0, "b", 0], [CommandSpec.Arg("b", "tempo value", high=15)],
+                    reply=SoundSetting, option="-t", action="tempo",
+                    idempotent=True, doc="Generate bytes to change the tempo"),
+        CommandSpec("change_dj_effect", [64, 5, 1, "effect", "value"],
+                    [CommandSpec.Arg("effect", "effect name", choices=effect_map), CommandSpec.Arg("value", "value of the effect, min/med/max is 1/15/30", low=1, high=30)],
+                    reply=SoundSetting, fix=lambda payload: payload[:4] + [0] if payload[3] == 1 else payload, option="-dj", action="dj_effect",
+                    idempotent=True, doc="Generate bytes to change the dj effect"),
+        CommandSpec("system_setting_info_req", [82, "b"], [CommandSpec.Arg("b", "system setting number")],
+                    reply=SystemSetting, constant=True,
+                    idempotent=True, query=True, doc="Generate bytes to do a system setting info req"),
+        CommandSpec("status_setting", [80, 3, "status"], [CommandSpec.Arg("status", "light status name", choices=status_map)],
+                    reply=SystemSetting, constant=True, option="-ls", action="lighting_status",
+                    idempotent=True, doc="Generate bytes to change the light status"),
+        CommandSpec("illumination_setting", [96, 2, "r", "g", "b"],
+                    [CommandSpec.Arg("r", "red color"), CommandSpec.Arg("g", "green color"), CommandSpec.Arg("b", "blue color")],
+                    reply=IlluminationSetting, option="-c", action="color",
+                    idempotent=True, doc="Generate bytes to change the color"),
+        CommandSpec("remote_control", [112, "command"], [CommandSpec.Arg("command", "remote control command")], constant=True,
+                    doc="Generate bytes to remote control"),
+        CommandSpec("toggle_on_off", [112, 1], constant=True,
+                    changes=[SourceInfo, SoundSetting, SystemSetting, IlluminationSetting, UsbStatus, AuxState],
+                    setting=CommandSpec.EVERY, doc="Generate bytes to toggle on or off the device"),
+        CommandSpec("sound", [112, "direction"], [CommandSpec.Arg("direction", "sound step direction", choices=sound_map)],
+                    reply=SoundSetting, constant=True, option="-sd", action="sound",
+                    setting=VOLUME_SETTING, doc="Generate bytes to turn the sound of the device up or down one step"),
+        CommandSpec("sound_more", [112, 15], reply=SoundSetting, constant=True,
+                    setting=VOLUME_SETTING, doc="Generate bytes to turn up the sound of the device"),
+        CommandSpec("sound_less", [112, 16], reply=SoundSetting, constant=True,
+                    setting=VOLUME_SETTING, doc="Generate bytes to turn low the sound of the device"),
+        CommandSpec("toggle_mute", [112, 20], constant=True,
+                    changes=[SoundSetting], setting=VOLUME_SETTING, doc="Generate bytes to toggle mute on the device"),
+    ]
 
     device = None
+    transport = None
+    profiles = None
     socket = None
+    decoder = None
+    encoder = None
+    responses = None
+    reader = None
+    state = None
+    metrics = None
+    trace = None
+    link_error = None
 
     protocol_version = -1
     model_info = -1
@@ -57,42 +215,252 @@ class SamsungMXT40:
     source_info = []
     source_label = None
     source_updated_at = None
+    last_activity = None
+
+    request_timeout = 1.0
+    last_request_wait = None
+    pipeline_window = 4
+    mode = None
+    volume_delta = 0
+    volume_busy = False
+    max_frame_rate = None
+    last_write = 0.0
+    connect_timeout = 5.0
 
-    def __init__(self, device):
+    def __init__(self, device, connect=True, transport=None, profiles=None, metrics=None, trace=None):
         """
         Init bluetooth connection
 
         :param device: The device MAC Address.
         :type device: str
+        :param connect: open the connection right away
+        :type connect: bool
+        :param transport: callable opening the socket to the device for a MAC Address and a RFCOMM channel, RFCOMM by default
+        :type transport: callable
+        :param profiles: store of the channel and connect info of the devices already seen, none by default
+        :type profiles: ProfileStore
+        :param metrics: link statistics to record into, none by default
+        :type metrics: Metrics
+        :param trace: recorder of the frames sent and received, none by default
+        :type trace: TraceRecorder
         """
         self.device = device
-        self.connect()
+        self.transport = transport
+        self.profiles = profiles
+        self.trace = trace
+        self.decoder = FrameDecoder()
+        self.encoder = FrameEncoder()
+        self.responses = ResponseDecoder()
+        self.state = DeviceState(protocol=type(self))
+        self.volume_lock = threading.Lock()
+        self.sequence_lock = threading.Lock()
+        if metrics is not None:
+            metrics.attach(self)
+        if connect:
+            self.connect()
 
     def connect(self):
         """
         Open bluetooth connection
+
+        A device known by the profile store is reached on its channel right
+        away, its connect info is applied before the handshake and the
+        handshake is pipelined. The channels are tried in order otherwise,
+        or when the known one fails.
+        """
+        started = time.monotonic()
+        profile = self.profiles.get(self.device) if self.profiles is not None else None
+        channel = self.open_channel(profile)
+        self.decoder.reset()
+        self.mode = None
+        self.link_error = None
+        if self.reader is not None:
+            self.reader.start()
+        if profile is not None and profile["channel"] == channel:
+            self.apply_profile(profile)
+            logging.debug("connect_req, connect_link_complete")
+            responses = self.pipeline([self.connect_req(), self.connect_link_complete()], decoded=True)[0]
+        else:
+            logging.debug("connect_req")
+            responses = self.request(self.connect_req(), decoded=True)
+            logging.debug("connect_link_complete")
+            self.request(self.connect_link_complete())
+        self.save_profile(channel, responses)
+        if self.metrics is not None:
+            self.metrics.connected(self.device, time.monotonic() - started)
+
+    def channelOrder(profile):
+        """
+        RFCOMM channels to try, the known one first
+
+        :param profile: profile of the device, None if unknown
+        :type profile: dict
+        :return: the channels
+        :rtype: list of int
+        """
+        if profile is None:
+            return list(SamsungMXT40.CHANNELS)
+        return [profile["channel"]] + [channel for channel in SamsungMXT40.CHANNELS if channel != profile["channel"]]
+
+    def open_channel(self, profile):
+        """
+        Open the socket on the first channel answering
+
+        :param profile: profile of the device, None if unknown
+        :type profile: dict
+        :return: the channel opened
+        :rtype: int
         """
+        channels = SamsungMXT40.channelOrder(profile)
+        for channel in channels[:-1]:
+            try:
+                self.socket = self.open_socket(channel)
+                return channel
+            except (OSError, bluetooth.btcommon.BluetoothError) as e:
+                logging.info("Channel %d of %s failed: %s", channel, self.device, e)
+        self.socket = self.open_socket(channels[-1])
+        return channels[-1]
+
+    def apply_profile(self, profile):
+        """
+        Use the connect info of a profile until the device sends its own
+
+        :param profile: profile of the device
+        :type profile: dict
+        """
+        self.handle_response(ConnectInfo(tuple(profile["protocol_version"]), profile["model_info"], profile["country_info"], tuple(profile["sources"]), profile["group_mode"]))
+
+    def save_profile(self, channel, responses):
+        """
+        Store the channel and the connect info received, forget the profile if the handshake failed
+
+        :param channel: channel the socket is opened on
+        :type channel: int
+        :param responses: records received in answer to connect_req
+        :type responses: list of Response
+        """
+        if self.profiles is None:
+            return
+        connect_info = next((response for response in responses if isinstance(response, ConnectInfo)), None)
+        if connect_info is None:
+            logging.info("No connect info from %s, forgetting its profile", self.device)
+            self.profiles.forget(self.device)
+            return
+        self.profiles.put(self.device, {
+            "channel": channel,
+            "protocol_version": list(connect_info.protocol_version),
+            "model_info": connect_info.model_info,
+            "country_info": connect_info.country_info,
+            "sources": list(connect_info.sources),
+            "group_mode": connect_info.group_mode,
+        })
+
+    def open_socket(self, channel):
+        """
+        Open the socket to the device on a RFCOMM channel
+
+        :param channel: RFCOMM channel
+        :type channel: int
+        :return: the connected socket
+        :rtype: socket
+        """
+        if self.transport is not None:
+            return self.transport(self.device, channel)
+        sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
         try:
-            self.socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            self.socket.connect((self.device, 1))
-        except bluetooth.btcommon.BluetoothError:
-            self.socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            self.socket.connect((self.device, 2))
-        logging.debug("connect_req")
-        for command in self.request(self.connect_req()):
-            payload = SamsungMXT40.getPayloadData(command)
-            self.parse_connect_info(payload)
-        logging.debug("connect_link_complete")
-        for command in self.request(self.connect_link_complete()):
-            payload = SamsungMXT40.getPayloadData(command)
+            sock.settimeout(self.connect_timeout)
+            sock.connect((self.device, channel))
+            sock.settimeout(None)
+        except (OSError, bluetooth.btcommon.BluetoothError):
+            sock.close()
+            raise
+        return sock
 
     def close(self):
         """
         Close bluetooth connection
         """
+        if self.reader is not None:
+            self.reader.stop()
         self.socket.close()
         self.socket = None
         self.SEQUENCE_NUMBER = 0
+        self.mode = None
+
+    def is_connected(self):
+        """
+        Tell if the bluetooth connection is open
+
+        :return: True if the socket is open
+        :rtype: bool
+        """
+        return self.socket is not None
+
+    def ping(self):
+        """
+        Check the link is still answering by doing a source info request
+
+        :return: True if the device answered
+        :rtype: bool
+        """
+        if not self.is_connected():
+            return False
+        try:
+            return len(self.request(self.source_info_req())) > 0
+        except (OSError, bluetooth.btcommon.BluetoothError):
+            return False
+
+    def start_reader(self, poll_interval=0.1):
+        """
+        Read the socket continuously in a background thread
+
+        The reader keeps the state of the session current with the
+        notifications the device sends on its own and hands the answers to
+        the requests. It survives :meth:`close` and restarts on :meth:`connect`.
+
+        :param poll_interval: seconds between two checks of the stop request
+        :type poll_interval: float
+        :return: the reader
+        :rtype: SessionReader
+        """
+        if self.reader is None:
+            self.reader = SessionReader(self, poll_interval)
+        if self.is_connected():
+            self.reader.start()
+        return self.reader
+
+    def stop_reader(self):
+        """
+        Stop the background reader, the requests read the socket again
+        """
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+
+    def subscribe(self, callback, record=None):
+        """
+        Call a function for each notification the device sends on its own
+
+        The background reader is started if needed.
+
+        :param callback: function called in the reader thread with the record of the notification
+        :type callback: callable
+        :param record: record class the callback is interested in, every record if None
+        :type record: class
+        """
+        if self.reader is None:
+            self.start_reader()
+        self.reader.subscribe(callback, record)
+
+    def unsubscribe(self, callback):
+        """
+        Stop calling a function subscribed
+
+        :param callback: function subscribed
+        :type callback: callable
+        """
+        if self.reader is not None:
+            self.reader.unsubscribe(callback)
 
     def rshift(val, n):
         """
@@ -160,10 +528,9 @@ class SamsungMXT40:
         :return: checksum of the array
         :rtype: int
         """
-        printHexStr = SamsungMXT40.printHexString(array)
         n5 = 0
-        for s in printHexStr:
-            n5 += int(s, 16)
+        for a in array:
+            n5 += a & 255
         res = (n + n2 + n3 + n4 + n5)
         if res > 128:
             return res-256
@@ -183,43 +550,35 @@ class SamsungMXT40:
         """
         return (SamsungMXT40.rshift(((b & 255) << 24), 16) | (b2 & 255))
 
-    def getDataCommand(self, array):
+    def getDataCommand(self, array, constant=False):
         """
         Transform an array of bytes in bytes ready to be send to the device
 
         :param array: array of data to send to the device
         :type array: array of bytes
+        :param constant: the array never changes, encode it from a cached template
+        :type constant: bool
         :return: bytes to send to the device
         :rtype: bytes
         """
-        self.SEQUENCE_NUMBER += 1
-        length = len(array)
-        n = length + 7
-        n2 = SamsungMXT40.rshift((length << 16), 24)
-        n3 = SamsungMXT40.rshift((length << 24), 24)
-        array2 = []
-        array2.append(0)
-        array2.append(-69)
-        array2.append(self.TYPE_DATA)
-        array2.append(self.SEQUENCE_NUMBER)
-        array2.append(n2)
-        array2.append(n3)
-        for b in array:
-            if b > 128:
-                array2.append(b-256)
-            else:
-                array2.append(b)
-        array2.append(SamsungMXT40.getCheckSum(self.TYPE_DATA, self.SEQUENCE_NUMBER, n2, n3, array))
-        logging.debug("DataCommand %s", array2)
-        array3 = []
-        for c in array2:
-            if c > 128:
-                array3.append(c-256)
-            elif c < 0:
-                array3.append(c+256)
-            else:
-                array3.append(c)
-        return bytes(array3)
+        sequence = self.nextSequence()
+        if constant:
+            command = self.encoder.encode_constant(self.TYPE_DATA, sequence, array)
+        else:
+            command = self.encoder.encode(self.TYPE_DATA, sequence, array)
+        logging.debug("DataCommand %s", command)
+        return command
+
+    def nextSequence(self):
+        """
+        Take the sequence number of the next command
+
+        :return: the sequence number
+        :rtype: int
+        """
+        with self.sequence_lock:
+            self.SEQUENCE_NUMBER = (self.SEQUENCE_NUMBER + 1) & 255
+            return self.SEQUENCE_NUMBER
 
     def getPayloadData(array):
         """
@@ -237,7 +596,7 @@ class SamsungMXT40:
         b = SamsungMXT40.byteToInt(array[4], array[5])
         if b < 1:
             return None
-        payload = array[6:].copy()
+        payload = array[6:]
         logging.debug("PayloadData %s", payload)
         return payload
 
@@ -266,19 +625,252 @@ class SamsungMXT40:
             start += cmd_len
         return commands
 
-    def request(self, array):
+    def request(self, array, expected=1, timeout=None, decoded=False):
         """
         Send a command to the device and return all the responses separated
 
+        The answer is read as soon as it arrives, until the expected number of
+        complete commands has been received or the timeout expires. Commands
+        already queued behind the expected ones are read too, a truncated
+        command stays in the decoder until the rest of it arrives. Every
+        command received goes through :meth:`receive`.
+
+        A command carrying the sequence number of the request is an answer,
+        and so is any other command while answers are still expected, as
+        :meth:`pipeline` gives it to the oldest command waiting. The rule is
+        the same with or without a reader, the commands left over are
+        notifications.
+
         :param array: bytes to send to the device
         :type array: array of bytes
-        :return: array of data corresponding to one command
-        :rtype: array of bytes
+        :param expected: number of commands the device answers
+        :type expected: int
+        :param timeout: seconds to wait for the answer, request_timeout by default
+        :type timeout: float
+        :param decoded: return the records decoded instead of the commands
+        :type decoded: bool
+        :return: the commands received, checksum verified, or their records
+        :rtype: list of bytes or list of Response
+        """
+        if timeout is None:
+            timeout = self.request_timeout
+        if self.reader is not None:
+            self.reader.begin((array[3],), fallback=True)
+        try:
+            self.writeBluetooth(array)
+            start = time.monotonic()
+            deadline = start + timeout
+            commands = []
+            responses = []
+            while True:
+                if len(commands) >= expected:
+                    received = self.readCommands(0)
+                else:
+                    received = self.readCommands(deadline - time.monotonic())
+                if not received:
+                    break
+                for command, response in received:
+                    if command[3] == array[3] or len(commands) < expected:
+                        commands.append(command)
+                        responses.append(response)
+                    else:
+                        self.unexpected(command, response)
+        finally:
+            if self.reader is not None:
+                self.reader.end()
+        self.last_activity = time.monotonic()
+        self.last_request_wait = self.last_activity - start
+        if len(commands) < expected:
+            logging.warning("Request timed out after %.3fs with %d/%d commands", self.last_request_wait, len(commands), expected)
+            if self.metrics is not None:
+                self.metrics.timeout(self.device)
+        else:
+            logging.debug("Request answered in %.3fs", self.last_request_wait)
+        if decoded:
+            return [response for response in responses if response is not None]
+        return commands
+
+    def readCommands(self, timeout):
+        """
+        Wait for the next commands received, from the background reader if it runs
+
+        :param timeout: seconds to wait, return right away if 0 or less
+        :type timeout: float
+        :return: the commands received and their records, empty if nothing arrived in time
+        :rtype: list of tuple(bytes, Response)
+        """
+        if self.reader is not None:
+            return self.reader.get(timeout)
+        deadline = time.monotonic() + timeout
+        received = []
+        while not received:
+            chunk = self.readBluetooth(deadline - time.monotonic())
+            if not chunk:
+                break
+            for command in self.decoder.decode(chunk):
+                command = bytes(command)
+                received.append((command, self.receive(command)))
+        return received
+
+    def receive(self, command):
+        """
+        Decode a command received and update the session with it
+
+        :param command: complete command received from the device
+        :type command: bytes
+        :return: the record decoded, None if the payload is empty or unknown
+        :rtype: Response
+        """
+        if self.metrics is not None:
+            self.metrics.received(self.device, command)
+        if self.trace is not None:
+            self.trace.record(TraceRecorder.IN, command)
+        response = self.responses.decode(command)
+        if response is not None:
+            self.handle_response(response)
+        return response
+
+    def handle_response(self, response):
+        """
+        Update the session with a record received from the device
+
+        :param response: the record
+        :type response: Response
+        """
+        self.state.update(response)
+        if isinstance(response, ConnectInfo):
+            self.protocol_version = SamsungMXT40.print2HexString(*response.protocol_version)
+            self.model_info = response.model_info
+            self.country_info = response.country_info
+            self.num_of_source = len(response.sources)
+            self.group_mode = response.group_mode
+            self.source_info = ["OFF"] + [self.source_map[source] for source in response.sources]
+        elif isinstance(response, SourceInfo):
+            self.source_label = self.source_map[response.source]
+            self.source_updated_at = datetime.now()
+            logging.info("Source %s", self.source_label)
+
+    def unexpected(self, command, response):
+        """
+        Handle a command received which answers none of the commands sent
+
+        :param command: command received from the device
+        :type command: bytes
+        :param response: its record, None if the payload is empty or unknown
+        :type response: Response
+        """
+        if self.reader is not None and response is not None:
+            self.reader.publish(response)
+        else:
+            logging.debug("Unexpected command %s", command)
+
+    def matchCommand(command, sequences, in_flight):
         """
-        self.writeBluetooth(array)
-        time.sleep(0.1)
-        response = self.readBluetooth()
-        return SamsungMXT40.splitCommand(response)
+        Find the command sent that a command received answers
+
+        :param command: command received from the device
+        :type command: bytes
+        :param sequences: mapping of the sequence numbers sent to their index
+        :type sequences: mapping: dict(int, int)
+        :param in_flight: mapping of the sequence numbers still waiting for a response to their index, the answered one gets removed
+        :type in_flight: mapping: dict(int, int)
+        :return: the index of the command answered, None if no command is waiting
+        :rtype: int
+        """
+        sequence = command[3]
+        if sequence in in_flight:
+            return in_flight.pop(sequence)
+        if sequence in sequences:
+            return sequences[sequence]
+        if in_flight:
+            return in_flight.pop(next(iter(in_flight)))
+        return None
+
+    def pipeline(self, commands, window=None, timeout=None, decoded=False):
+        """
+        Send several commands back to back and return the responses of each
+
+        Up to window commands are written without waiting for the device,
+        the commands written together go in one send unless max_frame_rate
+        spaces them. The responses are matched to the commands by their sequence number,
+        a response carrying an unknown sequence number is given to the
+        oldest command still waiting. The timeout restarts each time the
+        device answers.
+
+        The commands are told apart by their sequence byte, so the window is
+        capped at 255 and a command whose sequence number is still waiting,
+        after the numbers wrapped, is held back until it is answered.
+
+        :param commands: bytes of each command to send to the device
+        :type commands: list of bytes
+        :param window: maximum number of commands waiting for a response, pipeline_window by default, at most 255
+        :type window: int
+        :param timeout: seconds to wait for the next response, request_timeout by default
+        :type timeout: float
+        :param decoded: return the records decoded instead of the commands
+        :type decoded: bool
+        :return: the commands received for each command sent, or their records
+        :rtype: list of list of bytes or list of list of Response
+        """
+        if window is None:
+            window = self.pipeline_window
+        if timeout is None:
+            timeout = self.request_timeout
+        window = max(1, min(window, 255))
+        replies = [[] for command in commands]
+        responses = [[] for command in commands]
+        sequences = {}
+        in_flight = {}
+        sent = 0
+        if self.reader is not None:
+            self.reader.begin(sequences, fallback=True)
+        try:
+            start = time.monotonic()
+            deadline = start + timeout
+            while in_flight or sent < len(commands):
+                burst = []
+                while sent < len(commands) and len(in_flight) < window and commands[sent][3] not in in_flight:
+                    command = commands[sent]
+                    sequences[command[3]] = sent
+                    in_flight[command[3]] = sent
+                    burst.append(command)
+                    sent += 1
+                if len(burst) > 1 and not self.max_frame_rate:
+                    self.writeFrames(burst)
+                else:
+                    for command in burst:
+                        self.writeBluetooth(command)
+                received = self.readCommands(deadline - time.monotonic())
+                if not received:
+                    logging.warning("Pipeline timed out with %d commands unanswered", len(in_flight) + len(commands) - sent)
+                    if self.metrics is not None:
+                        self.metrics.timeout(self.device)
+                    break
+                for command, response in received:
+                    index = SamsungMXT40.matchCommand(command, sequences, in_flight)
+                    if index is None:
+                        self.unexpected(command, response)
+                        continue
+                    replies[index].append(command)
+                    responses[index].append(response)
+                deadline = time.monotonic() + timeout
+            received = self.readCommands(0)
+            while received:
+                for command, response in received:
+                    if command[3] in sequences:
+                        replies[sequences[command[3]]].append(command)
+                        responses[sequences[command[3]]].append(response)
+                    else:
+                        self.unexpected(command, response)
+                received = self.readCommands(0)
+        finally:
+            if self.reader is not None:
+                self.reader.end()
+        self.last_activity = time.monotonic()
+        self.last_request_wait = self.last_activity - start
+        if decoded:
+            return [[response for response in answer if response is not None] for answer in responses]
+        return replies
 
     def parse_connect_info(self, array):
         """
@@ -311,330 +903,333 @@ class SamsungMXT40:
         self.source_updated_at = datetime.now()
         logging.info("Source %s", self.source_label)
 
-    def connect_req(self):
+    def modeLeft(self):
         """
-        Generate bytes to do a connection request
-
-        :return: bytes to send to the device
-        :rtype: bytes
+        Note that the device leaves the mode it was in
         """
-        return self.getDataCommand([1])
+        self.mode = None
 
-    def connect_restart_req(self):
+    def sourceSwitched(self, source):
         """
-        Generate bytes to do a connection restart request
+        Note a source switch sent, the device leaves the mode it was in
 
-        :return: bytes to send to the device
-        :rtype: bytes
-        """
-        return self.getDataCommand([3])
-
-    def connect_link_complete(self):
+        :param source: source name
+        :type source: str
         """
-        Generate bytes to do a connection link complete request
-
-        :return: bytes to send to the device
-        :rtype: bytes
-        """
-        return self.getDataCommand([4])
-
-    def source_info_req(self):
-        """
-        Generate bytes to do a source info request
-
-        :return: bytes to send to the device
-        :rtype: bytes
-        """
-        return self.getDataCommand([50])
-
-    def usb_control_event(self, b):
-        """
-        Generate bytes to do a usb control event
-
-        :param b: byte to select the event
-        :type b: byte
-        :return: bytes to send to the device
-        :rtype: bytes
-        """
-        return self.getDataCommand([33, b])
+        self.source_label = source
+        self.source_updated_at = datetime.now()
+        self.mode = None
 
-    def usb_playtime_enable(self, n):
+    def sourceSwitchCommands(self, source):
         """
-        Generate bytes to enable usb playtime
+        Build a source switch and the requests following it
 
-        :param n: byte to select the timeframe
-        :type n: byte
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param source: source name
+        :type source: str
+        :return: the commands to send
+        :rtype: list of bytes
         """
-        return self.getDataCommand([43, n])
+        commands = [self.source_switch(source)]
+        if (source.startswith("AUX")):
+            commands += [self.sound_setting_info_req(7), self.sound_setting_info_req(1), self.aux_state_req()]
+        if (source.startswith("USB")):
+            commands += [self.usb_playtime_enable(1), self.usb_status_info_req()]
+        else:
+            commands.append(self.usb_playtime_enable(0))
+        return commands
 
-    def usb_repeat_mode_setting(self, b):
+    def effectFragmentCommands(self):
         """
-        Generate bytes to enable usb repeat mode
+        Build the requests switching to effect fragment mode
 
-        :param b: byte to select the mode
-        :type b: byte
-        :return: bytes to send to the device
-        :rtype: bytes
+        :return: the commands to send
+        :rtype: list of bytes
         """
-        return self.getDataCommand([45, 1, b])
+        return [self.sound_setting_info_req(6), self.system_setting_info_req(3), self.sound_setting_info_req(5)]
 
-    def usb_status_info_req(self):
+    def remoteControlCommands(self):
         """
-        Generate bytes to do a usb status info req
+        Build the requests switching to remote control mode
 
-        :return: bytes to send to the device
-        :rtype: bytes
+        :return: the commands to send
+        :rtype: list of bytes
         """
-        return self.getDataCommand([36])
+        return [self.sound_setting_info_req(7), self.usb_status_info_req()]
 
-    def aux_state_req(self):
+    def readBluetooth(self, timeout=None):
         """
-        Generate bytes to do a aux status info req
+        Read socket bluetooth and send it back
 
-        :return: bytes to send to the device
+        :param timeout: seconds to wait for data, wait forever if None
+        :type timeout: float
+        :return: bytes to receive from the device, None if nothing arrived in time
         :rtype: bytes
         """
-        return self.getDataCommand([52])
+        try:
+            if timeout is not None:
+                readable, _, _ = select.select([self.socket], [], [], max(timeout, 0))
+                if not readable:
+                    return None
+            response = self.socket.recv(1024)
+        except bluetooth.btcommon.BluetoothError as e:
+            self.link_error = e
+            return None
+        if not response:
+            if response is not None:
+                self.link_error = ConnectionResetError("Connection closed by %s" % self.device)
+            return None
+        if self.metrics is not None:
+            self.metrics.read(self.device, len(response))
+        logging.debug("Read %s", response)
+        return response
 
-    def sound_setting(self, b, b2, b3, n):
+    def writeBluetooth(self, request):
         """
-        Generate bytes to do a sound setting
+        Write request on the socket bluetooth
 
-        :param b: first byte
-        :type b: int
-        :param b2: second byte
-        :type b2: int
-        :param b3: third byte
-        :type b3: int
-        :param n: n byte
-        :type n: int
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param request: bytes to send to the device
+        :type request: array of bytes
         """
-        if (b == 5):
-            n = 0
-        return self.getDataCommand([64, b, b2, b3, n])
+        if self.max_frame_rate:
+            wait = self.last_write + 1.0 / self.max_frame_rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.state.sent(request)
+        if self.trace is not None:
+            self.trace.record(TraceRecorder.OUT, request)
+        self.socket.send(request)
+        self.last_write = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.sent(self.device, request)
 
-    def sound_setting_info_req(self, b):
+    def writeFrames(self, requests):
         """
-        Generate bytes to do a sound setting info req
+        Write several requests on the socket bluetooth in one send
 
-        :param b: first byte
-        :type b: int
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param requests: bytes of each command to send to the device
+        :type requests: list of bytes
         """
-        return self.getDataCommand([66, b])
+        for request in requests:
+            self.state.sent(request)
+            if self.trace is not None:
+                self.trace.record(TraceRecorder.OUT, request)
+        self.socket.sendall(b"".join(requests))
+        self.last_write = time.monotonic()
+        if self.metrics is not None:
+            for request in requests:
+                self.metrics.sent(self.device, request)
 
-    def system_setting_info_req(self, b):
+    def fetch(self, record, setting, builder, max_age=None):
         """
-        Generate bytes to do a system setting info req
+        Return a record from the state cache, requesting it from the device if it is not fresh
 
-        :param b: first byte
-        :type b: int
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param record: record class
+        :type record: class
+        :param setting: setting number of the sound and system settings
+        :type setting: int
+        :param builder: command builder asking the device for the record, called with the setting number if any
+        :type builder: callable
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the record, None if the device did not send it
+        :rtype: Response
         """
-        return self.getDataCommand([82, b])
+        response = self.state.get(record, setting, max_age)
+        if response is not None:
+            return response
+        command = builder() if setting is None else builder(setting)
+        for response in self.request(command, decoded=True):
+            if isinstance(response, record) and getattr(response, "setting", None) == setting:
+                return response
+        return None
 
-    def illumination_setting(self, r, g, b):
+    def get_source(self, max_age=None):
         """
-        Generate bytes to change the color
+        Current source, from the cache when fresh
 
-        :param r: red color
-        :type r: int
-        :param g: green color
-        :type g: int
-        :param b: blue color
-        :type b: int
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the source info, None if the device did not answer
+        :rtype: SourceInfo
         """
-        return self.getDataCommand([96, 2, r, g, b])
+        return self.fetch(SourceInfo, None, self.source_info_req, max_age)
 
-    def status_setting(self, status):
+    def get_sound_setting(self, setting, max_age=None):
         """
-        Generate bytes to change the light status
+        Values of a sound setting, from the cache when fresh
 
-        :param status: light status name
-        :type status: str
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param setting: sound setting number, 4 bass booster, 5 dj effect, 6 tempo...
+        :type setting: int
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the sound setting, None if the device did not answer
+        :rtype: SoundSetting
         """
-        return self.getDataCommand([80, 3, self.status_map[status]])
+        return self.fetch(SoundSetting, setting, self.sound_setting_info_req, max_age)
 
-    def bass_booster_on(self):
+    def get_system_setting(self, setting, max_age=None):
         """
-        Generate bytes to turn on the bass booster
+        Values of a system setting, from the cache when fresh
 
-        :param status: light status name
-        :type status: str
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param setting: system setting number, 3 light status
+        :type setting: int
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the system setting, None if the device did not answer
+        :rtype: SystemSetting
         """
-        return self.sound_setting(4, 0, 0, 0)
+        return self.fetch(SystemSetting, setting, self.system_setting_info_req, max_age)
 
-    def bass_booster_off(self):
+    def get_usb_status(self, max_age=None):
         """
-        Generate bytes to turn off the bass booster
+        USB player status, from the cache when fresh
 
-        :param status: light status name
-        :type status: str
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the usb status, None if the device did not answer
+        :rtype: UsbStatus
         """
-        return self.sound_setting(4, 0, 1, 0)
+        return self.fetch(UsbStatus, None, self.usb_status_info_req, max_age)
 
-    def tempo(self, b):
+    def get_aux_state(self, max_age=None):
         """
-        Generate bytes to change the tempo
+        AUX input state, from the cache when fresh
 
-        :param b: tempo value
-        :type b: int
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the aux state, None if the device did not answer
+        :rtype: AuxState
         """
-        return self.sound_setting(6, 0, b, 0)
+        return self.fetch(AuxState, None, self.aux_state_req, max_age)
 
-    def change_dj_effect(self, effect, value):
+    def get_volume(self, max_age=None):
         """
-        Generate bytes to change the dj effect
+        Current volume, from the cache when fresh
 
-        :param status: effect name
-        :type status: str
-        :param value: value of the effect to apply
-        :type value: int
-        :return: bytes to send to the device
-        :rtype: bytes
-        """
-        effect_type = self.effect_map[effect]
-        if effect_type == 1:
-            value = 0
-        logging.debug("change_dj_effect %s %s", effect_type, value)
-        return self.getDataCommand([64, 5, 1, effect_type, value])
-
-    def remote_control(self, command):
+        :param max_age: seconds overriding the TTL of the record class
+        :type max_age: float
+        :return: the volume, None if the device did not answer
+        :rtype: int
         """
-        Generate bytes to remote control
+        response = self.get_sound_setting(SamsungMXT40.VOLUME_SETTING, max_age)
+        return SamsungMXT40.volumeOf(response)
 
-        :param command: command to send
-        :type command: int
-        :return: bytes to send to the device
-        :rtype: bytes
+    def volumeOf(response):
         """
-        return self.getDataCommand([112, command])
+        Volume carried by a volume sound setting
 
-    def toggle_on_off(self):
+        :param response: the sound setting record, can be None
+        :type response: SoundSetting
+        :return: the volume, None if unknown
+        :rtype: int
         """
-        Generate bytes to toggle on or off the device
+        if response is None or len(response.values) < 2:
+            return None
+        return response.values[1]
 
-        :return: bytes to send to the device
-        :rtype: bytes
+    def volumeCommands(self, current, target):
         """
-        return self.remote_control(1)
+        Build the remote control steps moving the volume from current to target
 
-    def sound_more(self):
+        :param current: current volume
+        :type current: int
+        :param target: volume wanted, clamped to 0..MAX_VOLUME
+        :type target: int
+        :return: the commands to send
+        :rtype: list of bytes
         """
-        Generate bytes to turn up the sound of the device
+        target = max(0, min(target, SamsungMXT40.MAX_VOLUME))
+        if target > current:
+            return [self.sound("MORE") for i in range(target - current)]
+        return [self.sound("LESS") for i in range(current - target)]
 
-        :return: bytes to send to the device
-        :rtype: bytes
+    def set_volume(self, target):
         """
-        return self.remote_control(15)
+        Move the volume to a level in one pipelined burst of steps
 
-    def sound_less(self):
-        """
-        Generate bytes to turn low the sound of the device
+        The current level comes from the state cache, or from a sound
+        setting request on a miss.
 
-        :return: bytes to send to the device
-        :rtype: bytes
+        :param target: volume wanted, clamped to 0..MAX_VOLUME
+        :type target: int
+        :return: the volume reported by the device afterwards, None if unknown
+        :rtype: int
         """
-        return self.remote_control(16)
+        current = self.get_volume()
+        if current is None:
+            logging.warning("Volume unknown, not changing it")
+            return None
+        commands = self.volumeCommands(current, target)
+        if not commands:
+            return current
+        self.pipeline(commands, window=len(commands))
+        return SamsungMXT40.volumeOf(self.state.get(SoundSetting, SamsungMXT40.VOLUME_SETTING, float("inf")))
 
-    def toggle_mute(self):
+    def change_volume(self, delta):
         """
-        Generate bytes to toggle mute on the device
+        Move the volume by a number of steps in one pipelined burst
 
-        :return: bytes to send to the device
-        :rtype: bytes
-        """
-        return self.remote_control(20)
+        The deltas requested by other threads while a burst is being sent
+        are merged and sent as one more burst once it is over.
 
-    def source_switch(self, source):
+        :param delta: number of steps, negative to lower the volume
+        :type delta: int
+        :return: the volume reported by the device afterwards, None if unknown or merged into the burst of another thread
+        :rtype: int
         """
-        Generate bytes to change the source
+        with self.volume_lock:
+            self.volume_delta += delta
+            if self.volume_busy:
+                return None
+            self.volume_busy = True
+        volume = None
+        try:
+            while True:
+                with self.volume_lock:
+                    delta = self.volume_delta
+                    self.volume_delta = 0
+                    if delta == 0:
+                        return volume
+                current = self.get_volume()
+                if current is None:
+                    logging.warning("Volume unknown, dropping %d steps", delta)
+                    return None
+                volume = self.set_volume(current + delta)
+        finally:
+            with self.volume_lock:
+                self.volume_busy = False
 
-        :param status: source name
-        :type status: str
-        :return: bytes to send to the device
-        :rtype: bytes
+    def load_source_info(self):
         """
-        self.source_label = source
-        self.source_updated_at = datetime.now()
-        return self.getDataCommand([48, self.source_switch_rev_map[source]])
-
-    def readBluetooth(self):
+        Reload source info
         """
-        Read socket bluetooth and send it back
+        logging.debug("source_info_req, usb_playtime_enable 0")
+        self.pipeline([self.source_info_req(), self.usb_playtime_enable(0)])
 
-        :return: bytes to receive from the device
-        :rtype: bytes
+    def effect_fragment_mode(self, force=False):
         """
-        try:
-            response = self.socket.recv(1024)
-        except bluetooth.btcommon.BluetoothError:
-            return None
-        if response is None:
-            return None
-        array = list(response)
-        logging.debug("Read %s", array)
-        return array
+        Switch to effect fragment mode, unless the link is already in it
 
-    def writeBluetooth(self, request):
+        :param force: send the mode switch even if the link is already in the mode
+        :type force: bool
         """
-        Write request on the socket bluetooth
+        if self.mode == SamsungMXT40.EFFECT_FRAGMENT_MODE and not force:
+            return
+        logging.info("sound_setting_info, system_setting_info, sound_setting_info")
+        replies = self.pipeline(self.effectFragmentCommands())
+        self.mode = SamsungMXT40.EFFECT_FRAGMENT_MODE if all(replies) else None
 
-        :param request: bytes to send to the device
-        :type request: array of bytes
+    def remote_control_mode(self, force=False):
         """
-        self.socket.send(request)
+        Switch to remote control mode, unless the link is already in it
 
-    def load_source_info(self):
-        """
-        Reload source info
+        :param force: send the mode switch even if the link is already in the mode
+        :type force: bool
         """
-        logging.debug("source_info_req")
-        for command in self.request(self.source_info_req()):
-            payload = SamsungMXT40.getPayloadData(command)
-            self.parse_source_info(payload)
-        logging.debug("usb_playtime_enable 0")
-        for commands in self.request(self.usb_playtime_enable(0)):
-            payload = SamsungMXT40.getPayloadData(command)
-
-    def effect_fragment_mode(self):
-        """
-        Switch to effect fragment mode
-        """
-        logging.info("sound_setting_info")
-        for command in self.request(self.sound_setting_info_req(6)):
-            payload = SamsungMXT40.getPayloadData(command)
-        logging.info("system_setting_info")
-        for command in self.request(self.system_setting_info_req(3)):
-            payload = SamsungMXT40.getPayloadData(command)
-        logging.info("sound_setting_info")
-        for command in self.request(self.sound_setting_info_req(5)):
-            payload = SamsungMXT40.getPayloadData(command)
-        
-    def remote_control_mode(self):
-        """
-        Switch to remote control mode
-        """
-        logging.info("sound_setting_info")
-        for command in self.request(self.sound_setting_info_req(7)):
-            payload = SamsungMXT40.getPayloadData(command)
-        logging.info("usb_status_info_req")
-        for command in self.request(self.usb_status_info_req()):
-            payload = SamsungMXT40.getPayloadData(command)
+        if self.mode == SamsungMXT40.REMOTE_CONTROL_MODE and not force:
+            return
+        logging.info("sound_setting_info, usb_status_info_req")
+        replies = self.pipeline(self.remoteControlCommands())
+        self.mode = SamsungMXT40.REMOTE_CONTROL_MODE if all(replies) else None
 
+CommandSpec.install(SamsungMXT40)
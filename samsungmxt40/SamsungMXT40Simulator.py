@@ -0,0 +1,380 @@
+import time
+import random
+import socket
+import logging
+import threading
+
+from samsungmxt40.FrameDecoder import FrameDecoder
+from samsungmxt40.FrameEncoder import FrameEncoder
+
+class SamsungMXT40Simulator:
+    """
+    Fake Samsung MX-T40 Sound Tower answering the protocol over a local socket
+
+    The simulator can be reached through a socketpair, a Unix socket or a
+    TCP loopback socket. Its :meth:`transport` method plugs into the
+    transport parameter of :class:`SamsungMXT40` so a session talks to it
+    instead of a real tower::
+
+        simulator = SamsungMXT40Simulator(latency=0.02, fragment=3)
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=simulator.transport)
+
+    Each response is delayed by latency plus or minus jitter seconds, can be
+    split into chunks of at most fragment bytes and gets one byte flipped
+    with the corruption probability.
+
+    :param latency: seconds before each response
+    :type latency: float
+    :param jitter: maximum seconds randomly added to or removed from latency
+    :type jitter: float
+    :param fragment: maximum size of the chunks a response is sent in, whole responses if None
+    :type fragment: int
+    :param corruption: probability a response gets one byte flipped
+    :type corruption: float
+    :param seed: seed of the random generator, for reproducible runs
+    :type seed: int
+    :var sources: sources the tower reports in its connect info
+    :vartype sources: list of int
+    :var source: current source
+    :vartype source: int
+    :var sound_settings: values of each sound setting
+    :vartype sound_settings: mapping: dict(int, list of int)
+    :var system_settings: values of each system setting
+    :vartype system_settings: mapping: dict(int, list of int)
+    :var color: current illumination color
+    :vartype color: list of int
+    :var received: payloads received, in order
+    :vartype received: list of bytes
+    :var channels: RFCOMM channels the transport accepts
+    :vartype channels: list of int
+    :var attempts: RFCOMM channels the transport was asked for, in order
+    :vartype attempts: list of int
+    :var drops: mapping of an opcode to the number of times the connection is dropped after applying it, before answering
+    :vartype drops: mapping: dict(int, int)
+    """
+
+    PROTOCOL_VERSION = (1, 2)
+    MODEL_INFO = 40
+    COUNTRY_INFO = 1
+    GROUP_MODE = 0
+
+    VOLUME_SETTING = 1
+    MAX_VOLUME = 50
+
+    def __init__(self, latency=0.0, jitter=0.0, fragment=None, corruption=0.0, seed=None):
+        """
+        Init the simulated tower
+
+        :param latency: seconds before each response
+        :type latency: float
+        :param jitter: maximum seconds randomly added to or removed from latency
+        :type jitter: float
+        :param fragment: maximum size of the chunks a response is sent in, whole responses if None
+        :type fragment: int
+        :param corruption: probability a response gets one byte flipped
+        :type corruption: float
+        :param seed: seed of the random generator, for reproducible runs
+        :type seed: int
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.fragment = fragment
+        self.corruption = corruption
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sources = [1, 2, 4, 5]
+        self.source = 1
+        self.sound_settings = {1: [0, 15, 0], 4: [0, 1, 0], 5: [1, 1, 0], 6: [0, 8, 0], 7: [0, 0, 0]}
+        self.system_settings = {3: [1]}
+        self.color = [0, 0, 0]
+        self.usb_status = [0, 0]
+        self.aux_state = 0
+        self.powered = True
+        self.muted = False
+        self.received = []
+        self.channels = [1, 2]
+        self.attempts = []
+        self.drops = {}
+        self.sockets = []
+        self.listeners = []
+        self.threads = []
+        self.address = None
+        self.family = None
+
+    def socketpair(self):
+        """
+        Serve one end of a socketpair and return the other one
+
+        :return: the socket to talk to the simulator
+        :rtype: socket
+        """
+        client, server = socket.socketpair()
+        self.serve(server)
+        return client
+
+    def listen_unix(self, path):
+        """
+        Accept connections on a Unix socket
+
+        :param path: path of the Unix socket
+        :type path: str
+        :return: the address to connect to
+        :rtype: str
+        """
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        return self._listen(listener)
+
+    def listen_tcp(self, host="127.0.0.1", port=0):
+        """
+        Accept connections on a TCP socket
+
+        :param host: interface to listen on
+        :type host: str
+        :param port: port to listen on, a free one if 0
+        :type port: int
+        :return: the address to connect to
+        :rtype: tuple(str, int)
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((host, port))
+        return self._listen(listener)
+
+    def transport(self, device, channel):
+        """
+        Open a socket to the simulator, usable as transport of SamsungMXT40
+
+        The socket connects to the Unix or TCP socket the simulator listens
+        on, or to a new socketpair if it does not listen.
+
+        :param device: The device MAC Address, ignored.
+        :type device: str
+        :param channel: RFCOMM channel, refused if not in channels
+        :type channel: int
+        :return: the socket to talk to the simulator
+        :rtype: socket
+        """
+        self.attempts.append(channel)
+        if channel not in self.channels:
+            raise ConnectionRefusedError("Channel %d refused" % channel)
+        if self.address is None:
+            return self.socketpair()
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.connect(self.address)
+        return sock
+
+    def serve(self, sock):
+        """
+        Answer the commands received on a socket in a background thread
+
+        :param sock: connected socket
+        :type sock: socket
+        """
+        self.sockets.append(sock)
+        thread = threading.Thread(target=self._serve, args=(sock,), daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def close(self):
+        """
+        Stop listening and close every connection
+        """
+        for sock in self.listeners + self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.listeners = []
+        self.sockets = []
+
+    def notify(self, payload, sequence=0):
+        """
+        Send a command on every connection without being asked, like the tower does when its remote is used
+
+        :param payload: payload of the command
+        :type payload: list of int
+        :param sequence: sequence number of the command
+        :type sequence: int
+        """
+        response = FrameEncoder().encode(1, sequence, payload)
+        for sock in list(self.sockets):
+            try:
+                self._send(sock, response)
+            except OSError:
+                pass
+
+    def handle(self, payload):
+        """
+        Compute the payloads answering a payload received
+
+        :param payload: payload of the command received
+        :type payload: bytes
+        :return: the payloads to answer
+        :rtype: list of list of int
+        """
+        opcode = payload[0]
+        with self.lock:
+            self.received.append(bytes(payload))
+            if opcode == 1:
+                version = list(SamsungMXT40Simulator.PROTOCOL_VERSION)
+                return [[2] + version + [SamsungMXT40Simulator.MODEL_INFO, SamsungMXT40Simulator.COUNTRY_INFO, len(self.sources)] + self.sources + [SamsungMXT40Simulator.GROUP_MODE]]
+            if opcode == 50:
+                return [[49, self.source]]
+            if opcode == 48:
+                self.source = payload[1]
+                return [[49, self.source]]
+            if opcode == 66:
+                return [self._sound_setting(payload[1])]
+            if opcode == 64:
+                self.sound_settings[payload[1]] = list(payload[2:5])
+                return [self._sound_setting(payload[1])]
+            if opcode == 82:
+                return [self._system_setting(payload[1])]
+            if opcode == 80:
+                self.system_settings[payload[1]] = list(payload[2:])
+                return [self._system_setting(payload[1])]
+            if opcode == 96:
+                self.color = list(payload[2:5])
+                return [[97, payload[1]] + self.color]
+            if opcode == 36:
+                return [[35] + self.usb_status]
+            if opcode == 52:
+                return [[51, self.aux_state]]
+            if opcode == 112:
+                return self._remote_control(payload[1])
+            return [[(opcode + 1) & 255, 0]]
+
+    def _sound_setting(self, setting):
+        """
+        Payload of a sound setting info
+
+        :param setting: sound setting number
+        :type setting: int
+        :return: the payload
+        :rtype: list of int
+        """
+        return [65, setting] + self.sound_settings.get(setting, [0, 0, 0])
+
+    def _system_setting(self, setting):
+        """
+        Payload of a system setting info
+
+        :param setting: system setting number
+        :type setting: int
+        :return: the payload
+        :rtype: list of int
+        """
+        return [81, setting] + self.system_settings.get(setting, [0])
+
+    def _remote_control(self, command):
+        """
+        Apply a remote control command
+
+        :param command: remote control command
+        :type command: int
+        :return: the payloads to answer
+        :rtype: list of list of int
+        """
+        volume = self.sound_settings.setdefault(SamsungMXT40Simulator.VOLUME_SETTING, [0, 0, 0])
+        if command == 1:
+            self.powered = not self.powered
+        elif command == 15:
+            volume[1] = min(volume[1] + 1, SamsungMXT40Simulator.MAX_VOLUME)
+        elif command == 16:
+            volume[1] = max(volume[1] - 1, 0)
+        elif command == 20:
+            self.muted = not self.muted
+        if command in (15, 16):
+            return [self._sound_setting(SamsungMXT40Simulator.VOLUME_SETTING)]
+        return [[113, command]]
+
+    def _listen(self, listener):
+        """
+        Accept the connections of a listening socket in a background thread
+
+        :param listener: bound socket
+        :type listener: socket
+        :return: the address to connect to
+        :rtype: str or tuple(str, int)
+        """
+        listener.listen()
+        self.listeners.append(listener)
+        self.address = listener.getsockname()
+        self.family = listener.family
+        thread = threading.Thread(target=self._accept, args=(listener,), daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return self.address
+
+    def _accept(self, listener):
+        """
+        Serve each connection accepted by a listening socket
+
+        :param listener: listening socket
+        :type listener: socket
+        """
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            self.serve(sock)
+
+    def _serve(self, sock):
+        """
+        Decode the commands received on a socket and answer them
+
+        :param sock: connected socket
+        :type sock: socket
+        """
+        decoder = FrameDecoder()
+        encoder = FrameEncoder()
+        while True:
+            try:
+                chunk = sock.recv(1024)
+            except OSError:
+                return
+            if not chunk:
+                return
+            for frame in decoder.decode(chunk):
+                sequence = frame[3]
+                payloads = self.handle(frame[6:-1])
+                if self.drops.get(frame[6]):
+                    self.drops[frame[6]] -= 1
+                    logging.debug("Simulator dropping the connection after opcode %d", frame[6])
+                    sock.shutdown(socket.SHUT_RDWR)
+                    return
+                for payload in payloads:
+                    try:
+                        self._send(sock, encoder.encode(1, sequence, payload))
+                    except OSError:
+                        return
+
+    def _send(self, sock, response):
+        """
+        Send a response applying latency, jitter, corruption and fragmentation
+
+        :param sock: connected socket
+        :type sock: socket
+        :param response: encoded response
+        :type response: bytes
+        """
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.corruption and self.random.random() < self.corruption:
+            response = bytearray(response)
+            response[self.random.randrange(2, len(response))] ^= 1 << self.random.randrange(8)
+            logging.debug("Simulator corrupted %s", bytes(response))
+        if not self.fragment:
+            sock.sendall(response)
+            return
+        start = 0
+        while start < len(response):
+            size = self.random.randint(1, self.fragment)
+            sock.sendall(response[start:start + size])
+            start += size
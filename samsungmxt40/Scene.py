@@ -0,0 +1,142 @@
+import json
+import logging
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+from samsungmxt40.FrameEncoder import FrameEncoder
+from samsungmxt40.SamsungMXT40 import SamsungMXT40
+
+class Scene:
+    """
+    Named set of lighting and sound settings applied in one write
+
+    A scene is compiled once into the frames of its settings, preceded by a
+    single effect fragment mode preamble. Applying it stamps a copy of the
+    frames with the sequence numbers of the session and writes them in one
+    send::
+
+        scenes = Scene.load("scenes.json")
+        scenes["party"].apply(samsung)
+
+    A scenes file maps each name to its settings, in JSON::
+
+        {"party": {"lighting_status": "PARTY", "color": [10, 0, 5], "dj_effect": ["DELAY", 15],
+                   "tempo": 8, "bass_booster": "ON", "source": "BT"}}
+
+    or in TOML, one table per scene. Every setting is optional.
+
+    :param name: scene name
+    :type name: str
+    :param settings: lighting_status, color, dj_effect, tempo, bass_booster and source
+    :type settings: dict
+    :var fields: settings of a scene, in the order they are sent
+    :vartype fields: list of str
+    """
+
+    fields = ["lighting_status", "color", "dj_effect", "tempo", "bass_booster", "source"]
+
+    def __init__(self, name, settings):
+        """
+        Init the scene, the frames are built on first use
+
+        :param name: scene name
+        :type name: str
+        :param settings: lighting_status, color, dj_effect, tempo, bass_booster and source
+        :type settings: dict
+        """
+        unknown = set(settings) - set(Scene.fields)
+        if unknown:
+            raise ValueError("Unknown setting %s in scene %s" % (", ".join(sorted(unknown)), name))
+        self.name = name
+        self.settings = dict(settings)
+        self.frames = None
+        self.preamble = 0
+
+    def load(path):
+        """
+        Read a scenes file, TOML if its name ends with .toml, JSON otherwise
+
+        :param path: path of the file
+        :type path: str
+        :return: mapping of scene name to scene
+        :rtype: dict(str, Scene)
+        """
+        if path.endswith(".toml"):
+            if tomllib is None:
+                raise ValueError("Reading %s needs Python 3.11 or later" % path)
+            with open(path, "rb") as f:
+                scenes = tomllib.load(f)
+        else:
+            with open(path) as f:
+                scenes = json.load(f)
+        return {name: Scene(name, settings) for name, settings in scenes.items()}
+
+    def compile(self):
+        """
+        Build the frames of the scene once
+
+        :return: frames with sequence number 0, the preamble first
+        :rtype: list of bytes
+        """
+        if self.frames is not None:
+            return self.frames
+        builder = SamsungMXT40("", connect=False)
+        settings = self.settings
+        commands = []
+        try:
+            if "lighting_status" in settings:
+                commands.append(builder.status_setting(settings["lighting_status"]))
+            if "color" in settings:
+                r, g, b = settings["color"]
+                commands.append(builder.illumination_setting(int(r), int(g), int(b)))
+            if "dj_effect" in settings:
+                effect, value = settings["dj_effect"]
+                commands.append(builder.change_dj_effect(effect, int(value)))
+            if "tempo" in settings:
+                commands.append(builder.tempo(int(settings["tempo"])))
+            if "bass_booster" in settings:
+                commands.append(builder.bass_booster(settings["bass_booster"]))
+            preamble = builder.effectFragmentCommands() if commands else []
+            if "source" in settings:
+                commands += builder.sourceSwitchCommands(settings["source"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError("Invalid scene %s: %r" % (self.name, e))
+        self.preamble = len(preamble)
+        self.frames = [FrameEncoder.restamp(command, 0) for command in preamble + commands]
+        return self.frames
+
+    def to_bytes(self):
+        """
+        Compiled frames of the scene, back to back
+
+        :return: the frames with sequence number 0
+        :rtype: bytes
+        """
+        return b"".join(self.compile())
+
+    def apply(self, samsung):
+        """
+        Send the scene in one write
+
+        The preamble is skipped when the session is already in effect
+        fragment mode. The frames are built apart from the session, the
+        source and mode changes they cause are applied to it here.
+
+        :param samsung: the connected session
+        :type samsung: SamsungMXT40
+        :return: the commands received for each frame sent
+        :rtype: list of list of bytes
+        """
+        frames = self.compile()
+        start = self.preamble if samsung.mode == SamsungMXT40.EFFECT_FRAGMENT_MODE else 0
+        commands = [FrameEncoder.restamp(frame, samsung.nextSequence()) for frame in frames[start:]]
+        logging.debug("Scene %s: %d frames", self.name, len(commands))
+        if "source" in self.settings:
+            samsung.sourceSwitched(self.settings["source"])
+        replies = samsung.pipeline(commands, window=len(commands))
+        if "source" not in self.settings and start < self.preamble:
+            samsung.mode = SamsungMXT40.EFFECT_FRAGMENT_MODE if all(replies[:self.preamble]) else None
+        return replies
@@ -0,0 +1,200 @@
+import queue
+import select
+import logging
+import threading
+
+import bluetooth
+
+class SessionReader:
+    """
+    Read the socket of a session in a background thread
+
+    Every command received is decoded once and goes through the
+    :meth:`SamsungMXT40.receive` of the session, keeping its state current.
+    The commands carrying the sequence number of a request in progress are
+    handed to that request, or every command when it matches them itself
+    as the requests and pipelines do. The others are unsolicited
+    notifications, a source change from the physical remote for instance,
+    and get published to the subscribers::
+
+        samsung.start_reader()
+        samsung.subscribe(lambda response: print(response.source), SourceInfo)
+
+    :param samsung: the connected session to read
+    :type samsung: SamsungMXT40
+    :param poll_interval: seconds between two checks of the stop request
+    :type poll_interval: float
+    :var subscribers: list of (callback, record class) receiving the notifications
+    :vartype subscribers: list of tuple(callable, class)
+    :var notifications: number of unsolicited notifications received
+    :vartype notifications: int
+    """
+
+    def __init__(self, samsung, poll_interval=0.1):
+        """
+        Init the reader, the thread is started by :meth:`start`
+
+        :param samsung: the connected session to read
+        :type samsung: SamsungMXT40
+        :param poll_interval: seconds between two checks of the stop request
+        :type poll_interval: float
+        """
+        self.samsung = samsung
+        self.poll_interval = poll_interval
+        self.subscribers = []
+        self.notifications = 0
+        self.replies = queue.Queue()
+        self.sequences = None
+        self.fallback = False
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Start the reader thread, stopping the previous one
+        """
+        self.stop()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="SamsungMXT40 reader %s" % self.samsung.device, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the reader thread and wait for it
+        """
+        self.stopping.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_alive(self):
+        """
+        Tell if the reader thread is still reading the socket
+
+        :rtype: bool
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def subscribe(self, callback, record=None):
+        """
+        Call a function for each unsolicited notification
+
+        The callback runs in the reader thread, it must return quickly.
+
+        :param callback: function called with the record of the notification
+        :type callback: callable
+        :param record: record class the callback is interested in, every record if None
+        :type record: class
+        """
+        with self.lock:
+            self.subscribers = self.subscribers + [(callback, record)]
+
+    def unsubscribe(self, callback):
+        """
+        Stop calling a function subscribed
+
+        :param callback: function subscribed
+        :type callback: callable
+        """
+        with self.lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber[0] != callback]
+
+    def begin(self, sequences, fallback=False):
+        """
+        Route the commands received with some sequence numbers to the caller
+
+        Must be called before writing the commands so a fast answer is not
+        taken for a notification.
+
+        :param sequences: sequence numbers of the commands sent, can grow until :meth:`end`
+        :type sequences: collection of int
+        :param fallback: route every command, the caller matches them and publishes the ones it does not take
+        :type fallback: bool
+        """
+        while not self.replies.empty():
+            logging.debug("Dropping late reply %s", self.replies.get_nowait()[0])
+        self.fallback = fallback
+        self.sequences = sequences
+
+    def end(self):
+        """
+        Stop routing the commands received to the caller
+        """
+        self.sequences = None
+        self.fallback = False
+
+    def get(self, timeout):
+        """
+        Wait for the commands routed to the caller
+
+        :param timeout: seconds to wait, return right away if 0 or less
+        :type timeout: float
+        :return: the commands received and their records, empty if nothing arrived in time
+        :rtype: list of tuple(bytes, Response)
+        """
+        received = []
+        try:
+            if timeout > 0 and self.is_alive():
+                received.append(self.replies.get(timeout=timeout))
+            while True:
+                received.append(self.replies.get_nowait())
+        except queue.Empty:
+            return received
+
+    def publish(self, response):
+        """
+        Give an unsolicited notification to the subscribers interested in it
+
+        :param response: the record of the notification
+        :type response: Response
+        """
+        self.notifications += 1
+        for callback, record in self.subscribers:
+            if record is not None and not isinstance(response, record):
+                continue
+            try:
+                callback(response)
+            except Exception:
+                logging.exception("Subscriber %r failed on %r", callback, response)
+
+    def _run(self):
+        """
+        Read and dispatch the commands until stopped or the socket closes
+        """
+        sock = self.samsung.socket
+        decoder = self.samsung.decoder
+        while not self.stopping.is_set():
+            try:
+                readable, _, _ = select.select([sock], [], [], self.poll_interval)
+                if not readable:
+                    continue
+                chunk = sock.recv(1024)
+            except (OSError, ValueError, bluetooth.btcommon.BluetoothError) as e:
+                if not self.stopping.is_set():
+                    logging.warning("Reader of %s stopped: %s", self.samsung.device, e)
+                    self.samsung.link_error = e
+                return
+            if not chunk:
+                logging.info("Reader of %s stopped, connection closed", self.samsung.device)
+                self.samsung.link_error = ConnectionResetError("Connection closed by %s" % self.samsung.device)
+                return
+            if self.samsung.metrics is not None:
+                self.samsung.metrics.read(self.samsung.device, len(chunk))
+            logging.debug("Read %s", chunk)
+            for command in decoder.decode(chunk):
+                command = bytes(command)
+                sequences = self.sequences
+                fallback = self.fallback
+                try:
+                    response = self.samsung.receive(command)
+                except (KeyError, ValueError) as e:
+                    self.samsung.responses.errors += 1
+                    logging.warning("Command %s of %s not handled: %r", command, self.samsung.device, e)
+                    response = None
+                if sequences is not None and (fallback or command[3] in sequences):
+                    self.replies.put((command, response))
+                elif response is not None:
+                    self.publish(response)
+                else:
+                    logging.debug("Unsolicited command %s", command)
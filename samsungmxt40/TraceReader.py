@@ -0,0 +1,173 @@
+import mmap
+import socket
+import logging
+import threading
+from collections import deque
+
+from samsungmxt40.FrameDecoder import FrameDecoder
+from samsungmxt40.FrameEncoder import FrameEncoder
+from samsungmxt40.TraceRecorder import TraceRecorder
+
+class TraceReader:
+    """
+    Memory mapped reader of a file written by :class:`TraceRecorder`
+
+    The records are parsed in place, only the frames yielded are copied,
+    so a large trace is filtered without being loaded::
+
+        with TraceReader("link.trace") as trace:
+            for timestamp, direction, frame in trace.records(opcode=96, start=t0):
+                print(timestamp, direction, frame.hex())
+
+    A trace is replayed by giving :meth:`transport` to a session: the
+    frames received are answered with the frames recorded::
+
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=trace.transport)
+
+    :param path: path of the trace file
+    :type path: str
+    """
+
+    def __init__(self, path):
+        """
+        Map the trace file
+
+        :param path: path of the trace file
+        :type path: str
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < TraceRecorder.HEADER.size:
+            self.map.close()
+            raise ValueError("%s is not a trace file" % path)
+        magic, version, self.ring_size, self.head, self.tail, self.count = TraceRecorder.HEADER.unpack_from(self.map, 0)
+        if magic != TraceRecorder.MAGIC or version != TraceRecorder.VERSION:
+            self.map.close()
+            raise ValueError("%s is not a trace file" % path)
+        self.threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def __iter__(self):
+        return self.records()
+
+    def close(self):
+        """
+        Unmap the trace file
+        """
+        self.map.close()
+
+    def offsets(self):
+        """
+        Offsets of the record headers, oldest first
+
+        :return: generator of offsets
+        :rtype: generator of int
+        """
+        header = TraceRecorder.RECORD
+        start = TraceRecorder.HEADER.size
+        if not self.ring_size:
+            position = start
+            while position + header.size <= len(self.map):
+                length = header.unpack_from(self.map, position)[2]
+                if position + header.size + length > len(self.map):
+                    return
+                yield position
+                position += header.size + length
+            return
+        end = start + self.ring_size
+        position = self.tail
+        for i in range(self.count):
+            if position + header.size > end or header.unpack_from(self.map, position)[1] == TraceRecorder.WRAP:
+                position = start
+            yield position
+            position += header.size + header.unpack_from(self.map, position)[2]
+
+    def records(self, opcode=None, start=None, end=None, direction=None):
+        """
+        Iterate over the frames of the trace, oldest first
+
+        :param opcode: only the frames of this opcode, every opcode if None
+        :type opcode: int
+        :param start: only the frames recorded at or after this time.time()
+        :type start: float
+        :param end: only the frames recorded before this time.time()
+        :type end: float
+        :param direction: only TraceRecorder.OUT or TraceRecorder.IN frames, both if None
+        :type direction: int
+        :return: generator of (time.time(), direction, frame)
+        :rtype: generator of tuple(float, int, bytes)
+        """
+        header = TraceRecorder.RECORD
+        for position in self.offsets():
+            timestamp, way, length = header.unpack_from(self.map, position)
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                if not self.ring_size:
+                    return
+                continue
+            if direction is not None and way != direction:
+                continue
+            frame = position + header.size
+            if opcode is not None and (length < 7 or self.map[frame + 6] != opcode):
+                continue
+            yield (timestamp, way, self.map[frame:frame + length])
+
+    def transport(self, device, channel):
+        """
+        Open a socket replaying the trace, usable as transport of SamsungMXT40
+
+        Each frame recorded as sent waits for a frame from the session, each
+        frame recorded as received is sent back with the sequence number the
+        session used for the command it answers.
+
+        :param device: The device MAC Address, ignored.
+        :type device: str
+        :param channel: RFCOMM channel, ignored.
+        :type channel: int
+        :return: the socket to talk to the replay
+        :rtype: socket
+        """
+        session, replay = socket.socketpair()
+        thread = threading.Thread(target=self._replay, args=(replay,), name="SamsungMXT40 replay", daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return session
+
+    def _replay(self, sock):
+        """
+        Play the trace on a socket in a background thread
+
+        :param sock: connected socket
+        :type sock: socket
+        """
+        decoder = FrameDecoder()
+        received = deque()
+        sequences = {}
+        try:
+            for timestamp, direction, frame in self.records():
+                if direction == TraceRecorder.OUT:
+                    while not received:
+                        chunk = sock.recv(1024)
+                        if not chunk:
+                            return
+                        received.extend(bytes(command) for command in decoder.decode(chunk))
+                    command = received.popleft()
+                    if len(command) > 6 and len(frame) > 6 and command[6] != frame[6]:
+                        logging.info("Replay expected opcode %d, got %d", frame[6], command[6])
+                    sequences[frame[3]] = command[3]
+                else:
+                    sequence = sequences.get(frame[3])
+                    sock.sendall(frame if sequence is None else FrameEncoder.restamp(frame, sequence))
+            while sock.recv(1024):
+                pass
+        except (OSError, ValueError) as e:
+            logging.debug("Replay stopped: %s", e)
+        finally:
+            sock.close()
@@ -0,0 +1,164 @@
+import mmap
+import time
+import struct
+import threading
+
+class TraceRecorder:
+    """
+    Binary capture of the frames sent to and received from the devices
+
+    Each frame is appended raw after a fixed record header holding its
+    time, its direction and its length, so recording costs a struct pack
+    and a buffered write. In ring mode the file has a fixed size and the
+    oldest frames are overwritten::
+
+        recorder = TraceRecorder("link.trace", ring_size=1 << 20)
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", trace=recorder)
+        ...
+        recorder.close()
+
+    The file starts with HEADER: MAGIC, VERSION, the size of the ring (0
+    when the file grows without limit), then the offset of the next
+    record, the offset of the oldest one and the number of records, the
+    last three only used in ring mode. A record header with the direction
+    WRAP, or too close to the end of the ring to hold a record header,
+    sends the reader back to the start of the ring. Read the file with
+    :class:`TraceReader`.
+
+    :param path: path of the trace file, overwritten
+    :type path: str
+    :param ring_size: bytes kept for the records in ring mode, grow without limit if None
+    :type ring_size: int
+    :var HEADER: layout of the file header
+    :vartype HEADER: struct.Struct
+    :var RECORD: layout of a record header: time.time(), direction and frame length
+    :vartype RECORD: struct.Struct
+    :var OUT: direction of the frames sent to the device
+    :vartype OUT: int
+    :var IN: direction of the frames received from the device
+    :vartype IN: int
+    :var WRAP: direction marking the end of the records before the start of the ring
+    :vartype WRAP: int
+    """
+
+    MAGIC = b"MXT40TRC"
+    VERSION = 1
+    HEADER = struct.Struct("<8sB3xIIII")
+    RECORD = struct.Struct("<dBH")
+
+    OUT = 0
+    IN = 1
+    WRAP = 255
+
+    def __init__(self, path, ring_size=None):
+        """
+        Create the trace file
+
+        :param path: path of the trace file, overwritten
+        :type path: str
+        :param ring_size: bytes kept for the records in ring mode, grow without limit if None
+        :type ring_size: int
+        """
+        self.path = path
+        self.ring_size = ring_size
+        self.lock = threading.Lock()
+        self.records = 0
+        if ring_size is None:
+            self.file = open(path, "wb")
+            self.file.write(TraceRecorder.HEADER.pack(TraceRecorder.MAGIC, TraceRecorder.VERSION, 0, 0, 0, 0))
+            self.map = None
+        else:
+            if ring_size < TraceRecorder.RECORD.size:
+                raise ValueError("Ring of %d bytes too small" % ring_size)
+            self.file = open(path, "w+b")
+            self.file.truncate(TraceRecorder.HEADER.size + ring_size)
+            self.map = mmap.mmap(self.file.fileno(), TraceRecorder.HEADER.size + ring_size)
+            self.head = self.tail = TraceRecorder.HEADER.size
+            self.map[:TraceRecorder.HEADER.size] = self._header()
+
+    def _header(self):
+        """
+        Header of a ring file for its current state
+
+        :rtype: bytes
+        """
+        return TraceRecorder.HEADER.pack(TraceRecorder.MAGIC, TraceRecorder.VERSION, self.ring_size, self.head, self.tail, self.records)
+
+    def record(self, direction, frame):
+        """
+        Append a frame
+
+        :param direction: OUT or IN
+        :type direction: int
+        :param frame: complete command
+        :type frame: bytes
+        """
+        header = TraceRecorder.RECORD.pack(time.time(), direction, len(frame))
+        with self.lock:
+            if self.map is None:
+                self.file.write(header)
+                self.file.write(frame)
+                self.records += 1
+            else:
+                self._ring_write(header, frame)
+
+    def _ring_write(self, header, frame):
+        """
+        Write a record in the ring, overwriting the oldest ones, self.lock must be held
+        """
+        size = len(header) + len(frame)
+        start = TraceRecorder.HEADER.size
+        end = start + self.ring_size
+        if size > self.ring_size:
+            raise ValueError("Frame of %d bytes larger than the ring" % len(frame))
+        if self.head + size > end:
+            while self.records and self.tail >= self.head:
+                self._evict(start, end)
+            if self.head + TraceRecorder.RECORD.size <= end:
+                TraceRecorder.RECORD.pack_into(self.map, self.head, 0.0, TraceRecorder.WRAP, 0)
+            self.head = start
+        while self.records and self.head <= self.tail < self.head + size:
+            self._evict(start, end)
+        if not self.records:
+            self.tail = self.head
+        self.map[self.head:self.head + len(header)] = header
+        self.map[self.head + len(header):self.head + size] = frame
+        self.head += size
+        self.records += 1
+        self.map[:TraceRecorder.HEADER.size] = self._header()
+
+    def _evict(self, start, end):
+        """
+        Drop the oldest record of the ring, or move past the end of the ring, self.lock must be held
+        """
+        if self.tail + TraceRecorder.RECORD.size > end:
+            self.tail = start
+            return
+        timestamp, direction, length = TraceRecorder.RECORD.unpack_from(self.map, self.tail)
+        if direction == TraceRecorder.WRAP:
+            self.tail = start
+            return
+        self.tail += TraceRecorder.RECORD.size + length
+        self.records -= 1
+
+    def flush(self):
+        """
+        Write the records buffered to the file
+        """
+        with self.lock:
+            if self.map is None:
+                self.file.flush()
+            else:
+                self.map.flush()
+
+    def close(self):
+        """
+        Flush and close the trace file
+        """
+        with self.lock:
+            if self.file.closed:
+                return
+            if self.map is not None:
+                self.map.flush()
+                self.map.close()
+            self.file.close()
@@ -1 +1,23 @@
 from samsungmxt40.SamsungMXT40 import SamsungMXT40
+from samsungmxt40.CommandSpec import CommandSpec
+from samsungmxt40.ConnectionManager import ConnectionManager
+from samsungmxt40.SessionReader import SessionReader
+from samsungmxt40.DeviceState import DeviceState
+from samsungmxt40.CommandScheduler import CommandScheduler
+from samsungmxt40.ProfileStore import ProfileStore
+from samsungmxt40.LightAnimator import LightAnimator
+from samsungmxt40.Scene import Scene
+from samsungmxt40.Metrics import Metrics
+from samsungmxt40.TraceRecorder import TraceRecorder
+from samsungmxt40.TraceReader import TraceReader
+from samsungmxt40.Retrier import Retrier
+from samsungmxt40.FrameDecoder import FrameDecoder
+from samsungmxt40.FrameEncoder import FrameEncoder
+from samsungmxt40.AsyncSamsungMXT40 import AsyncSamsungMXT40
+from samsungmxt40.CommandPlan import CommandPlan
+from samsungmxt40.Fleet import Fleet
+from samsungmxt40.ControllerDaemon import ControllerDaemon
+from samsungmxt40.ControllerClient import ControllerClient
+from samsungmxt40.HttpGateway import HttpGateway
+from samsungmxt40.SamsungMXT40Simulator import SamsungMXT40Simulator
+from samsungmxt40.ResponseDecoder import ResponseDecoder, Response, ConnectInfo, SourceInfo, SoundSetting, SystemSetting, IlluminationSetting, UsbStatus, AuxState
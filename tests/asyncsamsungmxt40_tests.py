@@ -0,0 +1,91 @@
+import socket
+import asyncio
+import inspect
+import unittest
+
+from samsungmxt40 import AsyncSamsungMXT40, FrameEncoder, SourceInfo
+
+class AsyncSamsungMXT40TestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.samsung = AsyncSamsungMXT40("2C:FD:B3:E6:D1:08")
+        self.samsung.socket, self.device = socket.socketpair()
+        self.samsung.socket.setblocking(False)
+        self.encoder = FrameEncoder()
+
+    def tearDown(self):
+        self.samsung.close()
+        self.device.close()
+
+    async def test_request(self):
+        """Test request awaits the answer"""
+        self.device.send(self.encoder.encode(1, 1, [2, 7]))
+        result = await self.samsung.request(self.samsung.connect_req(), timeout=5)
+        self.assertEqual(result, [self.encoder.encode(1, 1, [2, 7])])
+
+    async def test_pipeline(self):
+        """Test pipeline matches responses arriving out of order by sequence number"""
+        for sequence in [2, 1]:
+            self.device.send(self.encoder.encode(1, sequence, [65, sequence]))
+        result = await self.samsung.pipeline([self.samsung.sound_setting_info_req(n) for n in range(2)], timeout=5)
+        self.assertEqual([list(replies[0][6:8]) for replies in result], [[65, 1], [65, 2]])
+
+    async def test_pipeline_burst(self):
+        """Test a pipeline window is written in one awaited send"""
+        bursts = []
+        write_frames = self.samsung.writeFrames
+
+        async def counting(requests):
+            bursts.append(len(requests))
+            await write_frames(requests)
+
+        self.samsung.writeFrames = counting
+        for sequence in [1, 2, 3]:
+            self.device.send(self.encoder.encode(1, sequence, [65, sequence]))
+        result = await self.samsung.pipeline([self.samsung.sound_setting_info_req(n) for n in range(3)], timeout=5)
+        self.assertEqual(bursts, [3])
+        self.assertEqual([list(replies[0][6:8]) for replies in result], [[65, 1], [65, 2], [65, 3]])
+
+    async def test_ping_dropped(self):
+        """Test ping answers False once the link dropped"""
+        self.samsung.socket.close()
+        self.assertFalse(await self.samsung.ping())
+
+    async def test_frames(self):
+        """Test async iteration over the commands received"""
+        self.device.send(self.encoder.encode(1, 7, [49, 4]))
+        async for command in self.samsung:
+            self.assertEqual(command[6:8], bytes([49, 4]))
+            break
+
+    async def test_subscribe(self):
+        """Test the reader task publishes the notifications and lets the requests through"""
+        received = asyncio.Queue()
+        self.samsung.subscribe(received.put_nowait, SourceInfo)
+        self.assertTrue(self.samsung.reader.is_alive())
+        self.device.send(self.encoder.encode(1, 7, [49, 4]))
+        self.assertEqual(await asyncio.wait_for(received.get(), 5), SourceInfo(4))
+        loop = asyncio.get_running_loop()
+        self.device.setblocking(False)
+        request = asyncio.ensure_future(self.samsung.request(self.samsung.sound_setting_info_req(6), timeout=5))
+        command = await loop.sock_recv(self.device, 1024)
+        await loop.sock_sendall(self.device, self.encoder.encode(1, command[3], [65, 6, 0, 8, 0]))
+        replies = await request
+        self.assertEqual(replies[0][6:8], bytes([65, 6]))
+        self.samsung.stop_reader()
+        self.assertIsNone(self.samsung.reader)
+
+    async def test_accessors(self):
+        """Test the accessors inherited from SamsungMXT40 are coroutines answering from the device"""
+        self.device.send(self.encoder.encode(1, 1, [49, 4]))
+        self.assertEqual(await self.samsung.get_source(), SourceInfo(4))
+        self.assertEqual(await self.samsung.get_source(), SourceInfo(4))
+        self.device.send(self.encoder.encode(1, 2, [81, 3, 2]))
+        self.assertEqual((await self.samsung.get_system_setting(3)).values, (2,))
+        for name in ["get_source", "get_sound_setting", "get_system_setting", "get_usb_status", "get_aux_state", "get_volume",
+                     "readCommands", "effect_fragment_mode", "remote_control_mode"]:
+            self.assertTrue(inspect.iscoroutinefunction(getattr(self.samsung, name)), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import time
+import threading
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, CommandScheduler, SourceInfo
+
+class CommandSchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.simulator = SamsungMXT40Simulator()
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport)
+
+    def tearDown(self):
+        self.samsung.close()
+        self.simulator.close()
+
+    def test_priority(self):
+        """Test user facing commands run before bulk lighting updates"""
+        scheduler = CommandScheduler(self.samsung)
+        release = threading.Event()
+        blocker = scheduler.submit_call(lambda samsung: release.wait(1))
+        color = scheduler.submit("illumination_setting", 1, 2, 3)
+        mute = scheduler.submit("toggle_mute")
+        release.set()
+        self.assertTrue(blocker.result(1))
+        self.assertEqual(len(mute.result(1)), 1)
+        self.assertEqual(len(color.result(1)), 1)
+        opcodes = [payload[0] for payload in self.simulator.received]
+        self.assertLess(opcodes.index(112), opcodes.index(96))
+        scheduler.close()
+
+    def test_own_replies(self):
+        """Test concurrent callers each get their own reply"""
+        scheduler = CommandScheduler(self.samsung)
+        futures = []
+        def caller():
+            futures.append(scheduler.submit_call(lambda samsung: samsung.request(samsung.source_info_req(), decoded=True)))
+        threads = [threading.Thread(target=caller) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([future.result(1) for future in futures], [[SourceInfo(1)]] * 8)
+        scheduler.close()
+        with self.assertRaises(RuntimeError):
+            scheduler.submit("source_info_req")
+
+    def test_rate_limit(self):
+        """Test the frames written are spaced by the maximum frame rate"""
+        scheduler = CommandScheduler(self.samsung, max_frame_rate=50)
+        start = time.monotonic()
+        future = scheduler.submit_pipeline([("source_info_req", []) for i in range(5)])
+        self.assertEqual(len(future.result(1)), 5)
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+        scheduler.close()
+
+    def test_build_in_writer(self):
+        """Test the commands of several threads are built and stamped one at a time"""
+        scheduler = CommandScheduler(self.samsung)
+        futures = []
+
+        def caller(value):
+            for i in range(50):
+                futures.append(scheduler.submit("illumination_setting", value, i, 255 - i))
+
+        threads = [threading.Thread(target=caller, args=(value,)) for value in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(len(future.result(5)) == 1 for future in futures))
+        received = [payload for payload in self.simulator.received if payload[0] == 96]
+        self.assertEqual(sorted(received), sorted(bytes([96, 2, value, i, 255 - i]) for value in range(4) for i in range(50)))
+        with self.assertRaises(ValueError):
+            scheduler.submit("teleport")
+        self.assertIsInstance(scheduler.submit("illumination_setting", 300, 0, 0).exception(5), ValueError)
+        scheduler.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import argparse
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, CommandSpec, CommandPlan, ResponseDecoder, IlluminationSetting
+
+class CommandSpecTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.builder = SamsungMXT40("", connect=False)
+
+    def test_builders(self):
+        """Test every row of the protocol has its builder"""
+        for spec in SamsungMXT40.protocol:
+            method = getattr(SamsungMXT40, spec.name)
+            self.assertIs(method.spec, spec)
+            self.assertIs(SamsungMXT40.commands[spec.name], spec)
+            command = method(self.builder, *[next(iter(arg.choices)) if arg.choices else arg.low for arg in spec.args])
+            self.assertEqual(command[6], spec.opcode)
+
+    def test_payloads(self):
+        """Test the payloads built from the templates"""
+        self.assertEqual(list(self.builder.illumination_setting(10, 0, 5)[6:-1]), [96, 2, 10, 0, 5])
+        self.assertEqual(list(self.builder.status_setting("PARTY")[6:-1]), [80, 3, 2])
+        self.assertEqual(list(self.builder.bass_booster("OFF")[6:-1]), [64, 4, 0, 1, 0])
+        self.assertEqual(list(self.builder.change_dj_effect("OFF", 30)[6:-1]), [64, 5, 1, 1, 0])
+        self.assertEqual(list(self.builder.sound_setting(5, 1, 2, 3)[6:-1]), [64, 5, 1, 2, 0])
+
+    def test_named_builders(self):
+        """Test the builders without argument encode the same payloads as the generic ones"""
+        for name, generic in [("bass_booster_on", lambda: self.builder.bass_booster("ON")),
+                              ("bass_booster_off", lambda: self.builder.bass_booster("OFF")),
+                              ("sound_more", lambda: self.builder.sound("MORE")),
+                              ("sound_less", lambda: self.builder.sound("LESS"))]:
+            command = getattr(self.builder, name)()
+            self.assertEqual(command[6:-1], generic()[6:-1], name)
+            self.assertIs(CommandSpec.lookup(SamsungMXT40, command), SamsungMXT40.commands[name])
+        self.assertEqual(list(self.builder.bass_booster_off()[6:-1]), [64, 4, 0, 1, 0])
+        self.assertEqual(list(self.builder.sound_more()[6:-1]), [112, 15])
+
+    def test_hooks(self):
+        """Test the builders keep the session state up to date"""
+        self.builder.mode = SamsungMXT40.EFFECT_FRAGMENT_MODE
+        self.builder.source_switch("AUX1")
+        self.assertEqual(self.builder.source_label, "AUX1")
+        self.assertIsNone(self.builder.mode)
+
+    def test_ranges(self):
+        """Test out of range arguments are refused before encoding"""
+        sequence = self.builder.SEQUENCE_NUMBER
+        for build in [lambda: self.builder.illumination_setting(256, 0, 0),
+                      lambda: self.builder.illumination_setting(-1, 0, 0),
+                      lambda: self.builder.tempo("8"),
+                      lambda: self.builder.change_dj_effect("DELAY", 31),
+                      lambda: self.builder.change_dj_effect("DELAY", 0),
+                      lambda: self.builder.tempo(16),
+                      lambda: self.builder.usb_playtime_enable(2),
+                      lambda: self.builder.status_setting("DISCO"),
+                      lambda: self.builder.source_switch("USB")]:
+            with self.assertRaises(ValueError):
+                build()
+        self.assertEqual(self.builder.SEQUENCE_NUMBER, sequence)
+
+    def test_decode(self):
+        """Test the answers are decoded into the record of the row"""
+        simulator = SamsungMXT40Simulator()
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=simulator.transport)
+        try:
+            for spec in SamsungMXT40.protocol:
+                if spec.reply is not None:
+                    self.assertIs(ResponseDecoder.registry[spec.reply.OPCODE], spec.reply.decode)
+            replies = samsung.request(samsung.illumination_setting(1, 2, 3), decoded=True)
+            self.assertEqual(replies, [IlluminationSetting(2, (1, 2, 3))])
+            replies = samsung.request(samsung.tempo(3), decoded=True)
+            self.assertIsInstance(replies[0], SamsungMXT40.commands["tempo"].reply)
+        finally:
+            samsung.close()
+            simulator.close()
+
+    def test_lookup(self):
+        """Test a command is traced back to the row it was built from"""
+        builder = self.builder
+        for command, name in [(builder.toggle_mute(), "toggle_mute"), (builder.remote_control(20), "toggle_mute"),
+                              (builder.remote_control(99), "remote_control"), (builder.remote_control(16), "sound_less"), (builder.sound_setting(1, 2, 3, 4), "sound_setting"),
+                              (builder.tempo(3), "tempo"), (builder.change_dj_effect("DELAY", 15), "change_dj_effect"),
+                              (builder.source_info_req(), "source_info_req")]:
+            self.assertIs(CommandSpec.lookup(SamsungMXT40, command), SamsungMXT40.commands[name])
+        self.assertIsNone(CommandSpec.lookup(SamsungMXT40, builder.getDataCommand([96, 2, 1])))
+        self.assertIsNone(CommandSpec.lookup(SamsungMXT40, builder.getDataCommand([200])))
+
+    def test_options(self):
+        """Test the command line options are generated and checked"""
+        parser = argparse.ArgumentParser()
+        for spec in SamsungMXT40.options:
+            spec.add_argument(parser)
+        args = vars(parser.parse_args(["-c", "10,0,5", "-dj", "DELAY,15", "-ls", "PARTY", "-sd", "LESS", "-so", "AUX1"]))
+        self.assertEqual(args["color"], [10, 0, 5])
+        self.assertEqual(args["sound"], ["LESS"])
+        self.assertEqual(args["source"], ["AUX1"])
+        self.assertTrue(all(spec.action in CommandPlan.actions for spec in SamsungMXT40.options))
+        self.assertEqual(args["dj_effect"], ["DELAY", 15])
+        self.assertEqual(args["lighting_status"], ["PARTY"])
+        self.assertIsNone(args["tempo"])
+        for text in ["DELAY,0", "DELAY,31"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                SamsungMXT40.commands["change_dj_effect"].parse(text)
+        with self.assertRaises(argparse.ArgumentTypeError):
+            SamsungMXT40.commands["tempo"].parse("200")
+        for text in ["10,0", "10,0,300", "a,0,0"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                SamsungMXT40.commands["illumination_setting"].parse(text)
+        with self.assertRaises(argparse.ArgumentTypeError):
+            SamsungMXT40.commands["source_switch"].parse("USB")
+
+    def test_table(self):
+        """Test a row naming an unknown argument is refused"""
+        with self.assertRaises(ValueError):
+            CommandSpec("bad", [96, "r"], [CommandSpec.Arg("g", "green color")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from samsungmxt40 import ConnectionManager
+
+class FakeSession:
+    """Session double counting the connections it goes through"""
+
+    def __init__(self, device):
+        self.device = device
+        self.connects = 0
+        self.last_activity = None
+        self.reader = None
+        self.alive = True
+        self.connect()
+
+    def connect(self):
+        self.connects += 1
+        self.socket = object()
+
+    def close(self):
+        self.socket = None
+
+    def is_connected(self):
+        return self.socket is not None
+
+    def ping(self):
+        return self.alive
+
+    def load_source_info(self):
+        pass
+
+class ConnectionManagerTestCase(unittest.TestCase):
+
+    def test_session_reused(self):
+        """Test two borrows share one connection"""
+        manager = ConnectionManager(idle_timeout=None, factory=FakeSession)
+        with manager.session("AA") as first:
+            pass
+        with manager.session("AA") as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(first.connects, 1)
+        self.assertIs(manager.peek("AA"), first)
+        self.assertIsNone(manager.peek("BB"))
+
+    def test_reconnect_dead_link(self):
+        """Test a link failing its health check gets reconnected"""
+        manager = ConnectionManager(idle_timeout=None, health_check_interval=0, factory=FakeSession)
+        samsung = manager.get("AA")
+        samsung.alive = False
+        manager.get("AA")
+        self.assertEqual(samsung.connects, 2)
+
+    def test_reap_idle_link(self):
+        """Test reap closes links idle for longer than idle_timeout"""
+        manager = ConnectionManager(idle_timeout=0, factory=FakeSession)
+        samsung = manager.get("AA")
+        manager.links["AA"].last_used -= 1
+        manager.reap()
+        self.assertFalse(samsung.is_connected())
+        manager.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
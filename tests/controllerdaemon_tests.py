@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, ConnectionManager, ControllerDaemon, ControllerClient, CommandPlan
+
+class ControllerDaemonTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "daemon.sock")
+        self.simulator = SamsungMXT40Simulator()
+        manager = ConnectionManager(idle_timeout=None, factory=lambda device: SamsungMXT40(device, transport=self.simulator.transport))
+        self.daemon = ControllerDaemon(self.path, manager)
+        self.daemon.start()
+        self.client = ControllerClient(self.path)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.simulator.close()
+        shutil.rmtree(self.directory)
+
+    def test_run(self):
+        """Test plans run through the daemon share one link"""
+        self.assertTrue(self.client.is_running())
+        results = self.client.run(["2C:FD:B3:E6:D1:08"], CommandPlan().color(10, 0, 5))
+        self.assertTrue(results[0].ok)
+        self.assertEqual(results[0].replies[0][0][6], 97)
+        results = self.client.run(["2C:FD:B3:E6:D1:08"], CommandPlan().volume(20))
+        self.assertEqual(results[0].replies, [[20]])
+        self.assertEqual(self.simulator.color, [10, 0, 5])
+        self.assertEqual(len(self.simulator.attempts), 1)
+
+    def test_errors(self):
+        """Test invalid requests get an error"""
+        self.assertIn("error", self.client.call({"op": "run", "devices": [], "plan": [["explode", []]]}))
+        self.assertIn("error", self.client.call({"op": "reboot"}))
+        for workers in ["4", None, 0, 2.5]:
+            self.assertIn("error", self.client.call({"op": "run", "devices": ["2C:FD:B3:E6:D1:08"], "plan": [], "workers": workers}))
+        self.assertIn("error", self.client.call({"op": "run", "devices": "2C:FD:B3:E6:D1:08", "plan": []}))
+        self.assertTrue(self.client.call({"op": "ping"})["ok"])
+        self.simulator.channels = []
+        results = self.client.run(["00:00:00:00:00:01"], CommandPlan().mute())
+        self.assertFalse(results[0].ok)
+
+    def test_not_running(self):
+        """Test a client without daemon reports it is not running"""
+        self.assertFalse(ControllerClient(os.path.join(self.directory, "missing.sock")).is_running())
+        with self.assertRaises(RuntimeError):
+            ControllerDaemon(self.path).bind()
+
+if __name__ == '__main__':
+    unittest.main()
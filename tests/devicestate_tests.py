@@ -0,0 +1,69 @@
+import time
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, DeviceState, SourceInfo, SoundSetting, SystemSetting, ConnectInfo
+
+class DeviceStateTestCase(unittest.TestCase):
+
+    def test_ttl(self):
+        """Test a record is fresh for the TTL of its class only"""
+        state = DeviceState({SourceInfo: 0.05})
+        state.update(SourceInfo(4))
+        state.update(SoundSetting(6, (0, 8, 0)))
+        self.assertEqual(state.get(SourceInfo), SourceInfo(4))
+        self.assertEqual(state.get(SoundSetting, 6), SoundSetting(6, (0, 8, 0)))
+        self.assertIsNone(state.get(SoundSetting, 5))
+        time.sleep(0.06)
+        self.assertIsNone(state.get(SourceInfo))
+        self.assertEqual(state.get(SourceInfo, max_age=10), SourceInfo(4))
+        self.assertEqual((state.hits, state.misses), (3, 2))
+
+    def test_invalidate_on_send(self):
+        """Test the commands sent invalidate the records they change"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        state = samsung.state
+        state.update(ConnectInfo((1, 2), 40, 1, (1,), 0))
+        state.update(SoundSetting(6, (0, 8, 0)))
+        state.update(SoundSetting(5, (1, 1, 0)))
+        state.update(SystemSetting(3, (1,)))
+        state.sent(samsung.tempo(10))
+        self.assertIsNone(state.get(SoundSetting, 6))
+        self.assertIsNotNone(state.get(SoundSetting, 5))
+        state.sent(samsung.status_setting("PARTY"))
+        self.assertIsNone(state.get(SystemSetting, 3))
+        state.update(SoundSetting(1, (20, 0, 0)))
+        state.update(SourceInfo(4))
+        state.sent(samsung.source_info_req())
+        state.sent(samsung.sound_setting_info_req(1))
+        self.assertIsNotNone(state.get(SourceInfo))
+        state.sent(samsung.remote_control(20))
+        self.assertIsNone(state.get(SoundSetting, 1))
+        self.assertIsNotNone(state.get(SoundSetting, 5))
+        state.sent(samsung.toggle_on_off())
+        self.assertIsNone(state.get(SoundSetting, 5))
+        self.assertIsNone(state.get(SourceInfo))
+        self.assertIsNotNone(state.get(ConnectInfo))
+        state.update(SourceInfo(4))
+        state.sent(samsung.source_switch("BT"))
+        self.assertIsNone(state.get(SourceInfo))
+
+    def test_session_accessors(self):
+        """Test the accessors answer from the cache and ask the device on a miss"""
+        simulator = SamsungMXT40Simulator()
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=simulator.transport)
+        try:
+            samsung.effect_fragment_mode()
+            received = len(simulator.received)
+            self.assertEqual(samsung.get_sound_setting(6), SoundSetting(6, (0, 8, 0)))
+            self.assertEqual(samsung.get_system_setting(3).values, (1,))
+            self.assertEqual(len(simulator.received), received)
+            self.assertEqual(samsung.get_source(), SourceInfo(1))
+            self.assertEqual(len(simulator.received), received + 1)
+            samsung.request(samsung.tempo(3))
+            self.assertEqual(samsung.get_sound_setting(6).values, (0, 3, 0))
+        finally:
+            samsung.close()
+            simulator.close()
+
+if __name__ == '__main__':
+    unittest.main()
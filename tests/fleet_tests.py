@@ -0,0 +1,52 @@
+import unittest
+
+from samsungmxt40 import CommandPlan, ConnectionManager, Fleet
+
+class FakeSession:
+    """Session double refusing to connect to the BAD device"""
+
+    def __init__(self, device):
+        if device == "BAD":
+            raise OSError("Host is down")
+        self.device = device
+        self.socket = object()
+        self.last_activity = None
+
+    def is_connected(self):
+        return self.socket is not None
+
+    def close(self):
+        self.socket = None
+
+    def load_source_info(self):
+        pass
+
+class FakePlan:
+    """Plan double answering the device it ran on"""
+
+    def run(self, samsung):
+        return [[samsung.device.encode()]]
+
+class FleetTestCase(unittest.TestCase):
+
+    def test_partial_failure(self):
+        """Test a failing device does not stop the others"""
+        fleet = Fleet(["AA", "BAD", "BB"], workers=2, manager=ConnectionManager(idle_timeout=None, factory=FakeSession))
+        results = fleet.run(FakePlan())
+        fleet.close()
+        self.assertEqual([result.device for result in results], ["AA", "BAD", "BB"])
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertEqual(results[2].replies, [[b"BB"]])
+
+    def test_plan_serialization(self):
+        """Test a plan survives to_list and from_list"""
+        plan = CommandPlan().lighting_status("PARTY").color(10, 0, 5).restart()
+        self.assertEqual(CommandPlan.from_list(plan.to_list()).to_list(), plan.to_list())
+
+    def test_plan_unknown_action(self):
+        """Test an unknown action is refused"""
+        self.assertRaises(ValueError, CommandPlan().add, "explode")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from samsungmxt40 import FrameDecoder
+
+CONNECT_INFO = bytes([0, 187, 1, 1, 0, 2, 2, 7, 13])
+SOURCE_INFO = bytes([0, 187, 1, 2, 0, 2, 49, 4, 58])
+
+class FrameDecoderTestCase(unittest.TestCase):
+
+    def test_split_frames(self):
+        """Test two commands received in one chunk"""
+        decoder = FrameDecoder()
+        result = [bytes(frame) for frame in decoder.decode(CONNECT_INFO + SOURCE_INFO)]
+        self.assertEqual(result, [CONNECT_INFO, SOURCE_INFO])
+
+    def test_frame_across_chunks(self):
+        """Test a command split across two chunks"""
+        decoder = FrameDecoder()
+        self.assertEqual(list(decoder.decode(SOURCE_INFO[:4])), [])
+        result = [bytes(frame) for frame in decoder.decode(SOURCE_INFO[4:])]
+        self.assertEqual(result, [SOURCE_INFO])
+        self.assertEqual(decoder.pending(), 0)
+
+    def test_resync_after_garbage(self):
+        """Test garbage before a command gets dropped"""
+        decoder = FrameDecoder()
+        result = [bytes(frame) for frame in decoder.decode(bytes([7, 0, 3, 187]) + SOURCE_INFO)]
+        self.assertEqual(result, [SOURCE_INFO])
+        self.assertEqual(decoder.discarded, 4)
+
+    def test_checksum_error(self):
+        """Test a corrupted command gets dropped and the next one decoded"""
+        decoder = FrameDecoder()
+        corrupted = CONNECT_INFO[:-1] + bytes([14])
+        result = [bytes(frame) for frame in decoder.decode(corrupted + SOURCE_INFO)]
+        self.assertEqual(result, [SOURCE_INFO])
+        self.assertEqual(decoder.checksum_errors, 1)
+
+    def test_buffer_growth(self):
+        """Test a command bigger than the buffer"""
+        decoder = FrameDecoder(size=8)
+        result = [bytes(frame) for frame in decoder.decode(CONNECT_INFO)]
+        self.assertEqual(result, [CONNECT_INFO])
+
+
+if __name__ == '__main__':
+    unittest.main()
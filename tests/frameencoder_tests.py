@@ -0,0 +1,89 @@
+import threading
+import unittest
+
+from samsungmxt40 import SamsungMXT40, FrameEncoder
+
+def legacy_getDataCommand(sequence, array):
+    """getDataCommand as it was written before FrameEncoder"""
+    length = len(array)
+    n2 = SamsungMXT40.rshift((length << 16), 24)
+    n3 = SamsungMXT40.rshift((length << 24), 24)
+    array2 = [0, -69, SamsungMXT40.TYPE_DATA, sequence, n2, n3]
+    for b in array:
+        if b > 128:
+            array2.append(b-256)
+        else:
+            array2.append(b)
+    array2.append(SamsungMXT40.getCheckSum(SamsungMXT40.TYPE_DATA, sequence, n2, n3, array))
+    array3 = []
+    for c in array2:
+        if c > 128:
+            array3.append(c-256)
+        elif c < 0:
+            array3.append(c+256)
+        else:
+            array3.append(c)
+    return bytes(array3)
+
+class FrameEncoderTestCase(unittest.TestCase):
+
+    def assertLegacy(self, build):
+        """Compare the commands built by every sequence number with the legacy encoder"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        for sequence in range(1, 129):
+            samsung.SEQUENCE_NUMBER = sequence - 1
+            command = build(samsung)
+            array = list(command[6:-1])
+            try:
+                expected = legacy_getDataCommand(sequence, array)
+            except ValueError:
+                # the legacy encoder could not encode it
+                continue
+            self.assertEqual(command, expected, array)
+
+    def test_constant_commands(self):
+        """Test the commands encoded from templates"""
+        self.assertLegacy(lambda s: s.connect_req())
+        self.assertLegacy(lambda s: s.connect_link_complete())
+        self.assertLegacy(lambda s: s.source_info_req())
+        self.assertLegacy(lambda s: s.aux_state_req())
+        self.assertLegacy(lambda s: s.sound_setting_info_req(6))
+        self.assertLegacy(lambda s: s.status_setting("SOLID"))
+        for command in [1, 15, 16, 20]:
+            self.assertLegacy(lambda s: s.remote_control(command))
+
+    def test_commands(self):
+        """Test the commands encoded with arguments"""
+        for value in range(0, 256, 17):
+            self.assertLegacy(lambda s: s.illumination_setting(value, 255 - value, value // 2))
+            self.assertLegacy(lambda s: s.tempo(value % 16))
+        for effect in SamsungMXT40.effect_map:
+            self.assertLegacy(lambda s: s.change_dj_effect(effect, 30))
+        for source in SamsungMXT40.source_switch_rev_map:
+            self.assertLegacy(lambda s: s.source_switch(source))
+
+    def test_threads(self):
+        """Test an encoder shared by several threads keeps their commands apart"""
+        encoder = FrameEncoder()
+        errors = []
+
+        def encode(value):
+            try:
+                for i in range(2000):
+                    sequence = 1 + i % 128
+                    command = encoder.encode(1, sequence, [96, 2, value, value, value])
+                    constant = encoder.encode_constant(1, sequence, [112, value])
+                    if command != legacy_getDataCommand(sequence, [96, 2, value, value, value]) or constant != legacy_getDataCommand(sequence, [112, value]):
+                        errors.append(value)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=encode, args=(value,)) for value in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import asyncio
+import unittest
+import urllib.error
+import urllib.request
+
+from samsungmxt40 import AsyncSamsungMXT40, SamsungMXT40Simulator, HttpGateway
+
+class HttpGatewayTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.simulator = SamsungMXT40Simulator()
+        self.gateway = HttpGateway(port=0, factory=lambda device: AsyncSamsungMXT40(device, transport=self.simulator.transport))
+        self.port = await self.gateway.start()
+
+    async def asyncTearDown(self):
+        await self.gateway.close()
+        self.simulator.close()
+
+    async def call(self, method, path, body=None):
+        def send():
+            data = None if body is None else json.dumps(body).encode()
+            request = urllib.request.Request("http://127.0.0.1:%d%s" % (self.port, path), data=data, method=method)
+            try:
+                with urllib.request.urlopen(request) as response:
+                    return response.status, response.headers, json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                return e.code, e.headers, json.loads(e.read())
+        return await asyncio.get_running_loop().run_in_executor(None, send)
+
+    async def test_command(self):
+        """Test a single command and the cached state"""
+        status, headers, response = await self.call("POST", "/devices/2C:FD:B3:E6:D1:08/color", [10, 0, 5])
+        self.assertEqual(status, 200)
+        self.assertEqual(bytes.fromhex(response["replies"][0][0])[6], 97)
+        self.assertIn("link;dur=", headers["Server-Timing"])
+        self.assertTrue(headers["X-Response-Time"].endswith("ms"))
+        self.assertEqual(self.simulator.color, [10, 0, 5])
+        received = len(self.simulator.received)
+        status, headers, state = await self.call("GET", "/devices/2C:FD:B3:E6:D1:08")
+        self.assertEqual(status, 200)
+        self.assertEqual(state["source"], "BT")
+        self.assertIn("IlluminationSetting", [record["record"] for record in state["records"]])
+        self.assertEqual(len(self.simulator.received), received)
+
+    async def test_batch(self):
+        """Test a batch is sent with one mode switch per mode needed"""
+        commands = [["lighting_status", ["PARTY"]], ["color", [1, 2, 3]], ["volume", [18]], ["on_off", []]]
+        status, headers, response = await self.call("POST", "/batch", {"devices": ["2C:FD:B3:E6:D1:08"], "commands": commands})
+        self.assertEqual(status, 200)
+        result = response["results"][0]
+        self.assertTrue(result["ok"])
+        self.assertEqual([len(replies) for replies in result["replies"]], [1, 1, 3, 1])
+        opcodes = [payload[0] for payload in self.simulator.received]
+        self.assertEqual(opcodes.count(82), 1)
+        self.assertEqual(opcodes.count(36), 1)
+        self.assertEqual(self.simulator.sound_settings[1][1], 18)
+        self.assertFalse(self.simulator.powered)
+
+    async def test_errors(self):
+        """Test invalid commands are refused before using a link"""
+        status, headers, response = await self.call("POST", "/devices/2C:FD:B3:E6:D1:08/lighting_status", ["DISCO"])
+        self.assertEqual(status, 400)
+        status, headers, response = await self.call("POST", "/devices/2C:FD:B3:E6:D1:08/explode", [])
+        self.assertEqual(status, 400)
+        status, headers, response = await self.call("GET", "/devices/2C:FD:B3:E6:D1:08")
+        self.assertEqual(status, 404)
+        self.assertEqual(self.simulator.attempts, [])
+        self.simulator.channels = []
+        status, headers, response = await self.call("POST", "/devices/2C:FD:B3:E6:D1:08/mute")
+        self.assertEqual(status, 502)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, LightAnimator
+
+class LightAnimatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.simulator = SamsungMXT40Simulator()
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport)
+
+    def tearDown(self):
+        self.samsung.close()
+        self.simulator.close()
+
+    def test_oklab_round_trip(self):
+        """Test the device colors survive the conversion to OKLab"""
+        for color in [(0, 0, 0), (10, 0, 0), (3, 7, 10), (10, 10, 10)]:
+            self.assertEqual(LightAnimator.fromOklab(LightAnimator.toOklab(color)), color)
+
+    def test_timeline(self):
+        """Test the keyframes are reached and the middle is interpolated"""
+        timeline = LightAnimator.Timeline([(1, (0, 0, 10)), (0, (10, 0, 0))])
+        self.assertEqual(timeline.at(0), (10, 0, 0))
+        self.assertEqual(timeline.at(5), (0, 0, 10))
+        self.assertNotIn(timeline.at(0.5), [(10, 0, 0), (0, 0, 10)])
+        looping = LightAnimator.Timeline([(0, (10, 0, 0)), (1, (0, 0, 10))], loop=True)
+        self.assertEqual(looping.at(2.5), looping.at(0.5))
+
+    def test_play(self):
+        """Test a timeline is streamed and ends on its last keyframe"""
+        animator = LightAnimator(self.samsung, fps=200)
+        animator.play(LightAnimator.Timeline([(0, (10, 0, 0)), (0.2, (0, 10, 0))]))
+        animator.run()
+        stats = animator.stats()
+        self.assertGreater(stats["sent"], 2)
+        self.assertGreater(stats["fps"], 0)
+        self.assertEqual(self.simulator.color, [0, 10, 0])
+
+    def test_latest_wins(self):
+        """Test only the newest color set is sent"""
+        animator = LightAnimator(self.samsung, fps=100)
+        animator.set_color(1, 1, 1)
+        animator.set_color(2, 2, 2)
+        animator.set_color(3, 3, 3)
+        animator.run()
+        self.assertEqual(animator.sent, 1)
+        self.assertEqual(animator.dropped, 2)
+        self.assertEqual(self.simulator.color, [3, 3, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import urllib.request
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, Metrics
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.simulator = SamsungMXT40Simulator()
+        self.metrics = Metrics()
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport, metrics=self.metrics)
+
+    def tearDown(self):
+        self.samsung.close()
+        self.simulator.close()
+
+    def test_counters(self):
+        """Test the frames, bytes, round trips and handshake are recorded"""
+        self.samsung.request(self.samsung.illumination_setting(1, 2, 3))
+        self.assertEqual(self.metrics.counter("frames_sent"), 3)
+        self.assertEqual(self.metrics.counter("frames_received"), 3)
+        self.assertGreater(self.metrics.counter("bytes_received", self.samsung.device), 0)
+        self.assertEqual(self.metrics.counter("connects"), 1)
+        self.assertEqual(self.metrics.histogram("rtt_seconds", opcode=96).count, 1)
+        self.assertEqual(self.metrics.histogram("rtt_seconds").count, 3)
+        self.assertEqual(self.metrics.histogram("handshake_seconds").count, 1)
+
+    def test_reconnect_and_timeout(self):
+        """Test reconnects and unanswered requests are counted"""
+        self.samsung.close()
+        self.samsung.connect()
+        self.assertEqual(self.metrics.counter("reconnects"), 1)
+        self.samsung.request(self.samsung.connect_link_complete(), expected=2, timeout=0.05)
+        self.assertEqual(self.metrics.counter("timeouts"), 1)
+
+    def test_disabled(self):
+        """Test a session without metrics records nothing"""
+        self.metrics.detach(self.samsung)
+        self.samsung.request(self.samsung.source_info_req())
+        self.assertEqual(self.metrics.counter("frames_sent"), 2)
+
+    def test_prometheus(self):
+        """Test the text export, from a file and over HTTP"""
+        self.samsung.request(self.samsung.source_info_req())
+        text = self.metrics.to_prometheus()
+        self.assertIn('samsungmxt40_frames_sent_total{device="2C:FD:B3:E6:D1:08"} 3', text)
+        self.assertIn('samsungmxt40_rtt_seconds_bucket{device="2C:FD:B3:E6:D1:08",opcode="50",le="+Inf"} 1', text)
+        self.assertIn('samsungmxt40_decode_errors_total{device="2C:FD:B3:E6:D1:08",kind="checksum"} 0', text)
+        server = self.metrics.serve(0)
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:%d/metrics" % server.server_address[1]) as response:
+                self.assertIn("# TYPE samsungmxt40_handshake_seconds histogram", response.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, ProfileStore
+
+class ProfileStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "profiles.json")
+        self.simulator = SamsungMXT40Simulator()
+        self.simulator.channels = [2]
+
+    def tearDown(self):
+        self.simulator.close()
+        self.directory.cleanup()
+
+    def connect(self, profiles):
+        samsung = SamsungMXT40("2c:fd:b3:e6:d1:08", transport=self.simulator.transport, profiles=profiles)
+        samsung.close()
+        return samsung
+
+    def test_persist(self):
+        """Test a profile survives in the file and is rewritten only on change"""
+        store = ProfileStore(self.path)
+        self.assertIsNone(store.get("AA"))
+        store.put("aa", {"channel": 2})
+        mtime = os.stat(self.path).st_mtime_ns
+        store.put("AA", {"channel": 2})
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+        self.assertEqual(ProfileStore(self.path).get("AA"), {"channel": 2})
+        store.forget("AA")
+        self.assertIsNone(ProfileStore(self.path).get("AA"))
+
+    def test_known_channel(self):
+        """Test a known device is reached on its channel without discovery"""
+        self.connect(ProfileStore(self.path))
+        self.assertEqual(self.simulator.attempts, [1, 2])
+        profile = ProfileStore(self.path).get("2C:FD:B3:E6:D1:08")
+        self.assertEqual(profile["channel"], 2)
+        self.assertEqual(profile["sources"], self.simulator.sources)
+        samsung = self.connect(ProfileStore(self.path))
+        self.assertEqual(self.simulator.attempts, [1, 2, 2])
+        self.assertEqual(samsung.source_info, ["OFF", "BT", "USB1", "AUX1", "AUX2"])
+
+    def test_stale_channel(self):
+        """Test discovery runs again when the known channel fails"""
+        store = ProfileStore(self.path)
+        self.connect(store)
+        self.simulator.channels = [1]
+        self.connect(store)
+        self.assertEqual(self.simulator.attempts, [1, 2, 2, 1])
+        self.assertEqual(store.get("2C:FD:B3:E6:D1:08")["channel"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
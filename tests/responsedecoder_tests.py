@@ -0,0 +1,58 @@
+import socket
+import unittest
+
+from samsungmxt40 import SamsungMXT40, FrameEncoder, ResponseDecoder, ConnectInfo, SourceInfo, SoundSetting
+
+class ResponseDecoderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = FrameEncoder()
+
+    def frame(self, payload, sequence=1):
+        return self.encoder.encode(1, sequence, payload)
+
+    def test_connect_info(self):
+        """Test the decoding of a connect info"""
+        decoder = ResponseDecoder()
+        response = decoder.decode(self.frame([2, 1, 2, 40, 1, 3, 1, 2, 4, 0]))
+        self.assertEqual(response, ConnectInfo((1, 2), 40, 1, (1, 2, 4), 0))
+
+    def test_source_info(self):
+        """Test the decoding of a source info"""
+        decoder = ResponseDecoder()
+        self.assertEqual(decoder.decode(self.frame([49, 4])), SourceInfo(4))
+        self.assertEqual(decoder.decode(self.frame([65, 1, 0, 15, 0])), SoundSetting(1, (0, 15, 0)))
+
+    def test_immutable(self):
+        """Test a record cannot be changed"""
+        response = SourceInfo(4)
+        with self.assertRaises(AttributeError):
+            response.source = 1
+        self.assertEqual(hash(response), hash(SourceInfo(4)))
+
+    def test_unknown_and_malformed(self):
+        """Test unknown opcodes get counted and malformed payloads dropped"""
+        decoder = ResponseDecoder()
+        self.assertIsNone(decoder.decode(self.frame([200, 1])))
+        self.assertIsNone(decoder.decode(self.frame([49])))
+        self.assertEqual(decoder.unknown[200], 1)
+        self.assertEqual(decoder.errors, 1)
+
+    def test_session_state(self):
+        """Test a session updates its state from the records received"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        samsung.socket, device = socket.socketpair()
+        try:
+            device.sendall(self.frame([2, 1, 2, 40, 1, 2, 1, 2, 0]))
+            self.assertEqual(samsung.request(samsung.connect_req(), decoded=True), [ConnectInfo((1, 2), 40, 1, (1, 2), 0)])
+            self.assertEqual(samsung.source_info, ["OFF", "BT", "USB1"])
+            self.assertEqual(samsung.protocol_version, "0012")
+            device.sendall(self.frame([49, 4]))
+            samsung.request(samsung.source_info_req())
+            self.assertEqual(samsung.source_label, "AUX1")
+        finally:
+            samsung.socket.close()
+            device.close()
+
+if __name__ == '__main__':
+    unittest.main()
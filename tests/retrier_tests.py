@@ -0,0 +1,61 @@
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, Retrier
+
+class RetrierTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.simulator = SamsungMXT40Simulator()
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport)
+        self.samsung.request_timeout = 0.2
+        self.retrier = Retrier(self.samsung, base_delay=0.01, seed=1)
+
+    def tearDown(self):
+        if self.samsung.is_connected():
+            self.samsung.close()
+        self.simulator.close()
+
+    def test_idempotent(self):
+        """Test the absolute settings are safe to resend and the toggles are not"""
+        samsung = self.samsung
+        for command in [samsung.status_setting("PARTY"), samsung.illumination_setting(1, 2, 3), samsung.source_switch("BT"), samsung.source_info_req()]:
+            self.assertTrue(Retrier.isIdempotent(command))
+        for command in [samsung.toggle_on_off(), samsung.toggle_mute(), samsung.sound("MORE"), samsung.remote_control(20),
+                        samsung.usb_control_event(1), samsung.connect_restart_req(), b"\x00\xbb\x01\x01\x00\x01\x40\x41"]:
+            self.assertFalse(Retrier.isIdempotent(command))
+        for spec in SamsungMXT40.protocol:
+            command = getattr(samsung, spec.name)(*[next(iter(arg.choices)) if arg.choices else arg.low for arg in spec.args])
+            self.assertEqual(Retrier.isIdempotent(command), spec.idempotent, spec.name)
+
+    def test_resend_safe(self):
+        """Test a safe command is resent on a new connection once the link dropped"""
+        self.samsung.effect_fragment_mode()
+        self.simulator.drops[96] = 1
+        outcome = self.retrier.request(self.samsung.illumination_setting(1, 2, 3))
+        self.assertEqual(outcome.status, Retrier.DONE)
+        self.assertEqual(outcome.attempts, 2)
+        self.assertIsNotNone(outcome.error)
+        self.assertEqual(outcome.replies[0][6], 97)
+        self.assertEqual(self.samsung.mode, SamsungMXT40.EFFECT_FRAGMENT_MODE)
+        self.assertEqual([payload[0] for payload in self.simulator.received].count(1), 2)
+
+    def test_uncertain_toggle(self):
+        """Test an unanswered toggle is reported uncertain and not resent"""
+        self.simulator.drops[112] = 1
+        outcomes = self.retrier.pipeline([self.samsung.toggle_mute(), self.samsung.source_info_req()])
+        self.assertEqual(outcomes[0].status, Retrier.UNCERTAIN)
+        self.assertEqual(outcomes[0].attempts, 1)
+        self.assertEqual(outcomes[1].status, Retrier.DONE)
+        self.assertTrue(self.simulator.muted)
+        self.assertEqual([payload[0] for payload in self.simulator.received].count(112), 1)
+
+    def test_failed(self):
+        """Test a safe command fails once the device cannot be reached anymore"""
+        self.simulator.drops[80] = 1
+        self.simulator.channels = []
+        outcome = self.retrier.request(self.samsung.status_setting("PARTY"))
+        self.assertEqual(outcome.status, Retrier.FAILED)
+        self.assertIsInstance(outcome.error, ConnectionRefusedError)
+
+if __name__ == '__main__':
+    unittest.main()
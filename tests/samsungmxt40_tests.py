@@ -1,6 +1,8 @@
+import socket
+import threading
 import unittest
 
-from samsungmxt40 import SamsungMXT40
+from samsungmxt40 import SamsungMXT40, FrameEncoder, FrameDecoder
 
 class SamsungMXT40TestCase(unittest.TestCase):
 
@@ -39,6 +41,76 @@ class SamsungMXT40TestCase(unittest.TestCase):
         result = SamsungMXT40.splitCommand([45, 87, 35])
         self.assertEqual(result, [[45, 87, 35]])
 
+    def test_request(self):
+        """Test request returns as soon as the answer arrived"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        samsung.socket, device = socket.socketpair()
+        device.send(bytes([0, 187, 1, 1, 0, 2, 2, 7, 13]))
+        result = samsung.request(samsung.connect_req(), timeout=5)
+        self.assertEqual(result, [bytes([0, 187, 1, 1, 0, 2, 2, 7, 13])])
+        self.assertLess(samsung.last_request_wait, 1)
+        samsung.socket.close()
+        device.close()
+
+    def test_sequence_wrap(self):
+        """Test the sequence number wraps at 8 bits"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        samsung.SEQUENCE_NUMBER = 254
+        self.assertEqual(samsung.connect_req()[3], 255)
+        self.assertEqual(samsung.connect_req()[3], 0)
+
+    def test_pipeline(self):
+        """Test pipeline matches responses arriving out of order by sequence number"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        samsung.socket, device = socket.socketpair()
+        encoder = FrameEncoder()
+        for sequence in [3, 1, 2]:
+            device.send(encoder.encode(1, sequence, [65, sequence]))
+        result = samsung.pipeline([samsung.sound_setting_info_req(n) for n in range(3)], timeout=5)
+        self.assertEqual([list(replies[0][6:8]) for replies in result], [[65, 1], [65, 2], [65, 3]])
+        samsung.socket.close()
+        device.close()
+
+    def test_pipeline_window_cap(self):
+        """Test a pipeline longer than the sequence space never has two commands with the same sequence in flight"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        samsung.socket, device = socket.socketpair()
+        encoder = FrameEncoder()
+
+        def answer():
+            decoder = FrameDecoder()
+            answered = 0
+            while answered < 300:
+                for frame in decoder.decode(device.recv(4096)):
+                    device.send(encoder.encode(1, frame[3], [65, frame[7]]))
+                    answered += 1
+
+        thread = threading.Thread(target=answer)
+        thread.start()
+        commands = [samsung.sound_setting_info_req(n % 7) for n in range(300)]
+        result = samsung.pipeline(commands, window=300, timeout=5)
+        thread.join()
+        self.assertEqual([len(replies) for replies in result], [1] * 300)
+        self.assertTrue(all(replies[0][3] == command[3] and replies[0][7] == command[7] for command, replies in zip(commands, result)))
+        samsung.socket.close()
+        device.close()
+
+    def test_effect_fragment_mode_once(self):
+        """Test the effect fragment preamble is only sent when the mode changes"""
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+        samsung.socket, device = socket.socketpair()
+        encoder = FrameEncoder()
+        for sequence in [1, 2, 3]:
+            device.send(encoder.encode(1, sequence, [65, sequence]))
+        samsung.effect_fragment_mode()
+        samsung.effect_fragment_mode()
+        self.assertEqual(samsung.SEQUENCE_NUMBER, 3)
+        self.assertEqual(samsung.mode, SamsungMXT40.EFFECT_FRAGMENT_MODE)
+        samsung.source_switch("BT")
+        self.assertIsNone(samsung.mode)
+        samsung.socket.close()
+        device.close()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+import os
+import json
+import tempfile
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, FrameEncoder, CommandPlan, Scene
+
+class SceneTestCase(unittest.TestCase):
+
+    settings = {"lighting_status": "PARTY", "color": [10, 0, 5], "dj_effect": ["DELAY", 15], "tempo": 8, "bass_booster": "ON"}
+
+    def setUp(self):
+        self.simulator = SamsungMXT40Simulator()
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport)
+
+    def tearDown(self):
+        self.samsung.close()
+        self.simulator.close()
+
+    def test_restamp(self):
+        """Test a restamped command matches the one built with the sequence number"""
+        builder = SamsungMXT40("", connect=False)
+        builder.SEQUENCE_NUMBER = 41
+        command = builder.illumination_setting(10, 0, 5)
+        self.assertEqual(FrameEncoder.restamp(FrameEncoder.restamp(command, 0), 42), command)
+
+    def test_compile(self):
+        """Test a scene compiles to one preamble followed by its settings"""
+        scene = Scene("party", dict(self.settings, source="AUX1"))
+        frames = scene.compile()
+        self.assertIs(scene.compile(), frames)
+        self.assertEqual(scene.preamble, 3)
+        self.assertEqual([frame[6] for frame in frames], [66, 82, 66, 80, 96, 64, 64, 64, 48, 66, 66, 52, 43])
+        self.assertEqual({frame[3] for frame in frames}, {0})
+        self.assertEqual(scene.to_bytes(), b"".join(frames))
+
+    def test_invalid(self):
+        """Test unknown settings and values are refused"""
+        with self.assertRaises(ValueError):
+            Scene("bad", {"brightness": 3})
+        with self.assertRaises(ValueError):
+            Scene("bad", {"lighting_status": "DISCO"}).compile()
+
+    def test_apply(self):
+        """Test a scene is applied in one pipeline and the preamble is sent once"""
+        scene = Scene("party", self.settings)
+        replies = scene.apply(self.samsung)
+        self.assertEqual(len(replies), 8)
+        self.assertTrue(all(replies))
+        self.assertEqual(self.simulator.color, [10, 0, 5])
+        self.assertEqual(self.simulator.system_settings[3], [2])
+        self.assertEqual(self.samsung.mode, SamsungMXT40.EFFECT_FRAGMENT_MODE)
+        self.assertEqual(len(scene.apply(self.samsung)), 5)
+
+    def test_single_write(self):
+        """Test a scene goes out in one send and switches the source of the session"""
+        writes = []
+        sock = self.samsung.socket
+
+        class Counting:
+            def sendall(self, data):
+                writes.append(data)
+                return sock.sendall(data)
+
+            def __getattr__(self, name):
+                return getattr(sock, name)
+
+        scene = Scene("party", dict(self.settings, source="AUX1"))
+        self.samsung.mode = SamsungMXT40.EFFECT_FRAGMENT_MODE
+        self.samsung.socket = Counting()
+        try:
+            replies = scene.apply(self.samsung)
+        finally:
+            self.samsung.socket = sock
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(len(writes[0]), sum(len(frame) for frame in scene.compile()[scene.preamble:]))
+        self.assertTrue(all(replies))
+        self.assertEqual(self.samsung.source_label, "AUX1")
+        self.assertIsNone(self.samsung.mode)
+
+    def test_load(self):
+        """Test a scenes file is read and run by a plan"""
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"party": dict(self.settings, source="BT")}, f)
+        try:
+            scenes = Scene.load(path)
+        finally:
+            os.remove(path)
+        plan = CommandPlan.from_list(CommandPlan().scene(scenes["party"]).to_list())
+        replies = plan.run(self.samsung)
+        self.assertEqual(len(replies[0]), 10)
+        self.assertEqual(self.simulator.color, [10, 0, 5])
+        self.assertIsNone(self.samsung.mode)
+
+if __name__ == '__main__':
+    unittest.main()
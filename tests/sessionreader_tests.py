@@ -0,0 +1,96 @@
+import time
+import socket
+import threading
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, FrameEncoder, SourceInfo, SoundSetting
+
+class SessionReaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.simulator = SamsungMXT40Simulator(seed=1)
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False, transport=self.simulator.transport)
+        self.samsung.start_reader(poll_interval=0.01)
+        self.samsung.connect()
+
+    def tearDown(self):
+        self.samsung.close()
+        self.simulator.close()
+
+    def test_requests_through_reader(self):
+        """Test requests and pipelines get their answers from the reader"""
+        samsung = self.samsung
+        self.assertTrue(samsung.reader.is_alive())
+        self.assertEqual(samsung.source_info, ["OFF", "BT", "USB1", "AUX1", "AUX2"])
+        self.assertEqual(samsung.request(samsung.source_switch("AUX1"), decoded=True), [SourceInfo(4)])
+        replies = samsung.pipeline([samsung.sound_setting_info_req(6), samsung.source_info_req()], decoded=True)
+        self.assertEqual(replies, [[SoundSetting(6, (0, 8, 0))], [SourceInfo(4)]])
+
+    def test_notification(self):
+        """Test an unsolicited source change updates the state and reaches the subscribers"""
+        samsung = self.samsung
+        received = []
+        notified = threading.Event()
+        def callback(response):
+            received.append(response)
+            notified.set()
+        samsung.subscribe(callback, SourceInfo)
+        samsung.subscribe(lambda response: self.fail("filtered out"), SoundSetting)
+        self.simulator.notify([49, 5], sequence=200)
+        self.assertTrue(notified.wait(1))
+        self.assertEqual(received, [SourceInfo(5)])
+        self.assertEqual(samsung.source_label, "AUX2")
+        samsung.unsubscribe(callback)
+        self.assertEqual(len(samsung.reader.subscribers), 1)
+
+    def test_unknown_value(self):
+        """Test a record the session cannot handle is counted and the reader keeps reading"""
+        samsung = self.samsung
+        self.simulator.notify([49, 99], sequence=200)
+        deadline = time.monotonic() + 1
+        while samsung.responses.errors == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(samsung.responses.errors, 1)
+        self.assertTrue(samsung.reader.is_alive())
+        self.assertEqual(samsung.request(samsung.source_info_req(), decoded=True), [SourceInfo(1)])
+
+    def test_same_matching(self):
+        """Test an answer with another sequence number is taken with and without a reader"""
+        for reader in [False, True]:
+            samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", connect=False)
+            samsung.socket, device = socket.socketpair()
+            samsung.request_timeout = 1
+            received = []
+            if reader:
+                samsung.start_reader(poll_interval=0.01)
+                samsung.subscribe(received.append)
+
+            def answer():
+                device.recv(1024)
+                device.send(FrameEncoder().encode(1, 99, [49, 4]) + FrameEncoder().encode(1, 98, [49, 5]))
+
+            thread = threading.Thread(target=answer)
+            thread.start()
+            try:
+                self.assertEqual(samsung.request(samsung.source_info_req(), decoded=True), [SourceInfo(4)], reader)
+            finally:
+                thread.join()
+                samsung.stop_reader()
+                samsung.socket.close()
+                device.close()
+            self.assertEqual(received, [SourceInfo(5)] if reader else [])
+
+    def test_restart_on_connect(self):
+        """Test the reader stops on close and restarts on connect"""
+        samsung = self.samsung
+        samsung.close()
+        self.assertFalse(samsung.reader.is_alive())
+        samsung.connect()
+        self.assertTrue(samsung.reader.is_alive())
+        self.assertTrue(samsung.ping())
+        samsung.stop_reader()
+        self.assertIsNone(samsung.reader)
+        self.assertTrue(samsung.ping())
+
+if __name__ == '__main__':
+    unittest.main()
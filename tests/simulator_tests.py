@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator
+
+class SamsungMXT40SimulatorTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        self.samsung.close()
+        self.simulator.close()
+
+    def connect(self, **kwargs):
+        self.simulator = SamsungMXT40Simulator(seed=1, **kwargs)
+        self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport)
+        return self.samsung
+
+    def test_handshake(self):
+        """Test connect decodes the connect info of the simulator"""
+        samsung = self.connect()
+        samsung.load_source_info()
+        self.assertEqual(samsung.source_info, ["OFF", "BT", "USB1", "AUX1", "AUX2"])
+        self.assertEqual(samsung.source_label, "BT")
+
+    def test_source_switch(self):
+        """Test the simulator follows a source switch"""
+        samsung = self.connect()
+        samsung.request(samsung.source_switch("AUX1"))
+        samsung.load_source_info()
+        self.assertEqual(samsung.source_label, "AUX1")
+
+    def test_fragmentation(self):
+        """Test responses split in small chunks are reassembled"""
+        samsung = self.connect(fragment=2, latency=0.001)
+        samsung.effect_fragment_mode()
+        self.assertEqual(samsung.mode, SamsungMXT40.EFFECT_FRAGMENT_MODE)
+
+    def test_corruption(self):
+        """Test corrupted responses are dropped instead of returned"""
+        samsung = self.connect()
+        self.simulator.corruption = 1.0
+        self.assertEqual(samsung.request(samsung.source_info_req(), timeout=0.2), [])
+
+    def test_set_volume(self):
+        """Test an absolute volume is reached in one burst"""
+        samsung = self.connect()
+        self.assertEqual(samsung.get_volume(), 15)
+        self.assertEqual(samsung.set_volume(20), 20)
+        self.assertEqual(samsung.set_volume(100), SamsungMXT40Simulator.MAX_VOLUME)
+        self.assertEqual(samsung.change_volume(-5), SamsungMXT40Simulator.MAX_VOLUME - 5)
+        self.assertEqual(self.simulator.sound_settings[1][1], SamsungMXT40Simulator.MAX_VOLUME - 5)
+        received = len(self.simulator.received)
+        self.assertEqual(samsung.change_volume(0), None)
+        self.assertEqual(len(self.simulator.received), received)
+        samsung.volume_busy = True
+        self.assertIsNone(samsung.change_volume(2))
+        self.assertIsNone(samsung.change_volume(1))
+        samsung.volume_busy = False
+        self.assertEqual(samsung.change_volume(-1), SamsungMXT40Simulator.MAX_VOLUME - 3)
+
+    def test_unix_socket(self):
+        """Test a session reaching the simulator through a Unix socket"""
+        with tempfile.TemporaryDirectory() as directory:
+            self.simulator = SamsungMXT40Simulator()
+            self.simulator.listen_unix(os.path.join(directory, "mxt40.sock"))
+            self.samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=self.simulator.transport)
+            self.assertEqual(self.samsung.model_info, SamsungMXT40Simulator.MODEL_INFO)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import time
+import random
+import shutil
+import tempfile
+import unittest
+
+from samsungmxt40 import SamsungMXT40, SamsungMXT40Simulator, TraceRecorder, TraceReader
+
+class TraceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "link.trace")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record_session(self):
+        simulator = SamsungMXT40Simulator()
+        recorder = TraceRecorder(self.path)
+        samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=simulator.transport, trace=recorder)
+        replies = samsung.request(samsung.illumination_setting(1, 2, 3))
+        samsung.close()
+        simulator.close()
+        recorder.close()
+        return replies
+
+    def test_records(self):
+        """Test the frames of a session are read back and filtered"""
+        before = time.time()
+        replies = self.record_session()
+        with TraceReader(self.path) as trace:
+            records = list(trace)
+            self.assertEqual([direction for timestamp, direction, frame in records], [TraceRecorder.OUT, TraceRecorder.IN] * 3)
+            self.assertTrue(all(timestamp >= before for timestamp, direction, frame in records))
+            self.assertEqual([frame for timestamp, direction, frame in trace.records(opcode=97)], replies)
+            self.assertEqual(len(list(trace.records(direction=TraceRecorder.IN))), 3)
+            self.assertEqual(list(trace.records(end=before)), [])
+
+    def test_ring(self):
+        """Test a ring keeps the newest frames that fit"""
+        recorder = TraceRecorder(self.path, ring_size=200)
+        frames = [bytes([0, 0xBB, 1, i, 0, i % 7]) + bytes(i % 7) + b"\x00" for i in range(100)]
+        for frame in frames:
+            recorder.record(TraceRecorder.OUT, frame)
+        recorder.close()
+        with TraceReader(self.path) as trace:
+            kept = [frame for timestamp, direction, frame in trace]
+        self.assertEqual(os.path.getsize(self.path), TraceRecorder.HEADER.size + 200)
+        self.assertGreater(len(kept), 5)
+        self.assertEqual(kept, frames[-len(kept):])
+
+    def test_ring_wrap(self):
+        """Test a ring wrapping over its oldest record reads back exactly the newest frames"""
+        recorder = TraceRecorder(self.path, ring_size=33)
+        frames = [bytes([1] * 7), bytes([2] * 4), bytes([3] * 7), bytes([4] * 7)]
+        for frame in frames:
+            recorder.record(TraceRecorder.OUT, frame)
+        recorder.flush()
+        with TraceReader(self.path) as trace:
+            self.assertEqual([frame for timestamp, direction, frame in trace], frames[-recorder.records:])
+        recorder.close()
+        generator = random.Random(7)
+        for run in range(100):
+            ring_size = generator.randint(TraceRecorder.RECORD.size + 8, 120)
+            recorder = TraceRecorder(self.path, ring_size=ring_size)
+            frames = []
+            for i in range(generator.randint(1, 40)):
+                frame = bytes([i] * generator.randint(1, 8))
+                frames.append(frame)
+                recorder.record(TraceRecorder.IN, frame)
+                recorder.flush()
+                with TraceReader(self.path) as trace:
+                    self.assertEqual([frame for timestamp, direction, frame in trace], frames[-recorder.records:], (ring_size, frames))
+            recorder.close()
+
+    def test_replay(self):
+        """Test a trace replayed answers a new session like the device did"""
+        replies = self.record_session()
+        with TraceReader(self.path) as trace:
+            samsung = SamsungMXT40("2C:FD:B3:E6:D1:08", transport=trace.transport)
+            self.assertEqual(samsung.model_info, SamsungMXT40Simulator.MODEL_INFO)
+            self.assertEqual(samsung.request(samsung.illumination_setting(1, 2, 3)), replies)
+            samsung.close()
+            for thread in trace.threads:
+                thread.join()
+
+if __name__ == '__main__':
+    unittest.main()